@@ -0,0 +1,408 @@
+from datetime import date
+import json
+import os
+import struct
+import zlib
+
+from recurrence import Recurrence, Frequency
+from task import Task, Priority, date_ordinal, ordinal_date
+from timelog import split_days
+
+# Constants for the module
+ARCHIVE_DAYS = 30           # Days past its due date a completed task is archived
+TASK_FRAME = 0              # Frame of archived task records
+RESTORED_FRAME = 1          # Frame of the positions of restored records
+FRAME_RECORDS = 1000        # Task records compressed together in one frame
+
+# Header of every frame holding its kind, number of lines,
+# compressed length and lowest and highest task id
+FRAME = struct.Struct("<BxxxIIqq")
+
+
+def archive_path(save_path):
+    """
+    Returns the path of the archive kept next to a
+    save file.
+    """
+
+    return os.path.splitext(save_path)[0] + ".ktarc"
+
+
+class Archive:
+    """
+    A class built to keep completed tasks out of the groups
+    while still being able to find and restore them.
+
+    Archived tasks are written to an append-only file as
+    frames of JSON lines compressed with zlib, one frame per
+    archiving pass. Opening the archive only reads the frame
+    headers, searching decompresses one frame at a time, and
+    restoring a task only reads the frames whose range of ids
+    holds it. No archived task is kept in memory.
+
+    Restored records are only marked in the file by commit(),
+    which is called once the groups holding the restored
+    tasks have been saved, so a crash in between never loses
+    a task.
+
+    Attributes:
+    --------------------
+    _path : str
+        The path of the archive file.
+    _frames : list
+        The offset, line count, compressed length and
+        lowest and highest id of every frame of task records.
+    _restored : set
+        The (frame offset, line) positions of the records
+        that were restored.
+    _unsaved : list
+        The positions of the records restored since the
+        last commit.
+    _size : int
+        The length of the archive file.
+
+    Methods:
+    --------------------
+    sweep()
+        Archives the completed tasks past a threshold.
+    archive()
+        Archives tasks of a group.
+    search()
+        Returns the archived tasks matching a text.
+    restore()
+        Moves an archived task back to its group.
+    find()
+        Returns the uids of the archived tasks with an id.
+    commit()
+        Marks the restored records in the archive file.
+    count()
+        Returns the number of archived tasks.
+    archived_days()
+        Returns the seconds tracked on archived tasks per day.
+    max_id()
+        Returns the largest archived identification number.
+    """
+
+    def __init__(self, path):
+        """
+        A one-argument constructor for the class that
+        requires the path of the archive file, only the
+        frame headers and restored positions are read.
+        """
+
+        self._path = path
+        self._frames = []
+        self._restored = set()
+        self._unsaved = []
+        self._size = 0
+        if not os.path.exists(path):
+            return
+
+        with open(path, "rb") as file:
+            while True:
+                header = file.read(FRAME.size)
+                if len(header) < FRAME.size:
+                    break
+                kind, lines, length, low, high = FRAME.unpack(header)
+                offset = file.tell()
+                if kind == RESTORED_FRAME:
+                    # A frame cut short or damaged by a crash ends the
+                    # archive, the next frame is written over it
+                    data = file.read(length)
+                    if len(data) < length:
+                        break
+                    try:
+                        positions = [
+                            tuple(position)
+                            for line in zlib.decompress(data).decode("utf-8").split("\n")
+                            for position in json.loads(line)
+                        ]
+                    except (zlib.error, ValueError, TypeError):
+                        break
+                    self._restored.update(positions)
+                elif kind == TASK_FRAME:
+                    file.seek(length, os.SEEK_CUR)
+                    if file.tell() > os.fstat(file.fileno()).st_size:
+                        break
+                    self._frames.append((offset, lines, length, low, high))
+                else:
+                    break
+                self._size = offset + length
+
+
+    def sweep(self, groups, days = ARCHIVE_DAYS, today = None):
+        """
+        Archives every completed task of the given groups whose
+        due date is more than a number of days before today,
+        and returns the number of archived tasks. Recurring
+        tasks, undated tasks and tasks with a running timer
+        stay in their groups.
+        """
+
+        cutoff = (today or date.today()).toordinal() - days
+        total = 0
+        for grp in groups:
+            stale = []
+            for task in grp.get_tasks():
+                if not task.get_completion() or task.get_recurrence() is not None:
+                    continue
+                ordinal = date_ordinal(task.get_date())
+                if ordinal is not None and ordinal < cutoff and task.get_timer_start() is None:
+                    stale.append(task)
+            if stale:
+                self.archive(grp, stale)
+                total += len(stale)
+        return total
+
+
+    def archive(self, grp, tasks):
+        """
+        Writes tasks of a group to the archive, sorted by id
+        in frames of FRAME_RECORDS, and then removes them from
+        the group.
+        """
+
+        if not tasks:
+            return
+
+        ordered = sorted(tasks, key = lambda task: task.get_id_num())
+        for start in range(0, len(ordered), FRAME_RECORDS):
+            chunk = ordered[start:start + FRAME_RECORDS]
+            lines = [json.dumps(_record(task, grp)) for task in chunk]
+            self._frames.append(self._append(TASK_FRAME, lines, chunk[0].get_id_num(), chunk[-1].get_id_num()))
+        grp.archive_tasks(tasks)
+
+
+    def search(self, text = "", limit = None):
+        """
+        Returns a list of up to limit (position, record) pairs
+        of the archived tasks whose name or description holds
+        a text, ignoring case. Records are dictionaries of the
+        fields of the task along with the uid of its group.
+        """
+
+        text = text.lower()
+        matches = []
+        seen = set()
+        for offset, _, _, _, _ in self._frames:
+            for line_number, line in enumerate(self._read(offset)):
+                if text not in line.lower() or (offset, line_number) in self._restored:
+                    continue
+                record = json.loads(line)
+                # A crash before the groups were saved can leave a
+                # task archived twice, only its first record counts
+                if record["uid"] in seen:
+                    continue
+                if text in record["name"].lower() or text in record["description"].lower():
+                    seen.add(record["uid"])
+                    matches.append(((offset, line_number), record))
+                    if limit is not None and len(matches) >= limit:
+                        return matches
+        return matches
+
+
+    def restore(self, groups, uid, task_id = None):
+        """
+        Moves the archived task with the given uid back to
+        the end of its group and returns it, only reading the
+        frames that can hold its identification number when
+        one is given. A task that is still in its group, left
+        there by a crash before the group was saved, is
+        returned as it is. The groups should be saved and
+        commit() called next. Raises a LookupError when there
+        is no such task or its group no longer exists.
+        """
+
+        marker = f'"uid": {uid},'
+        record = None
+        positions = []
+        for offset, _, _, low, high in self._frames:
+            if task_id is not None and not low <= task_id <= high:
+                continue
+            for line_number, line in enumerate(self._read(offset)):
+                if marker not in line or (offset, line_number) in self._restored:
+                    continue
+                found = json.loads(line)
+                if found["uid"] != uid:
+                    continue
+                record = record or found
+                positions.append((offset, line_number))
+        if record is None:
+            raise LookupError(f"No archived task with uid {uid}")
+
+        grp = next((grp for grp in groups if grp.get_uid() == record["group"]), None)
+        if grp is None:
+            raise LookupError(f"The group of archived task {record['id']} no longer exists")
+        task = next((task for task in grp.get_tasks() if task.get_uid() == uid), None)
+        if task is None:
+            task = _build(record)
+            grp.add_task(task)
+        for position in positions:
+            self._restored.add(position)
+            self._unsaved.append(list(position))
+        return task
+
+
+    def find(self, task_id):
+        """
+        Returns the list of uids of the archived tasks that
+        have not been restored and hold a given identification
+        number, since numbers handed out before they were
+        unique can be shared.
+        """
+
+        marker = f'"id": {task_id},'
+        uids = []
+        for offset, _, _, low, high in self._frames:
+            if not low <= task_id <= high:
+                continue
+            for line_number, line in enumerate(self._read(offset)):
+                if marker not in line or (offset, line_number) in self._restored:
+                    continue
+                record = json.loads(line)
+                if record["id"] == task_id and record["uid"] not in uids:
+                    uids.append(record["uid"])
+        return uids
+
+
+    def commit(self):
+        """
+        Marks the records restored since the last commit as
+        restored in the archive file, to be called once the
+        groups holding the restored tasks are saved.
+        """
+
+        if self._unsaved:
+            self._append(RESTORED_FRAME, [json.dumps(self._unsaved)])
+            self._unsaved = []
+
+
+    def count(self):
+        """
+        Returns the number of archived tasks that have not
+        been restored.
+        """
+
+        return sum(frame[1] for frame in self._frames) - len(self._restored)
+
+
+    def archived_days(self):
+        """
+        Returns a dictionary mapping the uid of every group
+        to a list of (ordinal, seconds) pairs of the time
+        tracked on its archived tasks, so the time stats keep
+        the history of tasks that left the groups. Reads every
+        frame, each task counted once.
+        """
+
+        days = {}
+        seen = set()
+        for offset, _, _, _, _ in self._frames:
+            for line_number, line in enumerate(self._read(offset)):
+                if (offset, line_number) in self._restored:
+                    continue
+                record = json.loads(line)
+                if record["uid"] in seen:
+                    continue
+                seen.add(record["uid"])
+                totals = days.setdefault(record["group"], {})
+                for start, stop in record["intervals"]:
+                    for ordinal, seconds in split_days(start, stop):
+                        totals[ordinal] = totals.get(ordinal, 0) + seconds
+        return {uid: sorted(totals.items()) for uid, totals in days.items()}
+
+
+    def max_id(self):
+        """
+        Returns the largest identification number of any
+        archived task, 0 when there is none.
+        """
+
+        return max((frame[4] for frame in self._frames), default = 0)
+
+
+    def _append(self, kind, lines, low = 0, high = 0):
+        """
+        Compresses lines into a frame at the end of the file
+        and returns the offset, line count, length and range
+        of ids of the frame.
+        """
+
+        data = zlib.compress("\n".join(lines).encode("utf-8"))
+        folder = os.path.dirname(self._path)
+        if folder:
+            os.makedirs(folder, exist_ok = True)
+        with open(self._path, "ab") as file:
+            file.truncate(self._size)
+            file.write(FRAME.pack(kind, len(lines), len(data), low, high))
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        offset = self._size + FRAME.size
+        self._size = offset + len(data)
+        return (offset, len(lines), len(data), low, high)
+
+
+    def _read(self, offset):
+        """
+        Returns the decompressed lines of the frame at a
+        given offset.
+        """
+
+        with open(self._path, "rb") as file:
+            file.seek(offset - FRAME.size)
+            length = FRAME.unpack(file.read(FRAME.size))[2]
+            data = file.read(length)
+        # The records of a damaged frame cannot be read, the
+        # other frames still can
+        try:
+            return zlib.decompress(data).decode("utf-8").split("\n")
+        except (zlib.error, UnicodeDecodeError):
+            return []
+
+
+def _record(task, grp):
+    """
+    Returns a dictionary of every field of a task along
+    with the uid of its group.
+    """
+
+    recurrence = task.get_recurrence()
+    return {
+        "group": grp.get_uid(),
+        "uid": task.get_uid(),
+        "id": task.get_id_num(),
+        "name": task.get_name(),
+        "date": task.get_date(),
+        "priority": task.get_priority().value,
+        "description": task.get_description(),
+        "complete": task.get_completion(),
+        "recurrence": None if recurrence is None else [
+            recurrence.get_frequency().value,
+            recurrence.get_interval(),
+            recurrence.get_until()
+        ],
+        "occurrences": sorted(task.get_completed_occurrences()),
+        "attachments": list(task.get_attachments()),
+        "intervals": task.get_intervals()
+    }
+
+
+def _build(record):
+    """
+    Builds a task from an archived record.
+    """
+
+    task = Task(record["id"], record["name"], record["date"], Priority(record["priority"]), record["complete"])
+    task.set_uid(record["uid"])
+    task.set_description(record["description"])
+    if record["recurrence"] is not None:
+        frequency, interval, until = record["recurrence"]
+        task.set_recurrence(Recurrence(Frequency(frequency), interval, until))
+        for ordinal in record["occurrences"]:
+            task.set_occurrence_completion(ordinal_date(ordinal), True)
+    for path in record["attachments"]:
+        task.add_attachment(path)
+    for start, stop in record["intervals"]:
+        task.add_interval(start, stop)
+    return task
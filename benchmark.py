@@ -0,0 +1,410 @@
+import argparse
+from datetime import date
+import gc
+import os
+import random
+import tempfile
+import threading
+import time
+import tkinter as tk
+import tracemalloc
+
+from archive import Archive
+import events
+from group import Group
+from maintenance import Maintenance, WORKERS
+from palette import PaletteIndex
+from rpc import TaskApi, RpcServer, RpcClient
+from snapshot import write_snapshot
+from task import Task, ordinal_date
+from view import GroupView
+import workload
+
+
+def report(name, count, seconds):
+    """
+    Prints the throughput of a benchmarked operation.
+    """
+
+    print(f"{name:<28} {count:>9} ops {seconds:>9.3f} s {count / seconds:>12.0f} ops/s")
+
+
+def bench_rpc(args):
+    """
+    Measures the throughput of the JSON-RPC automation API
+    with a local client over a single reused connection,
+    while a real Tk event loop runs the calls.
+    """
+
+    root = tk.Tk()
+    root.withdraw()
+    server = RpcServer(root, TaskApi([]), ("127.0.0.1", 0))
+    server.start()
+    state = {"done": False, "error": None}
+
+    def client():
+        try:
+            rpc = RpcClient(server.get_address())
+            group = rpc.call("group.create", name = "Benchmark")["group"]
+
+            start = time.perf_counter()
+            ids = [rpc.call("task.create", group = group, name = f"Task {index}")["id"] for index in range(args.calls)]
+            report("task.create (single)", args.calls, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for task_id in ids:
+                rpc.call("task.get", group = group, id = task_id)
+            report("task.get (single)", args.calls, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for offset in range(0, len(ids), args.batch):
+                rpc.batch([
+                    ("task.update", {"group": group, "id": task_id, "complete": True})
+                    for task_id in ids[offset:offset + args.batch]
+                ])
+            report(f"task.update (batch of {args.batch})", len(ids), time.perf_counter() - start)
+
+            tasks = [{"name": f"Bulk {index}", "date": "01-01-2030"} for index in range(args.bulk)]
+            start = time.perf_counter()
+            rpc.call("task.bulk_create", group = group, tasks = tasks)
+            report("task.bulk_create", args.bulk, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in range(args.queries):
+                rpc.call("task.query", complete = False, sort = "name", limit = 50)
+            report("task.query", args.queries, time.perf_counter() - start)
+            rpc.close()
+        except Exception as error:
+            state["error"] = error
+        state["done"] = True
+
+    def check():
+        if state["done"]:
+            root.quit()
+        else:
+            root.after(10, check)
+
+    thread = threading.Thread(target = client, daemon = True)
+    thread.start()
+    root.after(10, check)
+    root.mainloop()
+    server.stop()
+    root.destroy()
+    if state["error"] is not None:
+        raise state["error"]
+
+
+def bench_events(args):
+    """
+    Measures what the change notifications add to the Task
+    setters, from a bare attribute assignment up to a task
+    observed by a sorted group view.
+    """
+
+    names = [f"Task {index}" for index in range(args.changes)]
+    task = Task(0, "Task")
+
+    start = time.perf_counter()
+    for name in names:
+        task._name = name
+    report("attribute assignment", args.changes, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for name in names:
+        task.set_name(name)
+    report("set_name (no observers)", args.changes, time.perf_counter() - start)
+
+    task.add_observer(lambda event: None)
+    start = time.perf_counter()
+    for name in names:
+        task.set_name(name)
+    report("set_name (one observer)", args.changes, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with events.batch():
+        for name in names:
+            task.set_name(name)
+    report("set_name (batched)", args.changes, time.perf_counter() - start)
+
+    grp = Group("Benchmark")
+    grp.set_tasks([Task(index, f"Task {index}") for index in range(args.tasks)])
+    view = GroupView(grp, "name")
+    view.get_tasks()
+    tasks = grp.get_tasks()
+    start = time.perf_counter()
+    for index, name in enumerate(names):
+        tasks[index % args.tasks].set_name(name)
+    report(f"set_name (view of {args.tasks})", args.changes, time.perf_counter() - start)
+    view.detach()
+
+
+def bench_palette(args):
+    """
+    Types queries into the command palette index one
+    keystroke at a time on a generated dataset and prints
+    latency percentiles per keystroke. Queries are the start
+    of task names, their consonants only, and words that
+    match nothing.
+    """
+
+    groups = workload.generate_groups(args.groups, args.tasks, seed = args.seed)
+    index = PaletteIndex()
+    start = time.perf_counter()
+    index.add_groups(groups)
+    report("build", index.size(), time.perf_counter() - start)
+
+    rng = random.Random(args.seed)
+    tasks = [task for grp in groups for task in grp.get_tasks()]
+    queries = [("miss", "xylophone quartz")]
+    for _ in range(args.queries):
+        words = rng.choice(tasks).get_name().lower().split()
+        queries.append(("prefix", " ".join(words[:2]) + " " + words[2][:2]))
+        queries.append(("fuzzy", " ".join(word.strip("aeiou")[:3] for word in words[:2])))
+
+    timings = {}
+    for kind, query in queries:
+        for stop in range(1, len(query) + 1):
+            start = time.perf_counter()
+            index.search(query[:stop])
+            timings.setdefault(kind, []).append(time.perf_counter() - start)
+
+    renamed = tasks[:args.queries]
+    start = time.perf_counter()
+    for task in renamed:
+        task.set_name(task.get_name() + " renamed")
+    timings["rename"] = [(time.perf_counter() - start) / len(renamed)]
+
+    print(f"{index.size()} candidates, {len(queries)} queries")
+    header = "".join(f"{f'p{percent}':>10}" for percent in workload.PERCENTILES)
+    print(f"{'keystroke':<14}{'count':>7}{header}{'max':>10}  (ms)")
+    for operation, count, *values in workload.summarize(timings):
+        print(f"{operation:<14}{count:>7}" + "".join(f"{value:>10.2f}" for value in values))
+
+
+def bench_archive(args):
+    """
+    Measures opening the page of a large group, its memory
+    and its snapshot before and after archiving the share of
+    its tasks that are old and completed, then searching and
+    restoring archived tasks. Opening a page is timed as
+    building and sorting its view.
+    """
+
+    def build():
+        grp = workload.generate_groups(1, args.tasks, undated = 0, recurring = 0, seed = args.seed)[0]
+        old = ordinal_date(date.today().toordinal() - args.days - 1)
+        rng = random.Random(args.seed)
+        for task in grp.get_tasks():
+            done = rng.random() < args.share
+            task.set_completion(done)
+            if done:
+                task.set_date(old)
+        return grp
+
+    def page(grp):
+        samples = []
+        for _ in range(args.opens):
+            start = time.perf_counter()
+            view = GroupView(grp, "date")
+            view.get_tasks()
+            samples.append(time.perf_counter() - start)
+            view.detach()
+        return workload.percentile(samples, 50)
+
+    def traced(grp):
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0]
+
+    with tempfile.TemporaryDirectory() as folder:
+        archive_file = os.path.join(folder, "bench.ktarc")
+        archive = Archive(archive_file)
+        snapshot = os.path.join(folder, "bench.ktsnap")
+        grp = build()
+        rows = []
+
+        for label in ("before", "after"):
+            if label == "after":
+                start = time.perf_counter()
+                moved = archive.sweep([grp], args.days)
+                report("archive sweep", moved, time.perf_counter() - start)
+            start = time.perf_counter()
+            write_snapshot(snapshot, [grp])
+            written = time.perf_counter() - start
+            rows.append((label, len(grp.get_tasks()), page(grp), written, os.path.getsize(snapshot)))
+
+        queries = [task.get_name().split()[0].lower() for task in random.Random(args.seed).sample(grp.get_tasks(), 5)]
+        start = time.perf_counter()
+        for query in queries:
+            archive.search(query, 20)
+        report("archive search (20 hits)", len(queries), time.perf_counter() - start)
+
+        records = [record for _, record in archive.search(limit = args.restores)]
+        start = time.perf_counter()
+        for record in records:
+            archive.restore([grp], record["uid"], record["id"])
+        archive.commit()
+        report("archive restore", len(records), time.perf_counter() - start)
+        archived = os.path.getsize(archive_file)
+
+        tracemalloc.start()
+        memory = {"before": traced(build())}
+        grp = build()
+        Archive(os.path.join(folder, "memory.ktarc")).sweep([grp], args.days)
+        memory["after"] = traced(grp)
+        tracemalloc.stop()
+
+    print(f"{archive.count()} tasks archived in {archived / 1024:.0f} KiB")
+    print(f"{'':<8}{'tasks':>9}{'page (ms)':>12}{'save (ms)':>12}{'snapshot':>12}{'memory':>12}")
+    for label, count, opened, written, size in rows:
+        print(
+            f"{label:<8}{count:>9}{opened * 1000:>12.2f}{written * 1000:>12.2f}"
+            f"{size / 1024:>9.0f} KiB{memory[label] / 1048576:>8.1f} MiB"
+        )
+
+
+def bench_maintenance(args):
+    """
+    Measures compacting and verifying a snapshot of a
+    generated dataset with every number of worker processes
+    from 1 up to a maximum, speedups are against a single
+    worker. Each pool is started before it is timed.
+    """
+
+    groups = workload.generate_groups(args.groups, args.tasks, args.skew, seed = args.seed)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "tasks.ktsnap")
+        compacted = os.path.join(folder, "compacted.ktsnap")
+        warmup = os.path.join(folder, "warmup.ktsnap")
+        start = time.perf_counter()
+        write_snapshot(path, groups)
+        write_snapshot(warmup, [Group(f"Warmup {index}") for index in range(args.workers)])
+        print(f"{args.groups} groups, {args.tasks} tasks, skew {args.skew}, {os.cpu_count()} cores")
+        print(f"snapshot written in {time.perf_counter() - start:.3f} s, {os.path.getsize(path) / 1048576:.1f} MiB")
+        largest = max(grp.get_task_count() for grp in groups)
+        print(f"largest group holds {largest / args.tasks:.0%} of the tasks")
+
+        print(f"{'workers':<10}{'compact (s)':>13}{'speedup':>9}{'verify (s)':>13}{'speedup':>9}")
+        baseline = None
+        for workers in range(1, args.workers + 1):
+            maintenance = Maintenance(workers)
+            maintenance.verify(warmup).result()
+            start = time.perf_counter()
+            maintenance.compact(path, compacted).result()
+            compact = time.perf_counter() - start
+            start = time.perf_counter()
+            damaged = maintenance.verify(compacted).result()
+            verify = time.perf_counter() - start
+            maintenance.shutdown()
+            if damaged:
+                raise ValueError(f"Damaged groups after compacting: {', '.join(damaged)}")
+            if baseline is None:
+                baseline = (compact, verify)
+            print(f"{workers:<10}{compact:>13.3f}{baseline[0] / compact:>8.2f}x{verify:>13.3f}{baseline[1] / verify:>8.2f}x")
+
+
+def bench_scale(args):
+    """
+    Replays a scripted user session against the real Window
+    on a generated dataset and prints latency percentiles per
+    operation. Needs a display, run it under xvfb-run on
+    machines without one.
+    """
+
+    from window import Window
+
+    groups = workload.generate_groups(args.groups, args.tasks, args.skew, seed = args.seed)
+    if args.session is not None:
+        with open(args.session, encoding = "utf-8") as file:
+            script = workload.read_session(file)
+    else:
+        sizes = [grp.get_task_count() for grp in groups]
+        script = workload.generate_session(sizes, args.steps, args.seed)
+    if args.save_session is not None:
+        with open(args.save_session, "w", encoding = "utf-8") as file:
+            workload.write_session(script, file)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "tasks.ktsnap")
+        write_snapshot(path, groups)
+
+        start = time.perf_counter()
+        window = Window(path)
+        window.root.update()
+        startup = time.perf_counter() - start
+
+        timings = workload.replay(window, script)
+        timings = dict([("startup", [startup])] + list(timings.items()))
+        window.release_page()
+        window.reminders.stop()
+        window.recent.shutdown()
+        if window.snapshot is not None:
+            window.snapshot.close()
+        window.root.destroy()
+
+    print(f"{args.groups} groups, {args.tasks} tasks, skew {args.skew}, {len(script)} steps")
+    header = "".join(f"{f'p{percent}':>10}" for percent in workload.PERCENTILES)
+    print(f"{'operation':<14}{'count':>7}{header}{'max':>10}  (ms)")
+    for operation, count, *values in workload.summarize(timings):
+        print(f"{operation:<14}{count:>7}" + "".join(f"{value:>10.2f}" for value in values))
+
+
+def main():
+    """
+    Parses the command line and runs the chosen benchmark.
+    """
+
+    parser = argparse.ArgumentParser(prog = "benchmark", description = "KittyTask benchmarks")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    rpc_parser = commands.add_parser("rpc", help = "throughput of the JSON-RPC automation API")
+    rpc_parser.add_argument("--calls", type = int, default = 2000)
+    rpc_parser.add_argument("--batch", type = int, default = 100)
+    rpc_parser.add_argument("--bulk", type = int, default = 100000)
+    rpc_parser.add_argument("--queries", type = int, default = 50)
+    rpc_parser.set_defaults(run = bench_rpc)
+
+    events_parser = commands.add_parser("events", help = "overhead of the change notifications")
+    events_parser.add_argument("--changes", type = int, default = 1000000)
+    events_parser.add_argument("--tasks", type = int, default = 10000)
+    events_parser.set_defaults(run = bench_events)
+
+    scale_parser = commands.add_parser("scale", help = "latency of a replayed session on a generated dataset")
+    scale_parser.add_argument("--groups", type = int, default = 20)
+    scale_parser.add_argument("--tasks", type = int, default = 10000)
+    scale_parser.add_argument("--skew", type = float, default = 1.0, help = "Zipf exponent of the group sizes")
+    scale_parser.add_argument("--steps", type = int, default = 200)
+    scale_parser.add_argument("--seed", type = int, default = 0)
+    scale_parser.add_argument("--session", help = "replay a session file instead of a generated one")
+    scale_parser.add_argument("--save-session", help = "write the replayed session to a file")
+    scale_parser.set_defaults(run = bench_scale)
+
+    palette_parser = commands.add_parser("palette", help = "keystroke latency of the command palette")
+    palette_parser.add_argument("--groups", type = int, default = 50)
+    palette_parser.add_argument("--tasks", type = int, default = 500000)
+    palette_parser.add_argument("--queries", type = int, default = 100)
+    palette_parser.add_argument("--seed", type = int, default = 0)
+    palette_parser.set_defaults(run = bench_palette)
+
+    maintenance_parser = commands.add_parser("maintenance", help = "scaling of snapshot compaction and verification with workers")
+    maintenance_parser.add_argument("--groups", type = int, default = 32)
+    maintenance_parser.add_argument("--tasks", type = int, default = 200000)
+    maintenance_parser.add_argument("--skew", type = float, default = 0.5, help = "Zipf exponent of the group sizes")
+    maintenance_parser.add_argument("--workers", type = int, default = max(WORKERS, 4), help = "most worker processes")
+    maintenance_parser.add_argument("--seed", type = int, default = 0)
+    maintenance_parser.set_defaults(run = bench_maintenance)
+
+    archive_parser = commands.add_parser("archive", help = "page open, memory and snapshot size before and after archiving")
+    archive_parser.add_argument("--tasks", type = int, default = 200000, help = "tasks in the group")
+    archive_parser.add_argument("--share", type = float, default = 0.9, help = "share of old completed tasks")
+    archive_parser.add_argument("--days", type = int, default = 30, help = "days past the due date to archive")
+    archive_parser.add_argument("--opens", type = int, default = 5, help = "page opens timed")
+    archive_parser.add_argument("--restores", type = int, default = 100, help = "archived tasks restored")
+    archive_parser.add_argument("--seed", type = int, default = 0)
+    archive_parser.set_defaults(run = bench_archive)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,594 @@
+import argparse
+from datetime import date as Date
+import os
+import shlex
+import sys
+
+from task import Task, IdAllocator, Priority, NO_DATE, date_ordinal
+from group import Group
+from archive import Archive, ARCHIVE_DAYS, archive_path
+from dependency import DependencyGraph
+from timelog import TimeStats, month_range, week_range
+from snapshot import Snapshot, SAVE_PATH, write_snapshot
+from sync import Replica, replica_path
+
+
+class Session:
+    """
+    A class built to work on the save file without the GUI.
+
+    Read-only commands are answered straight from the columns
+    of the memory mapped snapshot. The groups are only built
+    once a command changes something, and the save file is
+    written once at the end of the session no matter how many
+    commands were run.
+
+    Attributes:
+    --------------------
+    _path : str
+        The path of the save file.
+    _snapshot : Snapshot
+        The open save file, None when there is none.
+    _groups : list
+        The built groups, None until a command needs them.
+    _dependencies : DependencyGraph
+        The dependencies between the tasks of the built
+        groups, kept so saving does not drop them.
+    _replica : Replica
+        The log of changes merged with other machines,
+        None until a command needs the groups.
+    _archive : Archive
+        The compressed cold storage of old completed tasks.
+    _task_ids : IdAllocator
+        Hands out the identification numbers of new tasks,
+        None until a command needs the groups.
+    _dirty : bool
+        Whether a command changed something that has not
+        been saved yet.
+
+    Methods:
+    --------------------
+    rows()
+        Returns the rows of the tasks of one or every group.
+    add()
+        Adds a task to a group.
+    done()
+        Marks a task as completed.
+    block()
+        Makes a task wait for another task.
+    timer()
+        Starts or stops the timer of a task.
+    hours()
+        Returns the hours tracked on every group.
+    sync()
+        Merges the replica log of another machine.
+    archive()
+        Moves old completed tasks to the archive.
+    archived()
+        Returns the archived tasks matching a text.
+    restore()
+        Moves an archived task back to its group.
+    compact()
+        Rewrites the save file with worker processes.
+    verify()
+        Checks every group of the save file.
+    export()
+        Writes every group and task as JSON or CSV.
+    save()
+        Writes the save file if anything changed.
+    close()
+        Closes the save file.
+    """
+
+    def __init__(self, path = SAVE_PATH):
+        """
+        A one-argument constructor for the class that
+        accepts the path of the save file.
+        """
+
+        self._path = path
+        self._snapshot = Snapshot(path) if os.path.exists(path) else None
+        self._groups = None
+        self._dependencies = DependencyGraph()
+        self._replica = None
+        self._archive = Archive(archive_path(path))
+        self._task_ids = None
+        self._dirty = False
+
+
+    def rows(self, group = None, only_open = False):
+        """
+        Returns a list of (id, group, date, priority, complete,
+        name) rows for the tasks of one or every group.
+        """
+
+        if self._groups is None and self._snapshot is not None:
+            snapshot = self._snapshot
+            rows = []
+            for index in range(snapshot.group_count()):
+                name = snapshot.group_name(index)
+                if group is not None and name != group:
+                    continue
+                for task_index in snapshot.group_task_range(index):
+                    complete = snapshot.task_completion(task_index)
+                    if only_open and complete:
+                        continue
+                    rows.append((
+                        snapshot.task_id(task_index),
+                        name,
+                        snapshot.task_date(task_index),
+                        snapshot.task_priority(task_index),
+                        complete,
+                        snapshot.task_name(task_index)
+                    ))
+            return rows
+
+        return [
+            (task.get_id_num(), grp.get_name(), task.get_date(), task.get_priority(), task.get_completion(), task.get_name())
+            for grp in self._groups or []
+            if group is None or grp.get_name() == group
+            for task in grp.get_tasks()
+            if not (only_open and task.get_completion())
+        ]
+
+
+    def add(self, group, name, date = NO_DATE, priority = Priority.LOW):
+        """
+        Adds a task to the group with the given name, creating
+        the group if it does not exist, and returns the task.
+        """
+
+        groups = self._load()
+        grp = next((grp for grp in groups if grp.get_name() == group), None)
+        if grp is None:
+            grp = Group(group)
+            groups.append(grp)
+            self._replica.add_group(grp)
+
+        task = Task(self._task_ids.next_id(), name, date, priority)
+        grp.add_task(task)
+        self._dirty = True
+        return task
+
+
+    def done(self, task_id, group = None, complete = True):
+        """
+        Sets the completion status of the task with the given
+        identification number and returns it.
+        """
+
+        for grp in self._load():
+            if group is not None and grp.get_name() != group:
+                continue
+            for task in grp.get_tasks():
+                if task.get_id_num() == task_id:
+                    task.set_completion(complete)
+                    self._dirty = True
+                    return task
+        raise LookupError(f"No task with id {task_id}")
+
+
+    def block(self, blocker_id, task_id, blocked = True):
+        """
+        Makes the task with the given identification number
+        wait for the blocker to be completed, or removes that
+        wait when blocked is False.
+        """
+
+        blocker = self._find(blocker_id)
+        task = self._find(task_id)
+        if blocked:
+            self._dependencies.add_dependency(blocker, task)
+        else:
+            self._dependencies.remove_dependency(blocker, task)
+        self._dirty = True
+        return task
+
+
+    def timer(self, task_id, running = True):
+        """
+        Starts or stops the timer of the task with the given
+        identification number and returns the task.
+        """
+
+        task = self._find(task_id)
+        if running:
+            task.start_timer()
+        else:
+            task.stop_timer()
+        self._dirty = True
+        return task
+
+
+    def hours(self, first, last):
+        """
+        Returns a list of (group name, hours) pairs for the
+        time tracked on every group between two day ordinals.
+        """
+
+        stats = TimeStats()
+        archived = self._archive.archived_days()
+        for grp in self._load():
+            stats.add_group(grp)
+            stats.add_archived(grp, archived.get(grp.get_uid(), ()))
+        return [(grp.get_name(), hours) for grp, hours in stats.group_hours(first, last)]
+
+
+    def sync(self, path):
+        """
+        Merges the changes logged by the replica of another
+        machine and returns the number of fields changed.
+        """
+
+        self._load()
+        changes = self._replica.merge(path)
+        self._dirty = True
+        return changes
+
+
+    def archive(self, days = ARCHIVE_DAYS):
+        """
+        Moves the completed tasks due more than a number of
+        days ago to the archive and returns how many moved.
+        """
+
+        count = self._archive.sweep(self._load(), days)
+        if count:
+            self._dirty = True
+        return count
+
+
+    def archived(self, text = "", limit = None):
+        """
+        Returns a list of (id, date, name) rows for the
+        archived tasks whose name or description holds a text.
+        """
+
+        return [
+            (record["id"], record["date"], record["name"])
+            for _, record in self._archive.search(text, limit)
+        ]
+
+
+    def restore(self, task_id):
+        """
+        Moves the archived task with the given identification
+        number back to its group and returns it. Raises a
+        LookupError when no archived task or more than one
+        holds the number.
+        """
+
+        groups = self._load()
+        uids = self._archive.find(task_id)
+        if not uids:
+            raise LookupError(f"No archived task with id {task_id}")
+        if len(uids) > 1:
+            raise LookupError(f"{len(uids)} archived tasks share id {task_id}")
+        task = self._archive.restore(groups, uids[0], task_id)
+        self._dirty = True
+        return task
+
+
+    def compact(self, workers = None):
+        """
+        Saves any changes, then rewrites the save file in
+        the current format with a number of worker processes
+        and returns the number of groups written.
+        """
+
+        if self._snapshot is None and not self._dirty:
+            raise LookupError(f"No save file at {self._path}")
+
+        # Imported here so other commands do not pay for it
+        from maintenance import Maintenance
+
+        self.save()
+        self.close()
+        maintenance = Maintenance(workers)
+        try:
+            count = maintenance.compact(self._path).result()
+        finally:
+            maintenance.shutdown()
+        if self._groups is None:
+            self._snapshot = Snapshot(self._path)
+        return count
+
+
+    def verify(self, workers = None):
+        """
+        Checks every group of the save file with a number
+        of worker processes and returns the names of the
+        damaged groups.
+        """
+
+        if self._snapshot is None:
+            raise LookupError(f"No save file at {self._path}")
+
+        from maintenance import Maintenance
+        maintenance = Maintenance(workers)
+        try:
+            return maintenance.verify(self._path).result()
+        finally:
+            maintenance.shutdown()
+
+
+    def export(self, file, form = "json"):
+        """
+        Writes every group and task to a file as JSON or CSV.
+        """
+
+        groups = self._load()
+        if form == "csv":
+            import csv
+            writer = csv.writer(file)
+            writer.writerow(("group", "id", "name", "date", "priority", "complete", "description"))
+            for grp in groups:
+                for task in grp.get_tasks():
+                    writer.writerow((
+                        grp.get_name(),
+                        task.get_id_num(),
+                        task.get_name(),
+                        task.get_date(),
+                        task.get_priority().name,
+                        int(task.get_completion()),
+                        task.get_description()
+                    ))
+            return
+
+        import json
+        json.dump(
+            {"groups": [
+                {
+                    "name": grp.get_name(),
+                    "color": grp.get_color(),
+                    "description": grp.get_description(),
+                    "tasks": [
+                        {
+                            "id": task.get_id_num(),
+                            "name": task.get_name(),
+                            "date": task.get_date(),
+                            "priority": task.get_priority().name,
+                            "complete": task.get_completion(),
+                            "description": task.get_description()
+                        }
+                        for task in grp.get_tasks()
+                    ]
+                }
+                for grp in groups
+            ]},
+            file,
+            indent = 2
+        )
+        file.write("\n")
+
+
+    def save(self):
+        """
+        Writes the save file and the replica log if any
+        command changed something.
+        """
+
+        if not self._dirty and (self._replica is None or not self._replica.pending()):
+            return
+
+        for grp in self._groups:
+            grp.get_tasks()
+        self.close()
+        write_snapshot(self._path, self._groups, self._dependencies)
+        self._archive.commit()
+        self._replica.save()
+        self._dirty = False
+
+
+    def close(self):
+        """
+        Closes the save file, groups that have been built
+        keep working afterwards.
+        """
+
+        if self._snapshot is not None:
+            if self._groups is not None:
+                for grp in self._groups:
+                    grp.get_tasks()
+            self._snapshot.close()
+            self._snapshot = None
+
+
+    def _find(self, task_id):
+        """
+        Returns the task with a given identification number
+        from any group or raises an error.
+        """
+
+        for grp in self._load():
+            for task in grp.get_tasks():
+                if task.get_id_num() == task_id:
+                    return task
+        raise LookupError(f"No task with id {task_id}")
+
+
+    def _load(self):
+        """
+        Builds the groups from the save file the first time
+        a command needs them and returns them.
+        """
+
+        if self._groups is None:
+            self._task_ids = IdAllocator(self._archive.max_id())
+            if self._snapshot is not None:
+                self._groups = self._snapshot.load_groups()
+                self._snapshot.load_dependencies(self._dependencies)
+                self._task_ids.reserve(self._snapshot.max_task_id())
+            else:
+                self._groups = []
+            self._replica = Replica(replica_path(self._path), self._groups, task_ids = self._task_ids)
+        return self._groups
+
+
+def build_parser():
+    """
+    Returns the parser of the command line and of every
+    line of a batch.
+    """
+
+    parser = argparse.ArgumentParser(prog = "kittytask", description = "Manage KittyTask tasks without the GUI")
+    parser.add_argument("--file", default = SAVE_PATH, help = "save file to work on")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    add_parser = commands.add_parser("add", help = "add a task to a group")
+    add_parser.add_argument("group")
+    add_parser.add_argument("name")
+    add_parser.add_argument("--date", default = NO_DATE, help = "due date as MM-DD-YYYY")
+    add_parser.add_argument("--priority", default = "LOW", choices = [priority.name for priority in Priority])
+
+    list_parser = commands.add_parser("list", help = "list tasks")
+    list_parser.add_argument("group", nargs = "?")
+    list_parser.add_argument("--open", action = "store_true", help = "only list tasks that are not completed")
+
+    done_parser = commands.add_parser("done", help = "mark a task as completed")
+    done_parser.add_argument("id", type = int)
+    done_parser.add_argument("--group")
+    done_parser.add_argument("--undo", action = "store_true", help = "mark the task as not completed")
+
+    block_parser = commands.add_parser("block", help = "make a task wait for another task")
+    block_parser.add_argument("blocker", type = int, help = "id of the task to wait for")
+    block_parser.add_argument("id", type = int, help = "id of the waiting task")
+    block_parser.add_argument("--undo", action = "store_true", help = "remove the wait")
+
+    timer_parser = commands.add_parser("timer", help = "start or stop tracking time on a task")
+    timer_parser.add_argument("id", type = int)
+    timer_parser.add_argument("action", choices = ("start", "stop"))
+
+    stats_parser = commands.add_parser("stats", help = "hours tracked per group")
+    stats_parser.add_argument("--period", default = "month", choices = ("week", "month"))
+
+    sync_parser = commands.add_parser("sync", help = "merge the changes of another machine")
+    sync_parser.add_argument("replica", help = "replica log (.ktlog) copied from the other machine")
+
+    archive_parser = commands.add_parser("archive", help = "move old completed tasks to the archive")
+    archive_parser.add_argument("--days", type = int, default = ARCHIVE_DAYS, help = "days past the due date")
+
+    archived_parser = commands.add_parser("archived", help = "search the archived tasks")
+    archived_parser.add_argument("text", nargs = "?", default = "")
+    archived_parser.add_argument("--limit", type = int)
+
+    restore_parser = commands.add_parser("restore", help = "move an archived task back to its group")
+    restore_parser.add_argument("id", type = int)
+
+    compact_parser = commands.add_parser("compact", help = "rewrite the save file in the current format")
+    compact_parser.add_argument("--workers", type = int, help = "worker processes, one per core by default")
+
+    verify_parser = commands.add_parser("verify", help = "check the save file for damaged groups")
+    verify_parser.add_argument("--workers", type = int, help = "worker processes, one per core by default")
+
+    export_parser = commands.add_parser("export", help = "export every group and task")
+    export_parser.add_argument("--format", default = "json", choices = ("json", "csv"))
+    export_parser.add_argument("--output", help = "file to write instead of standard output")
+
+    commands.add_parser("batch", help = "run one command per line of standard input")
+    return parser
+
+
+def run(session, args, out):
+    """
+    Runs a single parsed command against a session.
+    """
+
+    if args.command == "add":
+        if args.date != NO_DATE and date_ordinal(args.date) is None:
+            raise ValueError(f"Invalid date: {args.date}")
+        task = session.add(args.group, args.name, args.date, Priority[args.priority])
+        out.write(f"{task.get_id_num()}\n")
+    elif args.command == "list":
+        for task_id, group, date, priority, complete, name in session.rows(args.group, args.open):
+            out.write(f"{task_id:>6}  {'x' if complete else ' '}  {date:<10}  {priority.name:<4}  {group}: {name}\n")
+    elif args.command == "done":
+        session.done(args.id, args.group, not args.undo)
+    elif args.command == "block":
+        session.block(args.blocker, args.id, not args.undo)
+    elif args.command == "timer":
+        session.timer(args.id, args.action == "start")
+    elif args.command == "stats":
+        first, last = (week_range if args.period == "week" else month_range)(Date.today())
+        for name, hours in session.hours(first, last):
+            out.write(f"{hours:>8.1f} h  {name}\n")
+    elif args.command == "sync":
+        out.write(f"{session.sync(args.replica)} changes merged\n")
+    elif args.command == "archive":
+        out.write(f"{session.archive(args.days)} tasks archived\n")
+    elif args.command == "archived":
+        for task_id, date, name in session.archived(args.text, args.limit):
+            out.write(f"{task_id:>6}  {date:<10}  {name}\n")
+    elif args.command == "restore":
+        session.restore(args.id)
+    elif args.command == "compact":
+        out.write(f"{session.compact(args.workers)} groups compacted\n")
+    elif args.command == "verify":
+        damaged = session.verify(args.workers)
+        if damaged:
+            raise ValueError(f"Damaged groups: {', '.join(damaged)}")
+        out.write("All groups verified\n")
+    elif args.command == "export":
+        if args.output is None:
+            session.export(out, args.format)
+        else:
+            with open(args.output, "w", encoding = "utf-8", newline = "") as file:
+                session.export(file, args.format)
+
+
+def run_batch(session, parser, lines, out):
+    """
+    Runs one command per line against a single session,
+    blank lines and lines starting with # are skipped.
+    Returns the number of failed lines.
+    """
+
+    failures = 0
+    for number, line in enumerate(lines, 1):
+        try:
+            words = shlex.split(line, comments = True)
+            if not words:
+                continue
+            args = parser.parse_args(words)
+            if args.command == "batch":
+                raise ValueError("batch cannot be nested")
+            run(session, args, out)
+        except SystemExit:
+            failures += 1
+            sys.stderr.write(f"line {number}: invalid command\n")
+        except (LookupError, ValueError) as error:
+            failures += 1
+            sys.stderr.write(f"line {number}: {error}\n")
+    return failures
+
+
+def main(argv = None):
+    """
+    Runs the command line and returns its exit status.
+    """
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        session = Session(args.file)
+    except ValueError as error:
+        sys.stderr.write(f"kittytask: {error}\n")
+        return 1
+
+    status = 0
+    try:
+        if args.command == "batch":
+            status = 1 if run_batch(session, parser, sys.stdin, sys.stdout) else 0
+        else:
+            run(session, args, sys.stdout)
+        session.save()
+    except (LookupError, ValueError) as error:
+        sys.stderr.write(f"kittytask: {error}\n")
+        status = 1
+    finally:
+        session.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,423 @@
+from events import FieldChanged, TaskRemoved, TasksReplaced, emit
+
+
+class DependencyGraph:
+    """
+    A class built to keep track of tasks that block other
+    tasks, across every group.
+
+    Each task in the graph holds a position in a topological
+    order that is repaired locally when an edge is added
+    (Pearce-Kelly), so only the tasks between the two ends of
+    a backwards edge are moved and a cycle is detected by the
+    same search. Every task also keeps a count of its blockers
+    that are not completed, updated as tasks are completed and
+    reopened, so whether a task is blocked or ready is known
+    without walking the graph.
+
+    Tasks define equality without hashing, so every table is
+    keyed by the id of the task object.
+
+    Attributes:
+    --------------------
+    _tasks : dict
+        Maps the id of each task in the graph to the task.
+    _blockers : dict
+        Maps the id of each task to the set of ids of the
+        tasks that block it.
+    _dependents : dict
+        Maps the id of each task to the set of ids of the
+        tasks it blocks.
+    _position : dict
+        Maps the id of each task to its position in the
+        topological order, blockers always come first.
+    _open : dict
+        Maps the id of each task to its number of blockers
+        that are not completed.
+    _done : dict
+        Maps the id of each task to the completion status
+        the counts were last updated for.
+    _ready : set
+        The ids of the tasks that are not completed and have
+        no open blockers.
+    _next_position : int
+        The position given to the next task added.
+    _groups : list
+        The groups observed so removed tasks leave the graph.
+    _observers : list
+        A list of callbacks that are called with a
+        FieldChanged event for the "blocked" field whenever
+        a task becomes blocked or unblocked.
+
+    Methods:
+    --------------------
+    add_dependency()
+        Makes a task wait for another task.
+    remove_dependency()
+        Removes the wait of a task on another task.
+    remove_task()
+        Removes a task and every edge it is part of.
+    add_group()
+        Starts removing the tasks deleted from a group.
+    remove_group()
+        Removes a deleted group and its tasks.
+    get_blockers()
+        Returns the tasks a task waits for.
+    get_dependents()
+        Returns the tasks waiting for a task.
+    is_blocked()
+        Returns whether a task has open blockers.
+    is_ready()
+        Returns whether a task can be worked on.
+    ready()
+        Returns every task in the graph that can be worked on.
+    order()
+        Returns the tasks in the graph in topological order.
+    edges()
+        Returns every pair of blocker and blocked task.
+    add_observer()
+        Registers a callback to be notified of tasks
+        becoming blocked or unblocked.
+    remove_observer()
+        Unregisters a previously registered callback.
+    """
+
+    def __init__(self):
+        """
+        A constructor for the class that creates an
+        empty graph.
+        """
+
+        self._tasks = {}
+        self._blockers = {}
+        self._dependents = {}
+        self._position = {}
+        self._open = {}
+        self._done = {}
+        self._ready = set()
+        self._next_position = 0
+        self._groups = []
+        self._observers = []
+
+
+    def add_dependency(self, blocker, task):
+        """
+        Makes a task wait until the blocker is completed,
+        raises a ValueError when the edge would create
+        a cycle.
+        """
+
+        if blocker is task:
+            raise ValueError("A task cannot block itself")
+
+        source = id(blocker)
+        target = id(task)
+        if target in self._dependents.get(source, ()):
+            return
+
+        self._track(blocker)
+        self._track(task)
+        if self._position[source] > self._position[target]:
+            self._reorder(source, target)
+
+        self._dependents[source].add(target)
+        self._blockers[target].add(source)
+        if not self._done[source]:
+            self._adjust(target, 1)
+
+
+    def remove_dependency(self, blocker, task):
+        """
+        Removes the wait of a task on the blocker, nothing
+        happens when there is no such edge.
+        """
+
+        source = id(blocker)
+        target = id(task)
+        if target not in self._dependents.get(source, ()):
+            return
+
+        self._dependents[source].discard(target)
+        self._blockers[target].discard(source)
+        if not self._done[source]:
+            self._adjust(target, -1)
+        self._untrack_if_isolated(source)
+        self._untrack_if_isolated(target)
+
+
+    def remove_task(self, task):
+        """
+        Removes a task and every edge it is part of,
+        the tasks it blocked are unblocked.
+        """
+
+        key = id(task)
+        if key not in self._tasks:
+            return
+
+        for target in list(self._dependents[key]):
+            self.remove_dependency(task, self._tasks[target])
+        for source in list(self._blockers.get(key, ())):
+            self.remove_dependency(self._tasks[source], task)
+
+
+    def add_group(self, grp):
+        """
+        Starts observing a group so tasks deleted from
+        it leave the graph.
+        """
+
+        if all(watched is not grp for watched in self._groups):
+            self._groups.append(grp)
+            grp.add_observer(self._group_changed)
+
+
+    def remove_group(self, grp):
+        """
+        Stops observing a deleted group and removes
+        every one of its tasks from the graph.
+        """
+
+        self._groups = [watched for watched in self._groups if watched is not grp]
+        grp.remove_observer(self._group_changed)
+        if self._tasks:
+            for task in grp.get_tasks():
+                self.remove_task(task)
+
+
+    def get_blockers(self, task):
+        """
+        Returns a list of the tasks a task waits for.
+        """
+
+        return [self._tasks[key] for key in self._blockers.get(id(task), ())]
+
+
+    def get_dependents(self, task):
+        """
+        Returns a list of the tasks waiting for a task.
+        """
+
+        return [self._tasks[key] for key in self._dependents.get(id(task), ())]
+
+
+    def is_blocked(self, task):
+        """
+        Returns whether a task waits for at least one
+        task that is not completed.
+        """
+
+        return self._open.get(id(task), 0) > 0
+
+
+    def is_ready(self, task):
+        """
+        Returns whether a task is not completed and has
+        no blockers left open, tasks outside the graph
+        are ready as long as they are not completed.
+        """
+
+        if id(task) in self._tasks:
+            return id(task) in self._ready
+        return not task.get_completion()
+
+
+    def ready(self):
+        """
+        Returns a list of the tasks in the graph that can
+        be worked on, in topological order.
+        """
+
+        keys = sorted(self._ready, key = self._position.__getitem__)
+        return [self._tasks[key] for key in keys]
+
+
+    def order(self):
+        """
+        Returns a list of every task in the graph in
+        topological order, each blocker comes before
+        every task it blocks.
+        """
+
+        keys = sorted(self._tasks, key = self._position.__getitem__)
+        return [self._tasks[key] for key in keys]
+
+
+    def edges(self):
+        """
+        Returns a list of (blocker, task) pairs for every
+        edge of the graph.
+        """
+
+        return [
+            (self._tasks[source], self._tasks[target])
+            for source, targets in self._dependents.items()
+            for target in targets
+        ]
+
+
+    def add_observer(self, callback):
+        """
+        Registers a callback that is called with a
+        FieldChanged event for the "blocked" field when
+        a task becomes blocked or unblocked.
+        """
+
+        self._observers.append(callback)
+
+
+    def remove_observer(self, callback):
+        """
+        Unregisters a callback that was previously
+        given to add_observer().
+        """
+
+        if callback in self._observers:
+            self._observers.remove(callback)
+
+
+    def _track(self, task):
+        """
+        Adds a task to the end of the topological order
+        if it is not in the graph yet.
+        """
+
+        key = id(task)
+        if key in self._tasks:
+            return
+
+        self._tasks[key] = task
+        self._blockers[key] = set()
+        self._dependents[key] = set()
+        self._position[key] = self._next_position
+        self._next_position += 1
+        self._open[key] = 0
+        self._done[key] = task.get_completion()
+        if not self._done[key]:
+            self._ready.add(key)
+        task.add_observer(self._task_changed)
+
+
+    def _untrack_if_isolated(self, key):
+        """
+        Drops a task from the graph once it is no longer
+        part of any edge.
+        """
+
+        if key in self._tasks and not self._blockers[key] and not self._dependents[key]:
+            task = self._tasks.pop(key)
+            task.remove_observer(self._task_changed)
+            del self._blockers[key]
+            del self._dependents[key]
+            del self._position[key]
+            del self._open[key]
+            del self._done[key]
+            self._ready.discard(key)
+
+
+    def _reorder(self, source, target):
+        """
+        Repairs the topological order before adding an edge
+        from a task to one placed before it. Only the tasks
+        whose positions lie between the two ends are searched
+        and given new positions.
+        """
+
+        lower = self._position[target]
+        upper = self._position[source]
+
+        # Tasks reachable from the target that sit no later
+        # than the source, reaching the source is a cycle
+        forward = []
+        seen = {target}
+        stack = [target]
+        while stack:
+            key = stack.pop()
+            forward.append(key)
+            for following in self._dependents[key]:
+                if following == source:
+                    raise ValueError("Dependency would create a cycle")
+                if following not in seen and self._position[following] < upper:
+                    seen.add(following)
+                    stack.append(following)
+
+        # Tasks the source depends on that sit no earlier
+        # than the target
+        backward = []
+        seen = {source}
+        stack = [source]
+        while stack:
+            key = stack.pop()
+            backward.append(key)
+            for preceding in self._blockers[key]:
+                if preceding not in seen and self._position[preceding] > lower:
+                    seen.add(preceding)
+                    stack.append(preceding)
+
+        backward.sort(key = self._position.__getitem__)
+        forward.sort(key = self._position.__getitem__)
+        keys = backward + forward
+        positions = sorted(self._position[key] for key in keys)
+        for key, position in zip(keys, positions):
+            self._position[key] = position
+
+
+    def _adjust(self, key, delta):
+        """
+        Changes the number of open blockers of a task and
+        notifies the observers when it becomes blocked or
+        unblocked.
+        """
+
+        before = self._open[key]
+        self._open[key] = before + delta
+        if (before > 0) == (before + delta > 0):
+            return
+
+        task = self._tasks[key]
+        if before + delta == 0 and not self._done[key]:
+            self._ready.add(key)
+        else:
+            self._ready.discard(key)
+        if self._observers:
+            emit(self._observers, FieldChanged(task, "blocked", before > 0, before + delta > 0))
+
+
+    def _task_changed(self, event):
+        """
+        Observer for the tasks in the graph, keeps the counts
+        of open blockers in step with completion changes.
+        """
+
+        key = id(event.source)
+        if event.field != "completion" or key not in self._tasks:
+            return
+
+        # Events can arrive late from a batch, the counts only
+        # follow the status the task has now
+        complete = event.source.get_completion()
+        if complete == self._done[key]:
+            return
+        self._done[key] = complete
+        if complete:
+            self._ready.discard(key)
+        elif self._open[key] == 0:
+            self._ready.add(key)
+        delta = -1 if complete else 1
+        for target in self._dependents[key]:
+            self._adjust(target, delta)
+
+
+    def _group_changed(self, event):
+        """
+        Observer for the watched groups, removes the tasks
+        deleted from a group from the graph.
+        """
+
+        if isinstance(event, TaskRemoved):
+            self.remove_task(event.task)
+        elif isinstance(event, TasksReplaced) and self._tasks:
+            kept = {id(task) for task in event.new}
+            for task in event.old:
+                if id(task) not in kept:
+                    self.remove_task(task)
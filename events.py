@@ -0,0 +1,81 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import count
+
+# Event sent when a setter changes a field of a Task or Group
+FieldChanged = namedtuple("FieldChanged", ("source", "field", "old", "new"))
+
+# Event sent when a task is appended to a group
+TaskAdded = namedtuple("TaskAdded", ("group", "task"))
+
+# Event sent when a task is removed from a group
+TaskRemoved = namedtuple("TaskRemoved", ("group", "task"))
+
+# Event sent when the whole task list of a group is replaced, archived
+# is set when the missing tasks were moved to the archive rather than
+# deleted
+TasksReplaced = namedtuple("TasksReplaced", ("group", "old", "new", "archived"), defaults = (False,))
+
+# Events held back by the open batches, keyed so that repeated
+# changes to the same field of the same object are merged
+_pending = {}
+_depth = 0
+_counter = count()
+
+
+def emit(observers, event):
+    """
+    Calls every observer in the given list with an event,
+    or holds the event back while a batch is open.
+    """
+
+    if _depth:
+        _hold(observers, event)
+        return
+
+    for callback in list(observers):
+        callback(event)
+
+
+@contextmanager
+def batch():
+    """
+    Context manager that holds back every event emitted
+    inside it and delivers them once the outermost batch
+    closes. Changes to the same field of the same object
+    are merged into a single event, and fields that end
+    up back at their old value send nothing.
+    """
+
+    global _depth, _pending
+
+    _depth += 1
+    try:
+        yield
+    finally:
+        _depth -= 1
+        if _depth == 0:
+            pending = _pending
+            _pending = {}
+            for observers, event in pending.values():
+                if isinstance(event, FieldChanged) and event.old == event.new:
+                    continue
+                for callback in list(observers):
+                    callback(event)
+
+
+def _hold(observers, event):
+    """
+    Stores an event until the outermost batch closes,
+    merging it with an earlier change of the same field.
+    """
+
+    if type(event) is FieldChanged:
+        key = (id(event.source), event.field)
+        held = _pending.get(key)
+        if held is not None:
+            held[1] = FieldChanged(event.source, event.field, held[1].old, event.new)
+            return
+    else:
+        key = next(_counter)
+    _pending[key] = [observers, event]
@@ -1,4 +1,5 @@
-from task import Task, Priority
+from task import Task, Priority, new_uid
+from events import FieldChanged, TaskAdded, TaskRemoved, TasksReplaced, emit
 
 
 class Group:
@@ -18,6 +19,19 @@ class Group:
     _tasks : list
         A list of tasks associated with the
         constructed group.
+    _loader : function
+        Called to build the list of tasks the first time
+        it is needed, None once the tasks are loaded.
+    _pending_count : int
+        The number of tasks the loader will build.
+    _uid : int
+        The identifier of the group shared between
+        machines, None until it is first asked for.
+    _observers : list
+        A list of callbacks that are called with an event
+        whenever a field of the group or its task list
+        changes.
+
     Methods:
     --------------------
     add_task()
@@ -34,6 +48,9 @@ class Group:
     get_tasks()
         Returns a list of the tasks associated with
         the group.
+    get_task_count()
+        Returns the number of tasks associated with the
+        group without loading them.
     set_name()
         Sets the name of the group to the value given
         to the method call.
@@ -46,6 +63,20 @@ class Group:
     set_tasks()
         Sets the list of tasks associated with the group
         to the value given to the method call.
+    set_loader()
+        Sets a function that lazily builds the list of
+        tasks associated with the group.
+    archive_tasks()
+        Removes tasks that were moved to the archive.
+    get_uid()
+        Returns the identifier shared between machines.
+    set_uid()
+        Sets the identifier shared between machines.
+    add_observer()
+        Registers a callback to be notified of changes
+        to the group and its task list.
+    remove_observer()
+        Unregisters a previously registered callback.
     copy()
         Returns a copy of the group.
     """
@@ -63,6 +94,10 @@ class Group:
         self._color = "#000000"
         self._description = "No known description."
         self._tasks = []
+        self._loader = None
+        self._pending_count = 0
+        self._uid = None
+        self._observers = []
    
 
     def add_task(self, task):
@@ -71,7 +106,10 @@ class Group:
         the _tasks list attribute.
         """
 
+        self._load()
         self._tasks.append(task)
+        if self._observers:
+            emit(self._observers, TaskAdded(self, task))
 
 
     def remove_task(self, task):
@@ -82,8 +120,11 @@ class Group:
         remove it from the list.
         """
 
+        self._load()
         if task in self._tasks:
             self._tasks.remove(task)
+            if self._observers:
+                emit(self._observers, TaskRemoved(self, task))
 
 
     def get_name(self):
@@ -117,16 +158,32 @@ class Group:
         Returns a list of tasks associated with
         the group.
         """
+
+        self._load()
         return self._tasks
 
 
+    def get_task_count(self):
+        """
+        Returns the number of tasks associated with
+        the group without loading them.
+        """
+
+        if self._loader is not None:
+            return self._pending_count
+        return len(self._tasks)
+
+
     def set_name(self, name):
         """
         Sets the name of the group to the value
         given at the method call.
         """
 
+        old = self._name
         self._name = name
+        if self._observers and old != name:
+            emit(self._observers, FieldChanged(self, "name", old, name))
     
 
     def set_color(self, color):
@@ -137,7 +194,10 @@ class Group:
         color black as "#000000".
         """
         
+        old = self._color
         self._color = color
+        if self._observers and old != color:
+            emit(self._observers, FieldChanged(self, "color", old, color))
     
 
     def set_description(self, description):
@@ -146,7 +206,10 @@ class Group:
         value given at the method call.
         """
 
+        old = self._description
         self._description = description
+        if self._observers and old != description:
+            emit(self._observers, FieldChanged(self, "description", old, description))
 
 
     def set_tasks(self, tasks):
@@ -155,7 +218,91 @@ class Group:
         group to the value given at the method call.
         """
         
+        old = self._tasks if self._loader is None else []
         self._tasks = tasks
+        self._loader = None
+        if self._observers:
+            emit(self._observers, TasksReplaced(self, old, tasks))
+
+
+    def set_loader(self, loader, count):
+        """
+        Sets a function that is called to build the list
+        of tasks associated with the group the first time
+        it is needed, along with the number of tasks it
+        will build.
+        """
+
+        self._loader = loader
+        self._pending_count = count
+
+
+    def archive_tasks(self, tasks):
+        """
+        Removes the given tasks from the _tasks list attribute
+        after they were moved to the archive. Observers get a
+        TasksReplaced event marked as archived, so they drop
+        the tasks without treating them as deleted.
+        """
+
+        self._load()
+        archived = {id(task) for task in tasks}
+        old = self._tasks
+        self._tasks = [task for task in old if id(task) not in archived]
+        if self._observers and len(self._tasks) != len(old):
+            emit(self._observers, TasksReplaced(self, old, self._tasks, True))
+
+
+    def _load(self):
+        """
+        Builds the list of tasks with the loader if it
+        has not been built yet.
+        """
+
+        if self._loader is not None:
+            loader = self._loader
+            self._loader = None
+            self._tasks = loader()
+
+
+    def get_uid(self):
+        """
+        Returns the identifier of the group shared between
+        machines, one is made the first time it is needed.
+        """
+
+        if self._uid is None:
+            self._uid = new_uid()
+        return self._uid
+
+
+    def set_uid(self, uid):
+        """
+        Sets the identifier of the group shared between
+        machines, used when loading and syncing groups.
+        """
+
+        self._uid = uid
+
+
+    def add_observer(self, callback):
+        """
+        Registers a callback that is called with a
+        TaskAdded, TaskRemoved, TasksReplaced or
+        FieldChanged event.
+        """
+
+        self._observers.append(callback)
+
+
+    def remove_observer(self, callback):
+        """
+        Unregisters a callback that was previously
+        given to add_observer().
+        """
+
+        if callback in self._observers:
+            self._observers.remove(callback)
 
 
     def copy(self):
@@ -166,7 +313,7 @@ class Group:
         temp = Group(self._name)
         temp.set_color(self._color)
         temp.set_description(self._description)
-        temp.set_tasks(self._tasks)
+        temp.set_tasks(self.get_tasks())
         return temp
 
     
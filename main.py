@@ -1,4 +1,40 @@
-from window import Window
+import argparse
 
-window = Window()
-window.start()
+from rpc import is_loopback
+
+
+def parse_address(text):
+    """
+    Parses the address of the automation server, either
+    HOST:PORT for a localhost socket or a Unix socket path.
+    Hosts that reach other machines are rejected, since the
+    server has no authentication.
+    """
+
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit():
+        host = host or "127.0.0.1"
+        if not is_loopback(host):
+            raise argparse.ArgumentTypeError(f"{host} is not a loopback address, use 127.0.0.1 or localhost")
+        return (host, int(port))
+    return text
+
+
+# Worker processes import this module again, so the GUI is
+# only imported and created when it is run as the program
+if __name__ == "__main__":
+    from window import Window
+
+    parser = argparse.ArgumentParser(prog = "kittytask")
+    parser.add_argument(
+        "--rpc",
+        metavar = "ADDRESS",
+        type = parse_address,
+        help = "serve the local JSON-RPC automation API on HOST:PORT or a Unix socket path"
+    )
+    args = parser.parse_args()
+
+    window = Window()
+    if args.rpc is not None:
+        window.start_rpc(args.rpc)
+    window.start()
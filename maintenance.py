@@ -0,0 +1,217 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+
+from snapshot import Snapshot, encode_group, write_parts
+
+# Constants for the module
+WORKERS = os.cpu_count() or 1   # Worker processes used unless asked otherwise
+
+
+def partition(path, parts):
+    """
+    Returns a list of up to a number of (start, stop) ranges
+    of the groups of a snapshot. Ranges are contiguous and
+    hold about the same number of tasks, but a group is
+    never split between two ranges.
+    """
+
+    snapshot = Snapshot(path)
+    try:
+        sizes = [snapshot.group_task_count(index) + 1 for index in range(snapshot.group_count())]
+    finally:
+        snapshot.close()
+
+    total = sum(sizes)
+    ranges = []
+    start = 0
+    filled = 0
+    for index, size in enumerate(sizes):
+        filled += size
+        if len(ranges) < parts - 1 and filled * parts >= total * (len(ranges) + 1):
+            ranges.append((start, index + 1))
+            start = index + 1
+    if start < len(sizes):
+        ranges.append((start, len(sizes)))
+    return ranges
+
+
+class Maintenance:
+    """
+    A class built to compact and verify snapshots without
+    blocking the GUI and on every core.
+
+    Each job splits the groups of a snapshot into contiguous
+    ranges holding about the same number of tasks, one per
+    worker process. Workers open the snapshot on their own,
+    so no task is ever sent between processes, and only the
+    encoded groups or the names of damaged groups come back.
+    Jobs return a Future that is resolved once every range
+    is done. A compacted snapshot is written next to the
+    original and then renamed over it, so readers only ever
+    see the old file or the whole new one.
+
+    Attributes:
+    --------------------
+    _workers : int
+        The number of worker processes.
+    _pool : ProcessPoolExecutor
+        The worker processes, None until the first job.
+
+    Methods:
+    --------------------
+    compact()
+        Rewrites a snapshot in the current format.
+    verify()
+        Checks every group of a snapshot.
+    shutdown()
+        Stops the worker processes.
+    """
+
+    def __init__(self, workers = None):
+        """
+        A one-argument constructor for the class that
+        accepts the number of worker processes, WORKERS
+        unless given.
+        """
+
+        if workers is None:
+            workers = WORKERS
+        if workers < 1:
+            raise ValueError(f"At least one worker is needed, not {workers}")
+
+        self._workers = workers
+        self._pool = None
+
+
+    def compact(self, path, destination = None):
+        """
+        Rewrites a snapshot in the current format with the
+        strings of every group packed together and fresh
+        checksums, to its own path unless a destination is
+        given. Returns a Future of the number of groups
+        written. When the checksum of any group does not
+        match, nothing is written and the Future raises a
+        ValueError naming the damaged groups, so fresh
+        checksums never hide a damaged group.
+        """
+
+        def finish(results):
+            damaged = [name for _, names in results for name in names]
+            if damaged:
+                raise ValueError(f"Damaged groups were not compacted: {', '.join(damaged)}")
+            parts = [part for result, _ in results for part in result]
+            write_parts(destination or path, parts)
+            return len(parts)
+
+        return self._run(_compact_range, path, finish)
+
+
+    def verify(self, path):
+        """
+        Checks the checksum and tasks of every group of a
+        snapshot. Returns a Future of the list of the names
+        of the damaged groups, empty when all of them are
+        sound.
+        """
+
+        return self._run(_verify_range, path, lambda results: [name for result in results for name in result])
+
+
+    def shutdown(self, wait = True):
+        """
+        Stops the worker processes, waiting for running
+        jobs to finish unless told otherwise.
+        """
+
+        if self._pool is not None:
+            self._pool.shutdown(wait = wait, cancel_futures = not wait)
+            self._pool = None
+
+
+    def _run(self, worker, path, finish):
+        """
+        Runs a worker function on every range of groups of
+        a snapshot and returns a Future of the result of
+        finish() on their results in order.
+        """
+
+        ranges = partition(path, self._workers)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers = self._workers, mp_context = multiprocessing.get_context("spawn"))
+        futures = [self._pool.submit(worker, path, start, stop) for start, stop in ranges]
+
+        result = Future()
+        result.set_running_or_notify_cancel()
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            try:
+                result.set_result(finish([future.result() for future in futures]))
+            except Exception as error:
+                result.set_exception(error)
+
+        if not futures:
+            done(None)
+        for future in futures:
+            future.add_done_callback(done)
+        return result
+
+
+def _compact_range(path, start, stop):
+    """
+    Returns the encoded groups of a snapshot between two
+    indexes along with the names of the damaged groups,
+    which are not encoded, runs in a worker process.
+    """
+
+    snapshot = Snapshot(path)
+    try:
+        groups = snapshot.load_groups()
+        parts = []
+        damaged = []
+        for index in range(start, stop):
+            if not snapshot.verify_group(index):
+                damaged.append(_group_name(snapshot, index))
+                continue
+            tasks = snapshot.group_task_range(index)
+            blockers = [snapshot.task_blockers(task_index) for task_index in tasks]
+            parts.append(encode_group(groups[index], groups[index].get_tasks(), index, tasks.start, blockers))
+        return (parts, damaged)
+    finally:
+        snapshot.close()
+
+
+def _verify_range(path, start, stop):
+    """
+    Returns the names of the damaged groups of a snapshot
+    between two indexes, runs in a worker process.
+    """
+
+    snapshot = Snapshot(path)
+    try:
+        damaged = []
+        for index in range(start, stop):
+            if not snapshot.verify_group(index):
+                damaged.append(_group_name(snapshot, index))
+        return damaged
+    finally:
+        snapshot.close()
+
+
+def _group_name(snapshot, index):
+    """
+    Returns the name of a group of a snapshot, or its
+    position when the name cannot be read.
+    """
+
+    try:
+        return snapshot.group_name(index)
+    except ValueError:
+        return f"#{index + 1}"
@@ -0,0 +1,472 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import nsmallest
+from itertools import count
+import re
+import sys
+import time
+
+from events import FieldChanged, TaskAdded, TaskRemoved, TasksReplaced
+
+# Constants for the module
+ACTION = "action"
+GROUP = "group"
+TASK = "task"
+RESULT_LIMIT = 20           # Results returned by a search unless asked otherwise
+SEARCH_BUDGET = 0.012       # Seconds a search spends checking tasks before answering
+BULK_SIZE = 1024            # Words added at once that are sorted in rather than inserted
+
+# Kinds of candidates mapped to their rank among equal matches
+KIND_RANKS = {ACTION: 0, GROUP: 1, TASK: 2}
+
+WORD_END = "\uffff"    # Sorts after every character a word can hold
+
+
+class PaletteIndex:
+    """
+    A class built to find actions, groups and tasks by a
+    few typed characters.
+
+    Every word of every task name is kept in a pair of
+    parallel sorted arrays of words and candidate numbers,
+    so the tasks with a word starting with a typed token are
+    one contiguous slice found by bisection. Tokens that are
+    not a prefix are matched fuzzily against the distinct
+    words only, never against every task. Searching checks
+    the tasks of the rarest token first and stops after its
+    time budget with the best results found so far. Actions
+    and groups are few and are always scored in full.
+
+    The index follows tasks being added, removed and renamed
+    through their change events, so it is never rebuilt.
+
+    Attributes:
+    --------------------
+    _entries : dict
+        Maps each candidate number to a tuple of its kind,
+        lowercase label and payload.
+    _numbers : dict
+        Maps the id of each indexed task or group to its
+        candidate number.
+    _small : list
+        The candidate numbers of every action and group.
+    _word_keys : list
+        The words of every task name, sorted.
+    _word_ids : array
+        The candidate number of each entry of _word_keys,
+        sorted within each word.
+    _vocabulary : dict
+        Maps each distinct word holding a letter to the
+        number of times it is used.
+    _fuzzy_text : str
+        The distinct words joined by newlines for fuzzy
+        matching, None when it needs to be rebuilt.
+    _counter : itertools.count
+        Hands out candidate numbers.
+
+    Methods:
+    --------------------
+    add_action()
+        Adds a named action.
+    add_group()
+        Adds a group and every one of its tasks.
+    add_groups()
+        Adds many groups and their tasks at once.
+    remove_group()
+        Removes a group and every one of its tasks.
+    search()
+        Returns the best matches of a query.
+    size()
+        Returns the number of candidates.
+    """
+
+    def __init__(self):
+        """
+        A constructor for the class that creates an
+        empty index.
+        """
+
+        self._entries = {}
+        self._numbers = {}
+        self._small = []
+        self._word_keys = []
+        self._word_ids = array("q")
+        self._vocabulary = {}
+        self._fuzzy_text = None
+        self._counter = count()
+
+
+    def add_action(self, name, callback):
+        """
+        Adds an action that is found by its name and
+        carries a callback as its payload.
+        """
+
+        number = next(self._counter)
+        self._entries[number] = (ACTION, name.lower(), (name, callback))
+        self._small.append(number)
+
+
+    def add_group(self, grp):
+        """
+        Adds a group and every one of its tasks, and starts
+        following their changes.
+        """
+
+        self.add_groups([grp])
+
+
+    def add_groups(self, groups):
+        """
+        Adds many groups at once, the words of all of their
+        tasks are sorted into the index together.
+        """
+
+        pairs = []
+        for grp in groups:
+            if id(grp) in self._numbers:
+                continue
+            number = next(self._counter)
+            self._entries[number] = (GROUP, grp.get_name().lower(), grp)
+            self._numbers[id(grp)] = number
+            self._small.append(number)
+            pairs.extend(self._entry_words(grp, grp.get_tasks()))
+            grp.add_observer(self._group_changed)
+        self._insert_words(pairs)
+
+
+    def remove_group(self, grp):
+        """
+        Removes a group and every one of its tasks from
+        the index.
+        """
+
+        number = self._numbers.pop(id(grp), None)
+        if number is None:
+            return
+
+        grp.remove_observer(self._group_changed)
+        self._remove_tasks(grp.get_tasks())
+        del self._entries[number]
+        self._small.remove(number)
+
+
+    def search(self, query, limit = RESULT_LIMIT):
+        """
+        Returns a list of up to limit (kind, label, payload)
+        tuples that match every token of a query, best first.
+        Tokens that start a word rank above tokens found
+        spread through a word, then actions come before
+        groups and groups before tasks.
+        """
+
+        tokens = query.lower().split()
+        if not tokens:
+            return []
+
+        patterns = [_fuzzy_pattern(token) for token in tokens]
+        scored = []
+        for number in self._small:
+            kind, label, payload = self._entries[number]
+            score = _score(label, label.split(), tokens, patterns)
+            if score is not None:
+                scored.append((score, KIND_RANKS[kind], len(label), number))
+        scored.extend(self._search_tasks(tokens, patterns, limit))
+
+        results = []
+        for _, _, _, number in nsmallest(limit, scored):
+            kind, label, payload = self._entries[number]
+            results.append((kind, _display(kind, payload), payload))
+        return results
+
+
+    def size(self):
+        """
+        Returns the number of actions, groups and tasks
+        in the index.
+        """
+
+        return len(self._entries)
+
+
+    def _search_tasks(self, tokens, patterns, limit):
+        """
+        Returns the scored tasks matching every token. The
+        tasks of the token with the fewest candidates are
+        walked, prefix matches first, and checked against the
+        other tokens until the results cannot improve or the
+        time budget runs out.
+        """
+
+        deadline = time.perf_counter() + SEARCH_BUDGET
+        ranges = [self._candidates(token, pattern) for token, pattern in zip(tokens, patterns)]
+        driver = min(range(len(tokens)), key = lambda index: sum(stop - start for _, start, stop in ranges[index]))
+
+        scored = []
+        best = 0
+        seen = set()
+        checked = 0
+        for tier, start, stop in ranges[driver]:
+            if len(scored) >= limit and best <= tier:
+                break
+            for position in range(start, stop):
+                number = self._word_ids[position]
+                if number in seen:
+                    continue
+                seen.add(number)
+                kind, label, payload = self._entries[number]
+                score = _score(label, label.split(), tokens, patterns)
+                if score is not None:
+                    scored.append((score, KIND_RANKS[kind], len(label), number))
+                    if len(scored) == limit:
+                        best = max(scored)[0]
+                    elif len(scored) > limit:
+                        scored = nsmallest(limit, scored)
+                        best = scored[-1][0]
+                    if len(scored) >= limit and best <= tier:
+                        return scored
+                checked += 1
+                if checked % 256 == 0 and time.perf_counter() > deadline:
+                    return scored
+        return scored
+
+
+    def _candidates(self, token, pattern):
+        """
+        Returns a list of (tier, start, stop) slices of the
+        sorted word arrays whose words match a token, the
+        slice of words starting with the token first.
+        """
+
+        keys = self._word_keys
+        slices = [(0, bisect_left(keys, token), bisect_left(keys, token + WORD_END))]
+        if pattern is not None:
+            if self._fuzzy_text is None:
+                self._fuzzy_text = "\n".join(self._vocabulary)
+            for word in re.findall(pattern.pattern.join(("^[^\n]*?", "[^\n]*$")), self._fuzzy_text, re.MULTILINE):
+                if not word.startswith(token):
+                    slices.append((1, bisect_left(keys, word), bisect_right(keys, word)))
+        return slices
+
+
+    def _add_tasks(self, grp, tasks):
+        """
+        Adds tasks of a group to the index.
+        """
+
+        self._insert_words(self._entry_words(grp, tasks))
+
+
+    def _entry_words(self, grp, tasks):
+        """
+        Gives candidate numbers to tasks of a group, starts
+        observing them and returns the (word, number) pairs
+        of their names.
+        """
+
+        pairs = []
+        for task in tasks:
+            number = next(self._counter)
+            label = task.get_name().lower()
+            self._entries[number] = (TASK, label, (grp, task))
+            self._numbers[id(task)] = number
+            task.add_observer(self._task_changed)
+            for word in set(label.split()):
+                pairs.append((self._intern(word), number))
+        return pairs
+
+
+    def _insert_words(self, pairs):
+        """
+        Adds (word, number) pairs to the sorted word arrays,
+        large numbers of pairs are appended and sorted in
+        at once.
+        """
+
+        if len(pairs) < BULK_SIZE:
+            for word, number in pairs:
+                index = bisect_right(self._word_keys, word)
+                index = bisect_left(self._word_ids, number, bisect_left(self._word_keys, word), index)
+                self._word_keys.insert(index, word)
+                self._word_ids.insert(index, number)
+            return
+
+        pairs.extend(zip(self._word_keys, self._word_ids))
+        pairs.sort()
+        self._word_keys = [word for word, _ in pairs]
+        self._word_ids = array("q", [number for _, number in pairs])
+
+
+    def _remove_task(self, task):
+        """
+        Removes a task and the words of its name from
+        the index.
+        """
+
+        number = self._numbers.pop(id(task), None)
+        if number is None:
+            return
+
+        task.remove_observer(self._task_changed)
+        _, label, _ = self._entries.pop(number)
+        self._drop_words(label, number)
+
+
+    def _remove_tasks(self, tasks):
+        """
+        Removes many tasks from the index, large numbers of
+        tasks are filtered out of the word arrays at once.
+        """
+
+        if len(tasks) < BULK_SIZE:
+            for task in tasks:
+                self._remove_task(task)
+            return
+
+        doomed = set()
+        for task in tasks:
+            number = self._numbers.pop(id(task), None)
+            if number is None:
+                continue
+            task.remove_observer(self._task_changed)
+            del self._entries[number]
+            doomed.add(number)
+
+        keys = []
+        ids = array("q")
+        for word, number in zip(self._word_keys, self._word_ids):
+            if number in doomed:
+                self._release(word)
+            else:
+                keys.append(word)
+                ids.append(number)
+        self._word_keys = keys
+        self._word_ids = ids
+
+
+    def _drop_words(self, label, number):
+        """
+        Removes the words of a label from the sorted word
+        arrays.
+        """
+
+        for word in set(label.split()):
+            start = bisect_left(self._word_keys, word)
+            stop = bisect_right(self._word_keys, word, start)
+            index = bisect_left(self._word_ids, number, start, stop)
+            if index < stop and self._word_ids[index] == number:
+                del self._word_keys[index]
+                del self._word_ids[index]
+                self._release(word)
+
+
+    def _intern(self, word):
+        """
+        Returns the shared copy of a word and counts its use,
+        words with letters join the fuzzy vocabulary.
+        """
+
+        word = sys.intern(word)
+        if not word.isdigit():
+            uses = self._vocabulary.get(word, 0)
+            if not uses:
+                self._fuzzy_text = None
+            self._vocabulary[word] = uses + 1
+        return word
+
+
+    def _release(self, word):
+        """
+        Counts a word no longer being used, dropping it from
+        the fuzzy vocabulary with its last use.
+        """
+
+        uses = self._vocabulary.get(word)
+        if uses == 1:
+            del self._vocabulary[word]
+            self._fuzzy_text = None
+        elif uses:
+            self._vocabulary[word] = uses - 1
+
+
+    def _task_changed(self, event):
+        """
+        Observer for the indexed tasks, moves a renamed
+        task to the words of its new name.
+        """
+
+        if event.field != "name":
+            return
+
+        number = self._numbers.get(id(event.source))
+        if number is None:
+            return
+
+        grp = self._entries[number][2][0]
+        self._remove_task(event.source)
+        self._add_tasks(grp, [event.source])
+
+
+    def _group_changed(self, event):
+        """
+        Observer for the indexed groups, keeps their tasks
+        and names in step.
+        """
+
+        if isinstance(event, TaskAdded):
+            self._add_tasks(event.group, [event.task])
+        elif isinstance(event, TaskRemoved):
+            self._remove_task(event.task)
+        elif isinstance(event, TasksReplaced):
+            # Only the tasks that left or joined the group are
+            # touched, most replacements keep nearly every task
+            old = {id(task) for task in event.old}
+            new = {id(task) for task in event.new}
+            self._remove_tasks([task for task in event.old if id(task) not in new])
+            self._add_tasks(event.group, [task for task in event.new if id(task) not in old])
+        elif isinstance(event, FieldChanged) and event.field == "name":
+            number = self._numbers[id(event.source)]
+            self._entries[number] = (GROUP, event.new.lower(), event.source)
+
+
+def _fuzzy_pattern(token):
+    """
+    Returns the compiled pattern that finds the characters
+    of a token in order, None for tokens without a letter
+    since numbers are only matched by their prefix.
+    """
+
+    if token.isdigit():
+        return None
+    return re.compile("[^\n]*?".join(re.escape(character) for character in token))
+
+
+def _score(label, words, tokens, patterns):
+    """
+    Returns how well a label matches every token, 0 when
+    each token starts a word and 1 more for every token
+    only found spread through the label, None when some
+    token is not found at all.
+    """
+
+    score = 0
+    for token, pattern in zip(tokens, patterns):
+        if any(word.startswith(token) for word in words):
+            continue
+        if pattern is None or pattern.search(label) is None:
+            return None
+        score += 1
+    return score
+
+
+def _display(kind, payload):
+    """
+    Returns the text a candidate is listed with.
+    """
+
+    if kind == ACTION:
+        return payload[0]
+    if kind == GROUP:
+        return payload.get_name()
+    grp, task = payload
+    return f"{task.get_name()} ({grp.get_name()})"
@@ -0,0 +1,345 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import os
+from queue import Queue, Empty
+import re
+
+# Constants for the module
+SCAN_WORKERS = 4            # Threads used to scan documents
+SCAN_BYTES = 64 * 1024      # Bytes read from the start of a document
+POLL_DELAY = 50             # Milliseconds between checks for finished scans
+TITLE_LENGTH = 80           # Longest title kept for a document
+
+PDF_TITLE = re.compile(rb"/Title\s*\((.*?)\)", re.DOTALL)
+
+
+class MetadataCache:
+    """
+    A class built to keep a size-bounded cache of document
+    metadata ordered from the most to the least recently used.
+
+    Attributes:
+    --------------------
+    _path : str
+        The path of the file the cache is persisted to.
+    _max_entries : int
+        The most documents kept in the cache, the least
+        recently used are evicted first.
+    _entries : OrderedDict
+        Maps the path of each document to its metadata,
+        the most recently used document comes first.
+
+    Methods:
+    --------------------
+    get()
+        Returns the cached metadata of a document.
+    put()
+        Updates the metadata of a cached document.
+    touch()
+        Marks a document as the most recently used.
+    paths()
+        Returns the documents from the most recently used.
+    load()
+        Reads the cache from its file.
+    save()
+        Writes the cache to its file.
+    """
+
+    def __init__(self, path, max_entries = 200):
+        """
+        A two-argument constructor for the class that
+        requires the path of the cache file and accepts
+        the most documents to keep.
+        """
+
+        self._path = path
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+
+
+    def get(self, path):
+        """
+        Returns the cached metadata of a document, None
+        when the document has not been scanned.
+        """
+
+        return self._entries.get(path)
+
+
+    def put(self, path, metadata):
+        """
+        Updates the metadata of a document without changing
+        how recently it was used, documents that are not in
+        the cache are ignored.
+        """
+
+        if path in self._entries:
+            self._entries[path] = metadata
+
+
+    def touch(self, path):
+        """
+        Marks a document as the most recently used,
+        adding it without metadata if it is new.
+        """
+
+        if path not in self._entries:
+            self._entries[path] = None
+        self._entries.move_to_end(path, last = False)
+        self._evict()
+
+
+    def paths(self):
+        """
+        Returns a list of the cached documents from the
+        most to the least recently used.
+        """
+
+        return list(self._entries)
+
+
+    def load(self):
+        """
+        Reads the cache from its file, an unreadable
+        file or one that does not hold a list of entries
+        leaves the cache empty.
+        """
+
+        try:
+            with open(self._path, "r", encoding = "utf-8") as file:
+                entries = json.load(file)
+            entries = OrderedDict(
+                (entry["path"], entry["metadata"]) for entry in entries[:self._max_entries]
+            )
+        except (OSError, KeyError, TypeError, ValueError):
+            return
+        self._entries = entries
+
+
+    def save(self):
+        """
+        Writes the cache to its file, replacing the file
+        only once it has been fully written.
+        """
+
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        temp_path = f"{self._path}.tmp"
+        with open(temp_path, "w", encoding = "utf-8") as file:
+            json.dump(
+                [{"path": path, "metadata": metadata} for path, metadata in self._entries.items()],
+                file
+            )
+        os.replace(temp_path, self._path)
+
+
+    def _evict(self):
+        """
+        Removes the least recently used documents once the
+        cache holds more than its maximum.
+        """
+
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem()
+
+
+class RecentFiles:
+    """
+    A class built to gather the metadata of recent documents
+    without blocking the GUI.
+
+    Documents are scanned by a pool of background threads and
+    finished scans are handed back to the Tk event loop through
+    a queue, so slow directories never stall the GUI. Documents
+    whose size and modification time match the cache are not
+    read again.
+
+    Attributes:
+    --------------------
+    _root : tkinter.Tk
+        The root of the GUI application whose event loop
+        finished scans are delivered on.
+    _cache : MetadataCache
+        The cache of document metadata.
+    _pool : ThreadPoolExecutor
+        The threads that scan documents.
+    _results : Queue
+        Finished scans waiting to be delivered.
+    _pending : dict
+        Maps the path of each document being scanned to
+        the callbacks waiting for it.
+    _after_id : str
+        The identifier of the armed polling callback.
+
+    Methods:
+    --------------------
+    get_cache()
+        Returns the metadata cache.
+    touch()
+        Marks a document as recently used and scans it.
+    refresh()
+        Scans documents in the background.
+    shutdown()
+        Stops polling and the scanning threads.
+    """
+
+    def __init__(self, root, cache):
+        """
+        A two-argument constructor for the class that
+        requires the root of the application and the
+        metadata cache to fill.
+        """
+
+        self._root = root
+        self._cache = cache
+        self._pool = ThreadPoolExecutor(max_workers = SCAN_WORKERS, thread_name_prefix = "recent")
+        self._results = Queue()
+        self._pending = {}
+        self._after_id = None
+
+
+    def get_cache(self):
+        """
+        Returns the metadata cache.
+        """
+
+        return self._cache
+
+
+    def touch(self, path, callback = None):
+        """
+        Marks a document as the most recently used and
+        scans it in the background.
+        """
+
+        self._cache.touch(path)
+        self.refresh([path], callback)
+
+
+    def refresh(self, paths, callback = None):
+        """
+        Scans the given documents in the background, the
+        callback is called on the Tk event loop with the
+        path and metadata of each document as it finishes.
+        """
+
+        for path in paths:
+            if path in self._pending:
+                if callback is not None:
+                    self._pending[path].append(callback)
+                continue
+            self._pending[path] = [callback] if callback is not None else []
+            self._pool.submit(self._scan, path, self._cache.get(path))
+        self._arm()
+
+
+    def shutdown(self):
+        """
+        Stops polling for finished scans and lets the
+        scanning threads exit without waiting for them.
+        """
+
+        if self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+            self._after_id = None
+        self._pool.shutdown(wait = False, cancel_futures = True)
+
+
+    def _arm(self):
+        """
+        Arms the polling callback while scans are pending.
+        """
+
+        if self._pending and self._after_id is None:
+            self._after_id = self._root.after(POLL_DELAY, self._poll)
+
+
+    def _poll(self):
+        """
+        Event loop callback that stores finished scans in
+        the cache and hands them to their callbacks.
+        """
+
+        self._after_id = None
+        while True:
+            try:
+                path, metadata = self._results.get_nowait()
+            except Empty:
+                break
+            self._cache.put(path, metadata)
+            for callback in self._pending.pop(path, []):
+                callback(path, metadata)
+        self._arm()
+
+
+    def _scan(self, path, cached):
+        """
+        Gathers the metadata of a document, runs on one of
+        the scanning threads.
+        """
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._results.put((path, {"name": os.path.basename(path), "missing": True}))
+            return
+
+        if cached is not None and cached.get("size") == stat.st_size and cached.get("mtime") == stat.st_mtime:
+            self._results.put((path, cached))
+            return
+
+        try:
+            with open(path, "rb") as file:
+                head = file.read(SCAN_BYTES)
+        except OSError:
+            head = b""
+
+        self._results.put((path, {
+            "name": os.path.basename(path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "title": read_title(head)
+        }))
+
+
+def read_title(head):
+    """
+    Returns a short title for a document from its first
+    bytes, the title metadata of a PDF or the first line
+    of anything else, None when there is none.
+    """
+
+    if head.startswith(b"%PDF"):
+        match = PDF_TITLE.search(head)
+        if match is None:
+            return None
+        title = match.group(1).decode("latin-1")
+    else:
+        if b"\x00" in head:
+            return None
+        lines = head.decode("utf-8", errors = "replace").splitlines()
+        title = next((line.strip() for line in lines if line.strip()), None)
+        if title is None:
+            return None
+    return title[:TITLE_LENGTH]
+
+
+def describe(path, metadata):
+    """
+    Returns a one line description of a document for the
+    recent files panel, a placeholder while the document
+    has not been scanned.
+    """
+
+    if metadata is None:
+        return f"{os.path.basename(path)} (scanning...)"
+    if metadata.get("missing"):
+        return f"{metadata['name']} (missing)"
+
+    modified = datetime.fromtimestamp(metadata["mtime"]).strftime("%m-%d-%Y")
+    size = max(1, metadata["size"] // 1024)
+    title = metadata["title"] or metadata["name"]
+    return f"{title} - {metadata['name']}, {size} KB, modified {modified}"
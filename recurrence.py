@@ -0,0 +1,170 @@
+from calendar import monthrange
+from datetime import date as Date
+from enum import Enum
+
+# Constants for the module
+LAST_MONTH = 9999 * 12 + 11     # Month index of December 9999
+
+
+class Frequency(Enum):
+    """
+    Enum class built to keep track of how often
+    a recurring task repeats.
+    """
+
+    DAILY = 1
+    WEEKLY = 2
+    MONTHLY = 3
+
+
+# Names of the period each frequency repeats by
+PERIOD_NAMES = {
+    Frequency.DAILY: "day",
+    Frequency.WEEKLY: "week",
+    Frequency.MONTHLY: "month"
+}
+
+
+class Recurrence:
+    """
+    A class built to describe how a task repeats.
+
+    A recurrence only stores its rule, occurrences are computed
+    arithmetically for the requested window of dates so the cost
+    does not depend on how far into the future the task repeats.
+
+    Attributes:
+    --------------------
+    _frequency : Frequency
+        How often the task repeats.
+    _interval : int
+        The number of days, weeks or months between
+        two occurrences.
+    _until : int
+        The ordinal of the last date an occurrence can
+        fall on, None when the task repeats forever.
+
+    Methods:
+    --------------------
+    get_frequency()
+        Returns how often the task repeats.
+    get_interval()
+        Returns the number of periods between occurrences.
+    get_until()
+        Returns the ordinal of the last possible occurrence.
+    occurrences()
+        Lazily yields the ordinals of the occurrences
+        within a window of dates.
+    """
+
+    def __init__(self, frequency, interval = 1, until = None):
+        """
+        A three-argument constructor for the class that
+        requires a frequency and accepts an optional
+        interval and end date given as an ordinal.
+        """
+
+        if interval < 1:
+            raise ValueError("A recurrence interval must be at least 1")
+
+        self._frequency = frequency
+        self._interval = interval
+        self._until = until
+
+
+    def get_frequency(self):
+        """
+        Returns how often the task repeats as an
+        Enum object.
+        """
+
+        return self._frequency
+
+
+    def get_interval(self):
+        """
+        Returns the number of days, weeks or months
+        between two occurrences.
+        """
+
+        return self._interval
+
+
+    def get_until(self):
+        """
+        Returns the ordinal of the last date an occurrence
+        can fall on, None when the task repeats forever.
+        """
+
+        return self._until
+
+
+    def occurrences(self, anchor, start, end):
+        """
+        Lazily yields the ordinals of every occurrence that
+        falls between start and end inclusive, for a task
+        whose first occurrence falls on the anchor ordinal.
+        """
+
+        if self._until is not None:
+            end = min(end, self._until)
+        start = max(start, anchor)
+        if start > end:
+            return
+
+        if self._frequency == Frequency.MONTHLY:
+            yield from self._monthly(anchor, start, end)
+            return
+
+        step = self._interval * (7 if self._frequency == Frequency.WEEKLY else 1)
+        first = anchor + -(-(start - anchor) // step) * step
+        yield from range(first, end + 1, step)
+
+
+    def _monthly(self, anchor, start, end):
+        """
+        Lazily yields the ordinals of monthly occurrences,
+        clamping the day to the end of shorter months.
+        """
+
+        anchor_date = Date.fromordinal(anchor)
+        anchor_month = anchor_date.year * 12 + anchor_date.month - 1
+        start_date = Date.fromordinal(start)
+        start_month = start_date.year * 12 + start_date.month - 1
+        index = max(0, (start_month - anchor_month) // self._interval)
+
+        while anchor_month + index * self._interval <= LAST_MONTH:
+            year, month = divmod(anchor_month + index * self._interval, 12)
+            day = min(anchor_date.day, monthrange(year, month + 1)[1])
+            ordinal = Date(year, month + 1, day).toordinal()
+            if ordinal > end:
+                return
+            if ordinal >= start:
+                yield ordinal
+            index += 1
+
+
+    def __eq__(self, other):
+        """
+        Defines the equality comparison.
+        """
+
+        if isinstance(other, Recurrence):
+            return (self._frequency, self._interval, self._until) == (
+                other.get_frequency(),
+                other.get_interval(),
+                other.get_until()
+            )
+        return NotImplemented
+
+
+    def __str__(self):
+        """
+        Defines the toString behaviour of the
+        recurrence object.
+        """
+
+        period = PERIOD_NAMES[self._frequency]
+        if self._interval == 1:
+            return f"Every {period}"
+        return f"Every {self._interval} {period}s"
@@ -0,0 +1,318 @@
+from datetime import date, datetime, time as Time
+from functools import lru_cache
+from heapq import heappop, heappush, heapify
+from itertools import count
+import time
+
+from events import TaskAdded, TaskRemoved, TasksReplaced
+from task import date_ordinal, ordinal_date
+
+# Constants for the module
+REMINDER_TIME = Time(9, 0)      # Time of day reminders are shown on the due date
+MAX_DELAY = 3600 * 1000         # Longest single wait armed on the event loop, in ms
+
+# Task fields that can move the due time of a reminder
+SCHEDULE_FIELDS = ("date", "completion", "recurrence", "occurrences")
+
+
+class ReminderScheduler:
+    """
+    A class built to show reminders when tasks become due.
+
+    Pending reminders are kept in a min-heap keyed by their due
+    time and exactly one callback is armed on the Tk event loop
+    for the earliest of them. Rescheduling a task marks its old
+    heap entry as stale instead of searching for it, so every
+    update costs O(log n) no matter how many reminders are
+    pending.
+
+    Attributes:
+    --------------------
+    _root : tkinter.Tk
+        The root of the GUI application whose event loop
+        the reminders are armed on.
+    _callback : function
+        Called with the list of tasks whose reminders
+        are due.
+    _heap : list
+        A min-heap of [due, seq, task] entries, stale
+        entries have their task set to None.
+    _entries : dict
+        Maps the id of each task with a pending reminder
+        to its live heap entry.
+    _groups : dict
+        Maps the id of each watched group to a dictionary
+        of the ids and tasks tracked for that group.
+    _after_id : str
+        The identifier of the armed event loop callback.
+    _armed_due : float
+        The due time the armed callback was set for.
+
+    Methods:
+    --------------------
+    add_group()
+        Starts scheduling reminders for the tasks of a group.
+    remove_group()
+        Stops scheduling reminders for the tasks of a group.
+    add_task()
+        Starts scheduling reminders for a task.
+    remove_task()
+        Stops scheduling reminders for a task.
+    pending()
+        Returns the number of pending reminders.
+    stop()
+        Cancels the armed event loop callback.
+    """
+
+    def __init__(self, root, callback):
+        """
+        A two-argument constructor for the class that
+        requires the root of the application and the
+        function to call with due tasks.
+        """
+
+        self._root = root
+        self._callback = callback
+        self._counter = count()
+        self._heap = []
+        self._entries = {}
+        self._groups = {}
+        self._after_id = None
+        self._armed_due = None
+
+
+    def add_group(self, grp):
+        """
+        Starts scheduling reminders for every task of a
+        group, including tasks added to it later on.
+        """
+
+        if id(grp) in self._groups:
+            return
+
+        self._groups[id(grp)] = {}
+        grp.add_observer(self._group_changed)
+        for task in grp.get_tasks():
+            self._track(task, grp)
+        self._rearm()
+
+
+    def remove_group(self, grp):
+        """
+        Stops scheduling reminders for every task of a group.
+        """
+
+        tasks = self._groups.pop(id(grp), None)
+        if tasks is None:
+            return
+
+        grp.remove_observer(self._group_changed)
+        for task in list(tasks.values()):
+            self._untrack(task)
+        self._rearm()
+
+
+    def add_task(self, task):
+        """
+        Starts scheduling reminders for a single task.
+        """
+
+        self._track(task)
+        self._rearm()
+
+
+    def remove_task(self, task):
+        """
+        Stops scheduling reminders for a single task.
+        """
+
+        self._untrack(task)
+        self._rearm()
+
+
+    def pending(self):
+        """
+        Returns the number of pending reminders.
+        """
+
+        return len(self._entries)
+
+
+    def stop(self):
+        """
+        Cancels the callback armed on the event loop.
+        """
+
+        if self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+        self._after_id = None
+        self._armed_due = None
+
+
+    def _track(self, task, grp = None):
+        """
+        Starts observing a task and schedules its next
+        reminder without rearming the event loop.
+        """
+
+        if grp is not None:
+            self._groups[id(grp)][id(task)] = task
+        task.add_observer(self._task_changed)
+        self._schedule(task, time.time())
+
+
+    def _untrack(self, task, grp = None):
+        """
+        Stops observing a task and drops its pending
+        reminder without rearming the event loop.
+        """
+
+        if grp is not None:
+            self._groups[id(grp)].pop(id(task), None)
+        task.remove_observer(self._task_changed)
+        self._drop(task)
+
+
+    def _schedule(self, task, now):
+        """
+        Pushes the next reminder of a task that falls after
+        the given time onto the heap, replacing the pending
+        reminder of the task if there is one.
+        """
+
+        self._drop(task)
+        due = self._next_due(task, now)
+        if due is not None:
+            entry = [due, next(self._counter), task]
+            self._entries[id(task)] = entry
+            heappush(self._heap, entry)
+
+
+    def _drop(self, task):
+        """
+        Marks the pending reminder of a task as stale, it
+        is discarded once it reaches the top of the heap.
+        """
+
+        entry = self._entries.pop(id(task), None)
+        if entry is not None:
+            entry[2] = None
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [item for item in self._heap if item[2] is not None]
+                heapify(self._heap)
+
+
+    def _next_due(self, task, now):
+        """
+        Returns the timestamp of the first reminder of a
+        task that falls after the given time, None when the
+        task has nothing left to be reminded of.
+        """
+
+        start = date.fromtimestamp(now).toordinal()
+        while True:
+            occurrence = task.next_occurrence(_day_string(start))
+            if occurrence is None:
+                return None
+            ordinal = date_ordinal(occurrence)
+            due = _due_time(ordinal)
+            if due > now:
+                return due
+            start = ordinal + 1
+
+
+    def _rearm(self):
+        """
+        Arms a single event loop callback for the earliest
+        pending reminder, leaving the armed callback alone
+        when the earliest reminder has not changed.
+        """
+
+        while self._heap and self._heap[0][2] is None:
+            heappop(self._heap)
+
+        due = self._heap[0][0] if self._heap else None
+        if due == self._armed_due:
+            return
+
+        self.stop()
+        if due is not None:
+            delay = int((due - time.time()) * 1000)
+            self._after_id = self._root.after(max(0, min(delay, MAX_DELAY)), self._fire)
+            self._armed_due = due
+
+
+    def _fire(self):
+        """
+        Event loop callback that hands every due task to the
+        callback and schedules their following reminders.
+        """
+
+        self._after_id = None
+        self._armed_due = None
+        now = time.time()
+        due_tasks = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heappop(self._heap)
+            task = entry[2]
+            if task is not None:
+                del self._entries[id(task)]
+                due_tasks.append(task)
+
+        for task in due_tasks:
+            self._schedule(task, now)
+        self._rearm()
+        if due_tasks:
+            self._callback(due_tasks)
+
+
+    def _task_changed(self, event):
+        """
+        Observer for the tracked tasks, reschedules a task
+        when a field its due time depends on changes.
+        """
+
+        if event.field in SCHEDULE_FIELDS:
+            self._schedule(event.source, time.time())
+            self._rearm()
+
+
+    def _group_changed(self, event):
+        """
+        Observer for the watched groups, keeps the tracked
+        tasks in step with the tasks of each group.
+        """
+
+        if isinstance(event, TaskAdded):
+            self._track(event.task, event.group)
+        elif isinstance(event, TaskRemoved):
+            self._untrack(event.task, event.group)
+        elif isinstance(event, TasksReplaced):
+            grp = event.group
+            for tracked in list(self._groups[id(grp)].values()):
+                self._untrack(tracked, grp)
+            for tracked in event.new:
+                self._track(tracked, grp)
+        else:
+            return
+        self._rearm()
+
+
+@lru_cache(maxsize = 4096)
+def _day_string(ordinal):
+    """
+    Returns the date string of an ordinal, cached since
+    most tasks are scheduled starting from the same day.
+    """
+
+    return ordinal_date(ordinal)
+
+
+@lru_cache(maxsize = 4096)
+def _due_time(ordinal):
+    """
+    Returns the timestamp reminders are shown at on the
+    date of an ordinal.
+    """
+
+    return datetime.combine(date.fromordinal(ordinal), REMINDER_TIME).timestamp()
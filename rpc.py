@@ -0,0 +1,963 @@
+from concurrent import futures
+from functools import partial
+import ipaddress
+from itertools import islice
+import json
+import os
+from queue import Queue, Empty
+import re
+import socket
+import socketserver
+import stat
+import threading
+import time
+
+from dependency import DependencyGraph
+from events import batch
+from task import Task, IdAllocator, Priority, NO_DATE, date_ordinal
+from group import Group
+from view import SORT_KEYS
+
+# Constants for the module
+POLL_DELAY = 10             # Milliseconds between drains of an idle call queue
+BUSY_DELAY = 1              # Milliseconds between drains while calls keep coming
+BUSY_WINDOW = 0.1           # Seconds a queue counts as busy after its last call
+DRAIN_BUDGET = 0.008        # Seconds of calls run per drain before yielding
+CALL_TIMEOUT = 30           # Seconds a connection waits for its calls to run
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# Group colors accepted by the API
+COLOR_PATTERN = re.compile(r"#[0-9a-fA-F]{6}")
+
+# Methods that never change any group or task
+READ_ONLY = ("group.list", "task.get", "task.list", "task.query", "task.ready")
+
+
+class RpcError(Exception):
+    """
+    Exception raised by API methods to answer a call
+    with a JSON-RPC error.
+    """
+
+    def __init__(self, code, message):
+        """
+        A two-argument constructor for the class that
+        requires a JSON-RPC error code and message.
+        """
+
+        super().__init__(message)
+        self.code = code
+
+
+class TaskApi:
+    """
+    A class built to expose the groups and tasks of the
+    application as JSON-RPC methods.
+
+    Groups are addressed by their index in the list of groups
+    and tasks by their group and identification number. Every
+    method runs on the Tk thread, so it can use the Group and
+    Task objects directly.
+
+    Attributes:
+    --------------------
+    _groups : list
+        The list of groups shared with the GUI.
+    _dependencies : DependencyGraph
+        The dependencies between tasks shared with the GUI.
+    _task_ids : IdAllocator
+        Hands out the identification numbers of created
+        tasks, shared with the GUI.
+    _methods : dict
+        Maps each JSON-RPC method name to its handler.
+
+    Methods:
+    --------------------
+    call()
+        Runs a JSON-RPC method with the given parameters.
+    is_read_only()
+        Returns whether a method never changes any data.
+    """
+
+    def __init__(self, groups, on_group_added = None, on_group_removed = None, dependencies = None, task_ids = None):
+        """
+        A five-argument constructor for the class that
+        requires the list of groups and accepts callbacks
+        for groups being created and deleted, the graph of
+        dependencies between tasks and the allocator of task
+        identification numbers.
+        """
+
+        self._groups = groups
+        self._dependencies = dependencies if dependencies is not None else DependencyGraph()
+        self._on_group_added = on_group_added
+        self._on_group_removed = on_group_removed
+        self._task_ids = task_ids
+        self._methods = {
+            "group.list": self.group_list,
+            "group.create": self.group_create,
+            "group.update": self.group_update,
+            "group.delete": self.group_delete,
+            "task.get": self.task_get,
+            "task.list": self.task_list,
+            "task.create": self.task_create,
+            "task.update": self.task_update,
+            "task.delete": self.task_delete,
+            "task.bulk_create": self.task_bulk_create,
+            "task.bulk_update": self.task_bulk_update,
+            "task.bulk_delete": self.task_bulk_delete,
+            "task.query": self.task_query,
+            "task.block": self.task_block,
+            "task.unblock": self.task_unblock,
+            "task.ready": self.task_ready
+        }
+
+
+    def call(self, method, params):
+        """
+        Runs a JSON-RPC method with parameters given as a
+        list or a dictionary and returns its result.
+        """
+
+        handler = self._methods.get(method)
+        if handler is None:
+            raise RpcError(METHOD_NOT_FOUND, f"Method not found: {method}")
+        try:
+            if isinstance(params, list):
+                return handler(*params)
+            return handler(**params)
+        except TypeError as error:
+            raise RpcError(INVALID_PARAMS, str(error))
+
+
+    def is_read_only(self, method):
+        """
+        Returns whether a method never changes any
+        group or task.
+        """
+
+        return method in READ_ONLY
+
+
+    def group_list(self):
+        """
+        Returns every group without its tasks.
+        """
+
+        return [self._group_dict(index, grp) for index, grp in enumerate(self._groups)]
+
+
+    def group_create(self, name = None, color = None, description = None):
+        """
+        Creates a group and returns it.
+        """
+
+        if name is not None:
+            self._text("name", name)
+        grp = Group(name if name is not None else f"Group #{len(self._groups) + 1}")
+        self._apply_group(grp, None, color, description)
+        self._groups.append(grp)
+        if self._on_group_added is not None:
+            self._on_group_added(grp)
+        return self._group_dict(len(self._groups) - 1, grp)
+
+
+    def group_update(self, group, name = None, color = None, description = None):
+        """
+        Changes the given fields of a group and returns it.
+        """
+
+        grp = self._group(group)
+        self._apply_group(grp, name, color, description)
+        return self._group_dict(group, grp)
+
+
+    def group_delete(self, group):
+        """
+        Deletes a group and every task in it.
+        """
+
+        grp = self._group(group)
+        del self._groups[group]
+        if self._on_group_removed is not None:
+            self._on_group_removed(grp)
+        return True
+
+
+    def task_get(self, group, id):
+        """
+        Returns a single task.
+        """
+
+        return self._task_dict(group, self._task(group, id))
+
+
+    def task_list(self, group, offset = 0, limit = None):
+        """
+        Returns the tasks of a group in their stored order.
+        """
+
+        tasks = self._group(group).get_tasks()
+        stop = None if limit is None else offset + limit
+        return [self._task_dict(group, task) for task in islice(tasks, offset, stop)]
+
+
+    def task_create(self, group, name = None, date = NO_DATE, priority = "LOW", complete = False, description = None):
+        """
+        Creates a task in a group and returns it.
+        """
+
+        grp = self._group(group)
+        fields = {"date": date, "priority": priority, "complete": complete}
+        if name is not None:
+            fields["name"] = name
+        if description is not None:
+            fields["description"] = description
+        task = self._build_task(self._task_fields(fields))
+        grp.add_task(task)
+        return self._task_dict(group, task)
+
+
+    def task_update(self, group, id, **fields):
+        """
+        Changes the given fields of a task and returns it.
+        """
+
+        task = self._task(group, id)
+        self._apply_task(task, fields)
+        return self._task_dict(group, task)
+
+
+    def task_delete(self, group, id):
+        """
+        Deletes a task from a group.
+        """
+
+        self._group(group).remove_task(self._task(group, id))
+        return True
+
+
+    def task_bulk_create(self, group, tasks):
+        """
+        Creates many tasks in a group within a single call
+        and returns their identification numbers. Every task
+        is checked before any is created, so an invalid one
+        leaves the group as it was.
+        """
+
+        grp = self._group(group)
+        checked = []
+        for fields in tasks:
+            if not isinstance(fields, dict):
+                raise RpcError(INVALID_PARAMS, "Bulk created tasks must be objects")
+            checked.append(self._task_fields(fields))
+        created = [self._build_task(fields) for fields in checked]
+        with batch():
+            for task in created:
+                grp.add_task(task)
+        return [task.get_id_num() for task in created]
+
+
+    def task_bulk_update(self, group, updates):
+        """
+        Applies a list of field changes, each holding the id
+        of its task, and returns the number of changed tasks.
+        Every change is checked before any is applied, so an
+        invalid one leaves every task as it was.
+        """
+
+        index = self._index(group)
+        changes = []
+        for fields in updates:
+            if not isinstance(fields, dict):
+                raise RpcError(INVALID_PARAMS, "Bulk updates must be objects")
+            fields = dict(fields)
+            task = index.get(fields.pop("id", None))
+            if task is None:
+                raise RpcError(INVALID_PARAMS, "Unknown task in bulk update")
+            changes.append((task, self._task_fields(fields)))
+        with batch():
+            for task, fields in changes:
+                self._set_task(task, fields)
+        return len(updates)
+
+
+    def task_bulk_delete(self, group, ids):
+        """
+        Deletes many tasks from a group within a single call
+        and returns the number of deleted tasks.
+        """
+
+        grp = self._group(group)
+        doomed = set(ids)
+        kept = [task for task in grp.get_tasks() if task.get_id_num() not in doomed]
+        deleted = len(grp.get_tasks()) - len(kept)
+        grp.set_tasks(kept)
+        return deleted
+
+
+    def task_query(self, group = None, complete = None, priority = None, text = "", after = None, before = None, sort = None, reverse = False, offset = 0, limit = None):
+        """
+        Returns the tasks of one or every group that pass the
+        given filters, optionally sorted by a view column.
+        """
+
+        if sort is not None and sort not in SORT_KEYS:
+            raise RpcError(INVALID_PARAMS, f"Unknown sort column: {sort}")
+        wanted = self._priority(priority) if priority is not None else None
+        first = self._ordinal(after) if after is not None else None
+        last = self._ordinal(before) if before is not None else None
+        text = text.lower()
+        indexes = [group] if group is not None else range(len(self._groups))
+
+        matches = []
+        for index in indexes:
+            for task in self._group(index).get_tasks():
+                if complete is not None and task.get_completion() != complete:
+                    continue
+                if wanted is not None and task.get_priority() != wanted:
+                    continue
+                if text and text not in task.get_name().lower():
+                    continue
+                if first is not None or last is not None:
+                    ordinal = date_ordinal(task.get_date())
+                    if ordinal is None:
+                        continue
+                    if first is not None and ordinal < first:
+                        continue
+                    if last is not None and ordinal > last:
+                        continue
+                matches.append((index, task))
+
+        if sort is not None:
+            func = SORT_KEYS[sort][1]
+            matches.sort(key = lambda match: func(match[1]), reverse = reverse)
+        stop = None if limit is None else offset + limit
+        return [self._task_dict(index, task) for index, task in islice(matches, offset, stop)]
+
+
+    def task_block(self, group, id, blocker_group, blocker_id):
+        """
+        Makes a task wait until a task of any group is
+        completed and returns the waiting task.
+        """
+
+        task = self._task(group, id)
+        try:
+            self._dependencies.add_dependency(self._task(blocker_group, blocker_id), task)
+        except ValueError as error:
+            raise RpcError(INVALID_PARAMS, str(error))
+        return self._task_dict(group, task)
+
+
+    def task_unblock(self, group, id, blocker_group, blocker_id):
+        """
+        Removes the wait of a task on another task and
+        returns the task.
+        """
+
+        task = self._task(group, id)
+        self._dependencies.remove_dependency(self._task(blocker_group, blocker_id), task)
+        return self._task_dict(group, task)
+
+
+    def task_ready(self, group = None):
+        """
+        Returns the tasks of one or every group that are
+        not completed and have no open blockers.
+        """
+
+        indexes = range(len(self._groups)) if group is None else (group,)
+        return [
+            self._task_dict(index, task)
+            for index in indexes
+            for task in self._group(index).get_tasks()
+            if self._dependencies.is_ready(task)
+        ]
+
+
+    def _group(self, group):
+        """
+        Returns the group at an index or raises an error.
+        """
+
+        if not isinstance(group, int) or not 0 <= group < len(self._groups):
+            raise RpcError(INVALID_PARAMS, f"Unknown group: {group}")
+        return self._groups[group]
+
+
+    def _task(self, group, id):
+        """
+        Returns the task of a group with a given
+        identification number or raises an error.
+        """
+
+        for task in self._group(group).get_tasks():
+            if task.get_id_num() == id:
+                return task
+        raise RpcError(INVALID_PARAMS, f"Unknown task: {id}")
+
+
+    def _index(self, group):
+        """
+        Returns a dictionary of the tasks of a group by
+        identification number, used by bulk calls.
+        """
+
+        index = {}
+        for task in self._group(group).get_tasks():
+            index.setdefault(task.get_id_num(), task)
+        return index
+
+
+    def _allocate_id(self):
+        """
+        Returns an identification number that is not used
+        by any task yet.
+        """
+
+        if self._task_ids is None:
+            self._task_ids = IdAllocator(max(
+                (task.get_id_num() for grp in self._groups for task in grp.get_tasks()),
+                default = 0
+            ))
+        return self._task_ids.next_id()
+
+
+    def _apply_group(self, grp, name, color, description):
+        """
+        Sets the given fields of a group, once all of them
+        are checked.
+        """
+
+        if name is not None:
+            self._text("name", name)
+        if color is not None and not (isinstance(color, str) and COLOR_PATTERN.fullmatch(color)):
+            raise RpcError(INVALID_PARAMS, f"Invalid color, expected #rrggbb: {color}")
+        if description is not None:
+            self._text("description", description)
+
+        if name is not None:
+            grp.set_name(name)
+        if color is not None:
+            grp.set_color(color)
+        if description is not None:
+            grp.set_description(description)
+
+
+    def _apply_task(self, task, fields):
+        """
+        Sets the given fields of a task.
+        """
+
+        self._set_task(task, self._task_fields(fields))
+
+
+    def _task_fields(self, fields):
+        """
+        Returns the given task fields converted to the values
+        of the Task setters or raises an error.
+        """
+
+        converters = {
+            "name": partial(self._text, "name"),
+            "date": self._date,
+            "priority": self._priority,
+            "complete": self._flag,
+            "description": partial(self._text, "description")
+        }
+        unknown = set(fields) - set(converters)
+        if unknown:
+            raise RpcError(INVALID_PARAMS, f"Unknown task fields: {', '.join(sorted(unknown))}")
+        return {field: converters[field](value) for field, value in fields.items()}
+
+
+    def _build_task(self, fields):
+        """
+        Returns a new task with the next identification
+        number and fields already converted by _task_fields().
+        """
+
+        task_id = self._allocate_id()
+        task = Task(
+            task_id,
+            fields.get("name", f"Task #{task_id}"),
+            fields.get("date", NO_DATE),
+            fields.get("priority", Priority.LOW),
+            fields.get("complete", False)
+        )
+        if "description" in fields:
+            task.set_description(fields["description"])
+        return task
+
+
+    def _set_task(self, task, fields):
+        """
+        Sets fields of a task already converted by
+        _task_fields().
+        """
+
+        setters = {
+            "name": task.set_name,
+            "date": task.set_date,
+            "priority": task.set_priority,
+            "complete": task.set_completion,
+            "description": task.set_description
+        }
+        for field, value in fields.items():
+            setters[field](value)
+
+
+    def _text(self, field, value):
+        """
+        Returns a text field or raises an error when it is
+        not a string.
+        """
+
+        if not isinstance(value, str):
+            raise RpcError(INVALID_PARAMS, f"The {field} must be a string")
+        return value
+
+
+    def _flag(self, value):
+        """
+        Returns a completion status or raises an error when
+        it is not a boolean.
+        """
+
+        if not isinstance(value, bool):
+            raise RpcError(INVALID_PARAMS, f"Completion must be true or false, not {value!r}")
+        return value
+
+
+    def _date(self, value):
+        """
+        Validates a date given in the format of MM-DD-YYYY.
+        """
+
+        if value != NO_DATE:
+            self._ordinal(value)
+        return value
+
+
+    def _ordinal(self, value):
+        """
+        Returns the ordinal of a date or raises an error.
+        """
+
+        ordinal = date_ordinal(value)
+        if ordinal is None:
+            raise RpcError(INVALID_PARAMS, f"Invalid date: {value}")
+        return ordinal
+
+
+    def _priority(self, value):
+        """
+        Returns the priority with a given name or raises
+        an error.
+        """
+
+        try:
+            return Priority[value]
+        except (KeyError, TypeError):
+            raise RpcError(INVALID_PARAMS, f"Unknown priority: {value}")
+
+
+    def _group_dict(self, index, grp):
+        """
+        Returns the JSON representation of a group.
+        """
+
+        return {
+            "group": index,
+            "name": grp.get_name(),
+            "color": grp.get_color(),
+            "description": grp.get_description(),
+            "tasks": grp.get_task_count()
+        }
+
+
+    def _task_dict(self, index, task):
+        """
+        Returns the JSON representation of a task.
+        """
+
+        return {
+            "group": index,
+            "id": task.get_id_num(),
+            "name": task.get_name(),
+            "date": task.get_date(),
+            "priority": task.get_priority().name,
+            "complete": task.get_completion(),
+            "description": task.get_description(),
+            "blocked": self._dependencies.is_blocked(task)
+        }
+
+
+class _TcpServer(socketserver.ThreadingTCPServer):
+    """
+    A TCP server that serves each connection on a daemon
+    thread and can bind to a port left in TIME_WAIT.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    """
+    A Unix socket server that serves each connection on
+    a daemon thread.
+    """
+
+    daemon_threads = True
+
+
+class RpcServer:
+    """
+    A class built to serve a TaskApi over a local socket.
+
+    Connections are handled on background threads and carry any
+    number of newline-delimited JSON-RPC 2.0 requests or batches.
+    Calls are never run on those threads, each request is queued
+    and run on the Tk thread by a callback armed with root.after,
+    which then hands the responses back to the waiting connection.
+
+    Attributes:
+    --------------------
+    _root : tkinter.Tk
+        The root of the GUI application whose event loop
+        runs the calls.
+    _api : TaskApi
+        The methods that can be called.
+    _on_change : function
+        Called on the Tk thread after a drain that ran
+        at least one call that changes data.
+    _calls : Queue
+        Requests waiting to run on the Tk thread.
+    _server : socketserver.BaseServer
+        The server accepting connections.
+    _thread : threading.Thread
+        The thread running the server.
+    _after_id : str
+        The identifier of the armed drain callback.
+    _last_call : float
+        When the last call was run, the queue is drained
+        more often while calls keep coming.
+
+    Methods:
+    --------------------
+    start()
+        Starts accepting connections.
+    stop()
+        Stops accepting connections.
+    get_address()
+        Returns the address the server listens on.
+    """
+
+    def __init__(self, root, api, address, on_change = None):
+        """
+        A four-argument constructor for the class that
+        requires the root of the application, the API to
+        serve and an address, either a (host, port) pair
+        or the path of a Unix socket, and accepts a change
+        callback.
+        """
+
+        self._root = root
+        self._api = api
+        self._address = address
+        self._on_change = on_change
+        self._calls = Queue()
+        self._server = None
+        self._thread = None
+        self._after_id = None
+        self._last_call = 0.0
+
+
+    def start(self):
+        """
+        Starts accepting connections on a background thread
+        and draining calls on the Tk event loop.
+        """
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server._serve(self.rfile, self.wfile)
+
+        if isinstance(self._address, str):
+            _remove_socket(self._address)
+            self._server = _UnixServer(self._address, Handler)
+        elif not is_loopback(self._address[0]):
+            raise ValueError(f"The automation server only listens on this machine, not on {self._address[0]}")
+        else:
+            self._server = _TcpServer(self._address, Handler)
+        self._thread = threading.Thread(
+            target = self._server.serve_forever,
+            name = "rpc",
+            daemon = True
+        )
+        self._thread.start()
+        self._after_id = self._root.after(POLL_DELAY, self._drain)
+
+
+    def stop(self):
+        """
+        Stops accepting connections and draining calls.
+        """
+
+        if self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+            self._after_id = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            if isinstance(self._address, str):
+                # Whatever replaced the socket is left alone
+                try:
+                    _remove_socket(self._address)
+                except ValueError:
+                    pass
+
+
+    def get_address(self):
+        """
+        Returns the address the server listens on.
+        """
+
+        return self._server.server_address
+
+
+    def _serve(self, rfile, wfile):
+        """
+        Answers every request sent over a connection, runs
+        on the thread of that connection.
+        """
+
+        for line in rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response = _error(None, PARSE_ERROR, "Parse error")
+            else:
+                future = futures.Future()
+                self._calls.put((request, future))
+                try:
+                    response = future.result(timeout = CALL_TIMEOUT)
+                except futures.TimeoutError:
+                    response = _error(None, INTERNAL_ERROR, "Timed out waiting for the GUI")
+            if response is not None:
+                wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+                wfile.flush()
+
+
+    def _drain(self):
+        """
+        Event loop callback that runs queued calls until the
+        queue is empty or the time budget is spent.
+        """
+
+        deadline = time.perf_counter() + DRAIN_BUDGET
+        changed = False
+        ran = False
+        while time.perf_counter() < deadline:
+            try:
+                request, future = self._calls.get_nowait()
+            except Empty:
+                break
+            ran = True
+            if isinstance(request, list):
+                responses = [self._run(item) for item in request]
+                responses = [response for response in responses if response is not None]
+                if not request:
+                    responses = _error(None, INVALID_REQUEST, "Empty batch")
+                future.set_result(responses or None)
+                changed = changed or any(self._mutates(item) for item in request)
+            else:
+                future.set_result(self._run(request))
+                changed = changed or self._mutates(request)
+
+        if ran:
+            self._last_call = time.perf_counter()
+        if changed and self._on_change is not None:
+            self._on_change()
+        busy = time.perf_counter() - self._last_call < BUSY_WINDOW
+        self._after_id = self._root.after(BUSY_DELAY if busy else POLL_DELAY, self._drain)
+
+
+    def _mutates(self, request):
+        """
+        Returns whether a request may have changed data.
+        """
+
+        return isinstance(request, dict) and not self._api.is_read_only(request.get("method"))
+
+
+    def _run(self, request):
+        """
+        Runs a single request and returns its response, None
+        for notifications that expect no response.
+        """
+
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error(None, INVALID_REQUEST, "Invalid request")
+
+        request_id = request.get("id")
+        params = request.get("params", {})
+        if not isinstance(params, (list, dict)):
+            return _error(request_id, INVALID_REQUEST, "Invalid params")
+        # Observers hear about the changes of a call at once
+        # when it returns, so the next call sees them
+        try:
+            with batch():
+                result = self._api.call(request["method"], params)
+        except RpcError as error:
+            response = _error(request_id, error.code, str(error))
+        except Exception as error:
+            response = _error(request_id, INTERNAL_ERROR, str(error))
+        else:
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        return response if "id" in request else None
+
+
+class RpcClient:
+    """
+    A class built to call a running RpcServer over a
+    single reused connection.
+
+    Attributes:
+    --------------------
+    _socket : socket.socket
+        The connection to the server.
+    _file : file
+        A buffered file wrapping the connection.
+    _counter : int
+        The id of the last sent request.
+
+    Methods:
+    --------------------
+    call()
+        Calls a single method and returns its result.
+    batch()
+        Calls many methods in a single round trip.
+    close()
+        Closes the connection.
+    """
+
+    def __init__(self, address):
+        """
+        A one-argument constructor for the class that
+        requires the address of the server.
+        """
+
+        if isinstance(address, str):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.connect(address)
+        self._file = self._socket.makefile("rwb")
+        self._counter = 0
+
+
+    def call(self, method, **params):
+        """
+        Calls a method with named parameters and returns its
+        result, raises RpcError if the call failed.
+        """
+
+        response = self._send(self._request(method, params))
+        if "error" in response:
+            raise RpcError(response["error"]["code"], response["error"]["message"])
+        return response["result"]
+
+
+    def batch(self, calls):
+        """
+        Calls every (method, params) pair in a single round
+        trip and returns the list of responses in order.
+        """
+
+        requests = [self._request(method, params) for method, params in calls]
+        responses = {response["id"]: response for response in self._send(requests)}
+        return [responses[request["id"]] for request in requests]
+
+
+    def close(self):
+        """
+        Closes the connection to the server.
+        """
+
+        self._file.close()
+        self._socket.close()
+
+
+    def _request(self, method, params):
+        """
+        Builds a request with the next id.
+        """
+
+        self._counter += 1
+        return {"jsonrpc": "2.0", "id": self._counter, "method": method, "params": params}
+
+
+    def _send(self, payload):
+        """
+        Sends a request or batch and reads its response.
+        """
+
+        self._file.write(json.dumps(payload).encode("utf-8") + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("The server closed the connection")
+        return json.loads(line)
+
+
+def is_loopback(host):
+    """
+    Returns whether a host name or IPv4 address only
+    reaches the local machine.
+    """
+
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.IPv4Address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _remove_socket(path):
+    """
+    Removes the Unix socket left at a path by an earlier
+    server, if there is one. Raises a ValueError when the
+    path holds anything other than a socket.
+    """
+
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"Not a socket, refusing to replace it: {path}")
+    os.unlink(path)
+
+
+def _error(request_id, code, message):
+    """
+    Returns a JSON-RPC error response.
+    """
+
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
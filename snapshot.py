@@ -0,0 +1,698 @@
+from array import array
+import mmap
+import os
+import struct
+import zlib
+
+from task import Task, Priority, NO_DATE, date_ordinal, ordinal_date
+from group import Group
+from recurrence import Recurrence, Frequency
+
+# Constants for the module
+SAVE_PATH = os.path.join(os.path.expanduser("~"), ".kittytask", "tasks.ktsnap")
+MAGIC = b"KTSNAP\x00\x00"   # First bytes of every snapshot file
+VERSION = 1                 # Version of the snapshot format
+ALIGNMENT = 8               # Every section starts on a multiple of this
+
+# Header holding the magic bytes, version, group count, task count,
+# string heap offset and string heap length
+HEADER = struct.Struct("<8sHxxIIQQ")
+
+# Fixed-width columns of the group table as (name, array typecode)
+GROUP_COLUMNS = (
+    ("name_off", "I"),
+    ("name_len", "I"),
+    ("desc_off", "I"),
+    ("desc_len", "I"),
+    ("color", "I"),
+    ("first", "I"),
+    ("count", "I"),
+    ("uid_hi", "Q"),
+    ("uid_lo", "Q"),
+    ("heap_off", "Q"),
+    ("heap_len", "Q"),
+    ("crc", "I")
+)
+
+# Group columns left out of the checksum of a group, the checksum
+# itself and the position of the group strings which only depends
+# on the groups before it
+UNCHECKED_COLUMNS = ("heap_off", "crc")
+
+# Fixed-width columns of the task table as (name, array typecode),
+# tasks are stored contiguously by group
+TASK_COLUMNS = (
+    ("id", "q"),
+    ("group", "I"),
+    ("date", "i"),
+    ("priority", "B"),
+    ("complete", "B"),
+    ("name_off", "I"),
+    ("name_len", "I"),
+    ("desc_off", "I"),
+    ("desc_len", "I"),
+    ("repeat", "B"),
+    ("interval", "I"),
+    ("until", "i"),
+    ("done_off", "I"),
+    ("done_len", "I"),
+    ("attach_off", "I"),
+    ("attach_len", "I"),
+    ("block_off", "I"),
+    ("block_len", "I"),
+    ("timer", "q"),
+    ("time_off", "I"),
+    ("time_len", "I"),
+    ("uid_hi", "Q"),
+    ("uid_lo", "Q")
+)
+
+# Offsets of the column sections that follow the header
+DIRECTORY = struct.Struct(f"<{len(GROUP_COLUMNS) + len(TASK_COLUMNS)}Q")
+
+UID_HALF = 64               # Bits of a uid stored in each of its two columns
+UID_MASK = (1 << UID_HALF) - 1
+
+ATTACHMENT_SEPARATOR = "\n"  # Separates attachment paths in the string heap
+
+
+class Snapshot:
+    """
+    A class built to read a binary snapshot of every group
+    and task through a memory map.
+
+    A snapshot stores one fixed-width column per field of the
+    groups and tasks followed by a heap of UTF-8 strings. The
+    columns are read in place from the mapped file, so counts,
+    names and dates are available before a single Task object
+    is built, and tasks are only materialized when accessed.
+
+    Every group keeps its own strings in one range of the heap
+    that the offsets of the group and its tasks are relative
+    to, along with a checksum of its rows and strings. Each
+    group can therefore be checked or rewritten on its own.
+
+    Attributes:
+    --------------------
+    _path : str
+        The path of the snapshot file.
+    _file : file
+        The open snapshot file.
+    _map : mmap.mmap
+        The read-only memory map of the file.
+    _view : memoryview
+        A view of the whole memory map.
+    _groups : dict
+        Maps each group column name to a memoryview of
+        its values.
+    _tasks : dict
+        Maps each task column name to a memoryview of
+        its values.
+    _heap : memoryview
+        A view of the string heap.
+    _built : dict
+        Maps the index of every task built so far to the
+        task, so each task is only ever built once.
+
+    Methods:
+    --------------------
+    group_count()
+        Returns the number of groups in the snapshot.
+    task_count()
+        Returns the number of tasks in the snapshot.
+    group_name()
+        Returns the name of a group without building it.
+    group_task_count()
+        Returns the number of tasks of a group.
+    group_task_range()
+        Returns the indexes of the tasks of a group.
+    task_id()
+        Returns the identification number of a task.
+    max_task_id()
+        Returns the largest task identification number.
+    task_name()
+        Returns the name of a task without building it.
+    task_date()
+        Returns the date of a task without building it.
+    task_priority()
+        Returns the priority of a task without building it.
+    task_completion()
+        Returns the completion status of a task.
+    task_blockers()
+        Returns the indexes of the tasks blocking a task.
+    task()
+        Builds the task stored at a given index.
+    verify_group()
+        Checks the stored data of a group.
+    load_groups()
+        Builds every group with lazily loaded tasks.
+    load_dependencies()
+        Adds the stored dependencies to a graph.
+    close()
+        Releases the memory map and closes the file.
+    """
+
+    def __init__(self, path):
+        """
+        A one-argument constructor for the class that
+        requires the path of a snapshot file, only the
+        header and directory are read.
+        """
+
+        self._path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Empty snapshot file: {path}")
+        self._view = memoryview(self._map)
+
+        if len(self._view) < HEADER.size:
+            self.close()
+            raise ValueError(f"Truncated snapshot file: {path}")
+        magic, version, groups, tasks, heap_off, heap_len = HEADER.unpack_from(self._view)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Not a snapshot file: {path}")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Unsupported snapshot version {version}: {path}")
+
+        if len(self._view) < HEADER.size + DIRECTORY.size:
+            self.close()
+            raise ValueError(f"Truncated snapshot file: {path}")
+        offsets = DIRECTORY.unpack_from(self._view, HEADER.size)
+        self._group_total = groups
+        self._task_total = tasks
+        self._groups = self._columns(GROUP_COLUMNS, offsets[:len(GROUP_COLUMNS)], groups)
+        self._tasks = self._columns(TASK_COLUMNS, offsets[len(GROUP_COLUMNS):], tasks)
+        self._heap = self._view[heap_off:heap_off + heap_len]
+        self._built = {}
+
+
+    def group_count(self):
+        """
+        Returns the number of groups in the snapshot.
+        """
+
+        return self._group_total
+
+
+    def task_count(self):
+        """
+        Returns the number of tasks in the snapshot.
+        """
+
+        return self._task_total
+
+
+    def group_name(self, index):
+        """
+        Returns the name of the group at a given index
+        straight from the string heap.
+        """
+
+        return self._string(self._groups, "name", index)
+
+
+    def group_task_count(self, index):
+        """
+        Returns the number of tasks of the group at a
+        given index.
+        """
+
+        return self._groups["count"][index]
+
+
+    def group_task_range(self, index):
+        """
+        Returns the range of the indexes of the tasks of
+        the group at a given index.
+        """
+
+        first = self._groups["first"][index]
+        return range(first, first + self._groups["count"][index])
+
+
+    def task_id(self, index):
+        """
+        Returns the identification number of the task at
+        a given index.
+        """
+
+        return self._tasks["id"][index]
+
+
+    def max_task_id(self):
+        """
+        Returns the largest identification number of any
+        task, 0 when the snapshot holds no tasks.
+        """
+
+        return max(self._tasks["id"], default = 0)
+
+
+    def task_name(self, index):
+        """
+        Returns the name of the task at a given index
+        straight from the string heap.
+        """
+
+        return self._string(self._tasks, "name", index)
+
+
+    def task_date(self, index):
+        """
+        Returns the date of the task at a given index in
+        the format of MM-DD-YYYY.
+        """
+
+        ordinal = self._tasks["date"][index]
+        return ordinal_date(ordinal) if ordinal else NO_DATE
+
+
+    def task_priority(self, index):
+        """
+        Returns the priority of the task at a given index
+        as an Enum object.
+        """
+
+        return Priority(self._tasks["priority"][index])
+
+
+    def task_completion(self, index):
+        """
+        Returns the completion status of the task at a
+        given index.
+        """
+
+        return bool(self._tasks["complete"][index])
+
+
+    def task_blockers(self, index):
+        """
+        Returns an array of the indexes of the tasks that
+        block the task at a given index.
+        """
+
+        blockers = array("i")
+        start = self._task_base(index) + self._tasks["block_off"][index]
+        blockers.frombytes(self._heap[start:start + self._tasks["block_len"][index] * blockers.itemsize])
+        return blockers
+
+
+    def task(self, index):
+        """
+        Builds and returns the task stored at a given index,
+        later calls return the same task.
+        """
+
+        if index not in self._built:
+            self._built[index] = self._build(index)
+        return self._built[index]
+
+
+    def verify_group(self, index):
+        """
+        Returns whether the group at a given index matches
+        its stored checksum and every one of its tasks can
+        be built. The tasks built are kept, so loading the
+        group afterwards does not build them again.
+        """
+
+        tasks = self.group_task_range(index)
+        start = self._groups["heap_off"][index]
+        stop = start + self._groups["heap_len"][index]
+        if stop > len(self._heap):
+            return False
+        group_rows = [
+            self._groups[name][index:index + 1]
+            for name, _ in GROUP_COLUMNS if name not in UNCHECKED_COLUMNS
+        ]
+        task_rows = [self._tasks[name][tasks.start:tasks.stop] for name, _ in TASK_COLUMNS]
+        if _checksum(group_rows, task_rows, self._heap[start:stop]) != self._groups["crc"][index]:
+            return False
+
+        try:
+            self._string(self._groups, "name", index)
+            self._string(self._groups, "desc", index)
+            for task_index in tasks:
+                if self._tasks["group"][task_index] != index:
+                    return False
+                self.task(task_index)
+                if any(blocker >= self._task_total for blocker in self.task_blockers(task_index)):
+                    return False
+        except (ValueError, IndexError, OverflowError):
+            return False
+        return True
+
+
+    def load_groups(self):
+        """
+        Builds and returns a list of every group, the tasks
+        of each group are only built the first time they
+        are accessed.
+        """
+
+        columns = self._groups
+        groups = []
+        for index in range(self._group_total):
+            grp = Group(self._string(columns, "name", index))
+            grp.set_color(f"#{columns['color'][index]:06x}")
+            grp.set_description(self._string(columns, "desc", index))
+            grp.set_uid(_uid(columns, index))
+            first = columns["first"][index]
+            count = columns["count"][index]
+            grp.set_loader(self._loader(first, first + count), count)
+            groups.append(grp)
+        return groups
+
+
+    def load_dependencies(self, graph):
+        """
+        Adds every stored dependency to a DependencyGraph.
+        Only the tasks that are part of a dependency are
+        built, and the groups reuse them once loaded.
+        """
+
+        for index, count in enumerate(self._tasks["block_len"]):
+            if count:
+                task = self.task(index)
+                for blocker in self.task_blockers(index):
+                    graph.add_dependency(self.task(blocker), task)
+
+
+    def close(self):
+        """
+        Releases every view of the memory map and closes
+        the file, tasks that have not been loaded yet can
+        no longer be accessed afterwards.
+        """
+
+        for columns in (getattr(self, "_groups", {}), getattr(self, "_tasks", {})):
+            for column in columns.values():
+                column.release()
+        if getattr(self, "_heap", None) is not None:
+            self._heap.release()
+        self._groups = {}
+        self._tasks = {}
+        self._heap = None
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+
+    def _build(self, index):
+        """
+        Builds a new task from the row at a given index.
+        """
+
+        columns = self._tasks
+        base = self._task_base(index)
+        task = Task(
+            columns["id"][index],
+            self._string(columns, "name", index),
+            self.task_date(index),
+            Priority(columns["priority"][index]),
+            bool(columns["complete"][index])
+        )
+        task.set_description(self._string(columns, "desc", index))
+
+        if columns["repeat"][index]:
+            until = columns["until"][index]
+            task.set_recurrence(Recurrence(
+                Frequency(columns["repeat"][index]),
+                columns["interval"][index],
+                until if until else None
+            ))
+            start = base + columns["done_off"][index]
+            done = array("i")
+            done.frombytes(self._heap[start:start + columns["done_len"][index] * done.itemsize])
+            for ordinal in done:
+                task.set_occurrence_completion(ordinal_date(ordinal), True)
+
+        if columns["attach_len"][index]:
+            for path in self._string(columns, "attach", index).split(ATTACHMENT_SEPARATOR):
+                task.add_attachment(path)
+
+        if columns["time_len"][index]:
+            start = base + columns["time_off"][index]
+            intervals = array("q")
+            intervals.frombytes(self._heap[start:start + columns["time_len"][index] * 2 * intervals.itemsize])
+            for offset in range(0, len(intervals), 2):
+                task.add_interval(intervals[offset], intervals[offset + 1])
+        if columns["timer"][index]:
+            task.start_timer(columns["timer"][index])
+        task.set_uid(_uid(columns, index))
+        return task
+
+
+    def _columns(self, layout, offsets, count):
+        """
+        Returns a dictionary of typed memoryviews for the
+        columns of a table.
+        """
+
+        columns = {}
+        for (name, typecode), offset in zip(layout, offsets):
+            size = struct.calcsize(typecode) * count
+            if offset + size > len(self._view):
+                self.close()
+                raise ValueError(f"Truncated snapshot file: {self._path}")
+            columns[name] = self._view[offset:offset + size].cast(typecode)
+        return columns
+
+
+    def _string(self, columns, prefix, index):
+        """
+        Decodes a string of a table from the string heap.
+        """
+
+        if columns is self._tasks:
+            start = self._task_base(index)
+        else:
+            start = self._group_base(index)
+        start += columns[f"{prefix}_off"][index]
+        return str(self._heap[start:start + columns[f"{prefix}_len"][index]], "utf-8")
+
+
+    def _group_base(self, index):
+        """
+        Returns the start of the strings of the group at a
+        given index.
+        """
+
+        return self._groups["heap_off"][index]
+
+
+    def _task_base(self, index):
+        """
+        Returns the start of the strings of the group of
+        the task at a given index.
+        """
+
+        return self._groups["heap_off"][self._tasks["group"][index]]
+
+
+    def _loader(self, start, stop):
+        """
+        Returns a function that builds the tasks stored
+        between two indexes.
+        """
+
+        return lambda: [self.task(index) for index in range(start, stop)]
+
+
+def write_snapshot(path, groups, dependencies = None):
+    """
+    Writes every given group and its tasks to a snapshot
+    file, along with the edges of a DependencyGraph between
+    those tasks. The file is written next to the destination
+    and then renamed over it, so a reader never sees a partly
+    written snapshot.
+    """
+
+    # Dependencies are stored as the indexes of the blocking
+    # tasks, edges to tasks outside the groups are dropped
+    rows = {}
+    if dependencies is not None and dependencies.edges():
+        for grp in groups:
+            for task in grp.get_tasks():
+                rows[id(task)] = len(rows)
+
+    parts = []
+    first = 0
+    for group_index, grp in enumerate(groups):
+        tasks = grp.get_tasks()
+        if rows:
+            blockers = [
+                sorted(rows[id(blocker)] for blocker in dependencies.get_blockers(task) if id(blocker) in rows)
+                for task in tasks
+            ]
+        else:
+            blockers = [()] * len(tasks)
+        parts.append(encode_group(grp, tasks, group_index, first, blockers))
+        first += len(tasks)
+    write_parts(path, parts)
+
+
+def encode_group(grp, tasks, group_index, first, blockers):
+    """
+    Returns a tuple of the group row, the task columns and
+    the strings of one group, ready for write_parts(). The
+    tasks of the group start at the given task index and
+    blockers holds the indexes of the tasks blocking each
+    of them. String offsets are relative to the strings of
+    the group, so groups can be encoded separately.
+    """
+
+    heap = bytearray()
+    strings = {}
+
+    def intern(text):
+        data = text.encode("utf-8")
+        if data not in strings:
+            strings[data] = len(heap)
+            heap.extend(data)
+        return (strings[data], len(data))
+
+    task_columns = {name: array(typecode) for name, typecode in TASK_COLUMNS}
+    group_row = {name: 0 for name, _ in GROUP_COLUMNS}
+    group_row["name_off"], group_row["name_len"] = intern(grp.get_name())
+    group_row["desc_off"], group_row["desc_len"] = intern(grp.get_description())
+    group_row["color"] = int(grp.get_color().lstrip("#"), 16)
+    group_row["first"] = first
+    group_row["count"] = len(tasks)
+    group_row["uid_hi"] = grp.get_uid() >> UID_HALF
+    group_row["uid_lo"] = grp.get_uid() & UID_MASK
+
+    for task, blocked_by in zip(tasks, blockers):
+        name_off, name_len = intern(task.get_name())
+        desc_off, desc_len = intern(task.get_description())
+        attach_off, attach_len = intern(ATTACHMENT_SEPARATOR.join(task.get_attachments()))
+        recurrence = task.get_recurrence()
+        task_columns["id"].append(task.get_id_num())
+        task_columns["group"].append(group_index)
+        task_columns["date"].append(date_ordinal(task.get_date()) or 0)
+        task_columns["priority"].append(task.get_priority().value)
+        task_columns["complete"].append(int(task.get_completion()))
+        task_columns["name_off"].append(name_off)
+        task_columns["name_len"].append(name_len)
+        task_columns["desc_off"].append(desc_off)
+        task_columns["desc_len"].append(desc_len)
+        task_columns["attach_off"].append(attach_off)
+        task_columns["attach_len"].append(attach_len)
+        task_columns["uid_hi"].append(task.get_uid() >> UID_HALF)
+        task_columns["uid_lo"].append(task.get_uid() & UID_MASK)
+
+        if recurrence is None:
+            done = array("i")
+            task_columns["repeat"].append(0)
+            task_columns["interval"].append(0)
+            task_columns["until"].append(0)
+        else:
+            done = array("i", sorted(task.get_completed_occurrences()))
+            task_columns["repeat"].append(recurrence.get_frequency().value)
+            task_columns["interval"].append(recurrence.get_interval())
+            task_columns["until"].append(recurrence.get_until() or 0)
+        heap.extend(bytes(-len(heap) % done.itemsize))
+        task_columns["done_off"].append(len(heap))
+        task_columns["done_len"].append(len(done))
+        heap.extend(done.tobytes())
+
+        blocked_by = array("i", blocked_by)
+        task_columns["block_off"].append(len(heap))
+        task_columns["block_len"].append(len(blocked_by))
+        heap.extend(blocked_by.tobytes())
+
+        intervals = array("q", [value for pair in task.get_intervals() for value in pair])
+        heap.extend(bytes(-len(heap) % intervals.itemsize))
+        task_columns["timer"].append(task.get_timer_start() or 0)
+        task_columns["time_off"].append(len(heap))
+        task_columns["time_len"].append(len(intervals) // 2)
+        heap.extend(intervals.tobytes())
+
+    group_row["heap_len"] = len(heap)
+    group_row["crc"] = _checksum(
+        [array(typecode, [group_row[name]]) for name, typecode in GROUP_COLUMNS if name not in UNCHECKED_COLUMNS],
+        [task_columns[name] for name, _ in TASK_COLUMNS],
+        heap
+    )
+    return (group_row, task_columns, bytes(heap))
+
+
+def write_parts(path, parts):
+    """
+    Writes the encoded groups returned by encode_group() to
+    a snapshot file in order. The file is written next to
+    the destination and then renamed over it.
+    """
+
+    group_columns = {name: array(typecode) for name, typecode in GROUP_COLUMNS}
+    task_sections = {name: [] for name, _ in TASK_COLUMNS}
+    heap = bytearray()
+    task_total = 0
+    for group_row, task_columns, group_heap in parts:
+        heap.extend(bytes(-len(heap) % ALIGNMENT))
+        group_row = dict(group_row, heap_off = len(heap))
+        heap.extend(group_heap)
+        for name, _ in GROUP_COLUMNS:
+            group_columns[name].append(group_row[name])
+        for name, _ in TASK_COLUMNS:
+            task_sections[name].append(task_columns[name].tobytes())
+        task_total += len(task_columns["id"])
+
+    sections = [group_columns[name].tobytes() for name, _ in GROUP_COLUMNS]
+    sections += [b"".join(task_sections[name]) for name, _ in TASK_COLUMNS]
+    offset = _align(HEADER.size + DIRECTORY.size)
+    offsets = []
+    for section in sections:
+        offsets.append(offset)
+        offset = _align(offset + len(section))
+
+    temp_path = f"{path}.tmp"
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok = True)
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(parts), task_total, offset, len(heap)))
+        file.write(DIRECTORY.pack(*offsets))
+        for section_offset, section in zip(offsets, sections):
+            file.write(bytes(section_offset - file.tell()))
+            file.write(section)
+        file.write(bytes(offset - file.tell()))
+        file.write(heap)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def _checksum(group_rows, task_rows, heap):
+    """
+    Returns the CRC-32 of the rows of a group, the rows of
+    its tasks column by column, and its strings.
+    """
+
+    crc = 0
+    for data in group_rows:
+        crc = zlib.crc32(data, crc)
+    for data in task_rows:
+        crc = zlib.crc32(data, crc)
+    return zlib.crc32(heap, crc)
+
+
+def _uid(columns, index):
+    """
+    Joins the two halves of a stored uid.
+    """
+
+    return columns["uid_hi"][index] << UID_HALF | columns["uid_lo"][index]
+
+
+def _align(offset):
+    """
+    Rounds an offset up to the next section boundary.
+    """
+
+    return offset + -offset % ALIGNMENT
@@ -0,0 +1,826 @@
+import json
+import os
+import time
+
+from events import FieldChanged, TaskAdded, TaskRemoved, TasksReplaced
+from group import Group
+from recurrence import Recurrence, Frequency
+from task import Task, IdAllocator, Priority, new_uid, ordinal_date
+
+# Constants for the module
+COUNTER_BITS = 24           # Bits of a stamp counting events within one millisecond
+NODE_BITS = 64              # Bits of a stamp naming the replica that made it
+COMPACT_FACTOR = 4          # Log lines per live object that trigger a rewrite
+
+# Fields of tasks and groups kept in last-writer-wins registers
+TASK_FIELDS = (
+    "name",
+    "date",
+    "priority",
+    "description",
+    "completion",
+    "recurrence",
+    "occurrences",
+    "attachments"
+)
+GROUP_FIELDS = ("name", "color", "description")
+
+
+def replica_path(save_path):
+    """
+    Returns the path of the replica log kept next to a
+    save file.
+    """
+
+    return os.path.splitext(save_path)[0] + ".ktlog"
+
+
+class Clock:
+    """
+    A class built to hand out hybrid logical clock stamps.
+
+    A stamp packs the wall clock in milliseconds, a counter
+    and the node of the replica into one integer, so stamps
+    compare in time order and two replicas never make equal
+    stamps. The clock never runs backwards and moves past
+    every stamp it observes from other replicas, so a change
+    made after seeing another change always wins over it,
+    even between machines whose wall clocks disagree.
+
+    Attributes:
+    --------------------
+    _node : int
+        The random node of the replica.
+    _wall : int
+        The wall clock of the last stamp in milliseconds.
+    _counter : int
+        The counter of the last stamp.
+
+    Methods:
+    --------------------
+    now()
+        Returns a new stamp for a local change.
+    observe()
+        Moves the clock past a stamp from another replica.
+    """
+
+    def __init__(self, node):
+        """
+        A one-argument constructor for the class that
+        requires the node of the replica.
+        """
+
+        self._node = node
+        self._wall = 0
+        self._counter = 0
+
+
+    def now(self):
+        """
+        Returns a stamp later than every stamp made or
+        observed so far.
+        """
+
+        wall = max(self._wall, time.time_ns() // 1000000)
+        self._counter = self._counter + 1 if wall == self._wall else 0
+        self._wall = wall
+        return (wall << COUNTER_BITS | self._counter) << NODE_BITS | self._node
+
+
+    def observe(self, stamp):
+        """
+        Moves the clock past a stamp so the next local
+        stamp is later than it.
+        """
+
+        wall = stamp >> (COUNTER_BITS + NODE_BITS)
+        counter = stamp >> NODE_BITS & ((1 << COUNTER_BITS) - 1)
+        if (wall, counter) > (self._wall, self._counter):
+            self._wall = wall
+            self._counter = counter
+
+
+class Replica:
+    """
+    A class built to make the groups and tasks of one
+    machine mergeable with those of another.
+
+    Every field of a task or group is a last-writer-wins
+    register stamped by a hybrid logical clock, and deleting
+    a task or group leaves a tombstone that wins over every
+    other change to it. Local changes are appended to a log
+    file of JSON lines, one [uid, {field: [stamp, value]}]
+    update per line. Merging another replica reads its log
+    only from where the previous merge stopped, so the work
+    is proportional to the changes since the last sync, and
+    any two replicas that merged each other's changes hold
+    the same values whatever order the merges ran in.
+
+    Only the stamps are kept in memory, the values live in
+    the tasks and groups. A task or group that has not
+    changed since it was created keeps a single stamp for
+    all of its fields.
+
+    Attributes:
+    --------------------
+    _path : str
+        The path of the log file.
+    _node : int
+        The random node of this replica.
+    _epoch : int
+        Changes whenever the log is rewritten, so other
+        replicas know their read offset is no longer valid.
+    _clock : Clock
+        Hands out the stamps of local changes.
+    _created : dict
+        Maps the uid of every known task and group to the
+        stamp of its creation.
+    _changed : dict
+        Maps (uid, field) pairs changed since creation to
+        the stamp of their last change.
+    _deleted : dict
+        Maps the uid of every deleted task and group to
+        the stamp of its tombstone.
+    _waiting : dict
+        Maps the uid of objects whose creation has not been
+        seen yet to the updates received for them.
+    _live : dict
+        Maps the uid of every shown task and group to a pair
+        of the object and its group, None for groups.
+    _peers : dict
+        Maps the node of every merged replica to the epoch
+        and offset its log was read up to.
+    _groups : list
+        The list of groups of the application, remote groups
+        are added to and removed from it.
+    _lines : list
+        The log lines not written to the file yet.
+    _line_count : int
+        The number of lines in the log file.
+    _task_ids : IdAllocator
+        Hands out the identification numbers of the tasks
+        received from other replicas.
+    _applying : bool
+        Whether remote changes are being applied, so their
+        events are not logged again as local changes.
+    _on_group_added : function
+        Called with every group received from a merge.
+    _on_group_removed : function
+        Called with every group deleted by a merge.
+
+    Methods:
+    --------------------
+    add_group()
+        Starts following a group and its tasks.
+    follow_group()
+        Starts following a group that predates the replica.
+    delete_group()
+        Records the deletion of a group.
+    merge()
+        Merges the changes of another replica log.
+    pending()
+        Returns the number of log lines not saved yet.
+    save()
+        Appends the new changes to the log file.
+    compact()
+        Rewrites the log file with one line per object.
+    """
+
+    def __init__(self, path, groups, on_group_added = None, on_group_removed = None, task_ids = None, follow = True):
+        """
+        A constructor for the class that requires the path
+        of the log file and the list of groups, and accepts
+        the allocator of task identification numbers shared
+        with the rest of the application. The log is read,
+        then every group and task not in it yet is recorded
+        as created, unless told not to follow the groups yet,
+        in which case follow_group() is called for each of
+        them later.
+        """
+
+        self._path = path
+        self._node = None
+        self._epoch = None
+        self._created = {}
+        self._changed = {}
+        self._deleted = {}
+        self._waiting = {}
+        self._live = {}
+        self._peers = {}
+        self._groups = groups
+        self._lines = []
+        self._line_count = 0
+        self._applying = False
+        self._on_group_added = on_group_added
+        self._on_group_removed = on_group_removed
+
+        latest = 0
+        if os.path.exists(path):
+            with open(path, encoding = "utf-8") as file:
+                latest = self._read_log(file)
+        if self._node is None:
+            self._node = new_uid() & ((1 << NODE_BITS) - 1)
+            self._epoch = new_uid()
+            self._lines.append(self._header())
+        self._clock = Clock(self._node)
+        self._clock.observe(latest)
+
+        if task_ids is None:
+            task_ids = IdAllocator(max(
+                (task.get_id_num() for grp in groups for task in grp.get_tasks()),
+                default = 0
+            ))
+        self._task_ids = task_ids
+        if follow:
+            for grp in list(groups):
+                self.follow_group(grp)
+
+
+    def add_group(self, grp):
+        """
+        Starts following a group created after the replica,
+        it is recorded as created along with its tasks.
+        """
+
+        self._follow_group(grp, self._clock.now())
+
+
+    def follow_group(self, grp):
+        """
+        Starts following a group that was there before the
+        replica was created.
+        """
+
+        # Objects that were there before the replica get the
+        # oldest stamp, machines that started from copies of
+        # one save file then agree on them without a change
+        self._follow_group(grp, 0)
+
+
+    def delete_group(self, grp):
+        """
+        Records the deletion of a group and stops following
+        it and its tasks.
+        """
+
+        uid = grp.get_uid()
+        if uid not in self._live:
+            return
+
+        self._unfollow_group(grp)
+        if uid not in self._deleted:
+            self._record(uid, {"deleted": True})
+
+
+    def merge(self, path):
+        """
+        Merges the changes another replica logged since the
+        last merge with it and returns the number of fields
+        that changed here. Raises a ValueError for a file
+        that is not a replica log or is this replica's own.
+        """
+
+        with open(path, "rb") as file:
+            header = _decode(file.readline())
+            if not isinstance(header, dict) or "replica" not in header:
+                raise ValueError(f"Not a replica log: {path}")
+            node = header["replica"]
+            if node == self._node:
+                raise ValueError(f"Cannot merge a replica with itself: {path}")
+
+            epoch, offset = self._peers.get(node, (None, 0))
+            if epoch == header["epoch"] and offset > file.tell():
+                file.seek(offset)
+            changes = 0
+            latest = 0
+            offset = file.tell()
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                entry = _decode(line)
+                if isinstance(entry, list):
+                    uid, fields = entry
+                    latest = max(latest, max(stamp for stamp, _ in fields.values()))
+                    changes += self._apply(uid, fields)
+
+        self._clock.observe(latest)
+        self._peers[node] = (header["epoch"], offset)
+        self._lines.append(json.dumps({"peer": node, "epoch": header["epoch"], "offset": offset}))
+        return changes
+
+
+    def pending(self):
+        """
+        Returns the number of log lines that the next
+        save will write.
+        """
+
+        return len(self._lines)
+
+
+    def save(self):
+        """
+        Appends the changes made since the last save to the
+        log file, the log is rewritten instead once it holds
+        many lines per live object.
+        """
+
+        if self._line_count + len(self._lines) > COMPACT_FACTOR * max(len(self._live), 1) + 1:
+            self.compact()
+            return
+        if not self._lines:
+            return
+
+        folder = os.path.dirname(self._path)
+        if folder:
+            os.makedirs(folder, exist_ok = True)
+        with open(self._path, "a", encoding = "utf-8") as file:
+            file.write("\n".join(self._lines) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self._line_count += len(self._lines)
+        self._lines = []
+
+
+    def compact(self):
+        """
+        Rewrites the log file with one line per live object
+        and tombstone, holding every field with its stamp.
+        Other replicas read the whole log on their next merge
+        since their offsets no longer apply.
+        """
+
+        # Objects that are known but not shown, such as archived
+        # tasks, keep the latest fields found in the old log
+        hidden = {uid for uid in self._created if uid not in self._live and uid not in self._deleted}
+        history = self._history(hidden) if hidden else {}
+
+        self._epoch = new_uid()
+        lines = [self._header()]
+        for uid, stamp in self._deleted.items():
+            lines.append(json.dumps([uid, {"deleted": [stamp, True]}]))
+        for uid, fields in history.items():
+            lines.append(json.dumps([uid, fields]))
+        groups = [uid for uid, (_, parent) in self._live.items() if parent is None]
+        tasks = [uid for uid, (_, parent) in self._live.items() if parent is not None]
+        for uid in groups + tasks:
+            source, parent = self._live[uid]
+            created = self._created[uid]
+            fields = {
+                field: [self._changed.get((uid, field), created), value]
+                for field, value in _values(source, parent).items()
+            }
+            lines.append(json.dumps([uid, fields]))
+        for node, (epoch, offset) in self._peers.items():
+            lines.append(json.dumps({"peer": node, "epoch": epoch, "offset": offset}))
+
+        temp_path = f"{self._path}.tmp"
+        folder = os.path.dirname(self._path)
+        if folder:
+            os.makedirs(folder, exist_ok = True)
+        with open(temp_path, "w", encoding = "utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self._path)
+        self._line_count = len(lines)
+        self._lines = []
+
+
+    def _header(self):
+        """
+        Returns the first line of the log file.
+        """
+
+        return json.dumps({"replica": self._node, "epoch": self._epoch})
+
+
+    def _read_log(self, file):
+        """
+        Reads the stamps of every update in the local log
+        and returns the latest one.
+        """
+
+        latest = 0
+        for line in file:
+            if not line.endswith("\n"):
+                break
+            self._line_count += 1
+            entry = _decode(line)
+            if isinstance(entry, dict):
+                if "replica" in entry:
+                    self._node = entry["replica"]
+                    self._epoch = entry["epoch"]
+                else:
+                    self._peers[entry["peer"]] = (entry["epoch"], entry["offset"])
+                continue
+
+            uid, fields = entry
+            for field, (stamp, _) in fields.items():
+                latest = max(latest, stamp)
+                if field == "deleted":
+                    self._deleted.setdefault(uid, stamp)
+                elif uid not in self._created:
+                    self._created[uid] = stamp
+                elif stamp != self._created[uid] and stamp > self._changed.get((uid, field), 0):
+                    self._changed[(uid, field)] = stamp
+        return latest
+
+
+    def _history(self, uids):
+        """
+        Returns a dictionary mapping each of the given uids
+        found in the log to the latest stamp and value of each
+        of its fields, the kind of the object first.
+        """
+
+        lines = []
+        if os.path.exists(self._path):
+            with open(self._path, encoding = "utf-8") as file:
+                for line in file:
+                    if not line.endswith("\n"):
+                        break
+                    lines.append(line)
+        history = {}
+        for line in lines + self._lines:
+            entry = _decode(line)
+            if isinstance(entry, dict) or entry[0] not in uids:
+                continue
+            fields = history.setdefault(entry[0], {})
+            for field, (stamp, value) in entry[1].items():
+                if field not in fields or stamp > fields[field][0]:
+                    fields[field] = [stamp, value]
+        return {
+            uid: dict(sorted(fields.items(), key = lambda item: item[0] != "kind"))
+            for uid, fields in history.items()
+        }
+
+
+    def _rejoin(self, task, grp):
+        """
+        Follows a known task that comes back to a group, such
+        as one restored from the archive. The updates merged
+        while it was not shown are applied to it, and a task
+        deleted meanwhile is removed again.
+        """
+
+        uid = task.get_uid()
+        if uid in self._deleted:
+            self._applying = True
+            try:
+                grp.remove_task(task)
+            finally:
+                self._applying = False
+            return
+
+        self._follow_task(task, grp, self._clock.now())
+        fields = self._history({uid}).get(uid, {})
+        self._applying = True
+        try:
+            for field, (_, value) in fields.items():
+                if field in TASK_FIELDS and _value(task, field) != value:
+                    _assign(task, field, value, self._live)
+        finally:
+            self._applying = False
+
+
+    def _follow_group(self, grp, stamp):
+        """
+        Observes a group and its tasks, those not known yet
+        are recorded as created with a given stamp.
+        """
+
+        uid = grp.get_uid()
+        if uid in self._live:
+            return
+        if uid in self._deleted:
+            self._remove_group(grp)
+            return
+
+        self._live[uid] = (grp, None)
+        if uid not in self._created:
+            self._created[uid] = stamp
+            self._log(uid, stamp, _values(grp, None))
+        for task in grp.get_tasks():
+            self._follow_task(task, grp, stamp)
+        grp.add_observer(self._group_changed)
+
+
+    def _unfollow_group(self, grp):
+        """
+        Stops observing a group and its tasks.
+        """
+
+        grp.remove_observer(self._group_changed)
+        for task in grp.get_tasks():
+            self._unfollow_task(task)
+        self._live.pop(grp.get_uid(), None)
+
+
+    def _follow_task(self, task, grp, stamp):
+        """
+        Observes a task of a group, it is recorded as created
+        with a given stamp when it is not known yet.
+        """
+
+        uid = task.get_uid()
+        self._live[uid] = (task, grp)
+        task.add_observer(self._task_changed)
+        if uid not in self._created:
+            self._created[uid] = stamp
+            self._log(uid, stamp, _values(task, grp))
+
+
+    def _unfollow_task(self, task):
+        """
+        Stops observing a task.
+        """
+
+        task.remove_observer(self._task_changed)
+        self._live.pop(task.get_uid(), None)
+
+
+    def _record(self, uid, values):
+        """
+        Stamps local changes to fields of an object and
+        logs them.
+        """
+
+        stamp = self._clock.now()
+        if "deleted" in values:
+            self._deleted[uid] = stamp
+        else:
+            for field in values:
+                self._changed[(uid, field)] = stamp
+        self._log(uid, stamp, values)
+
+
+    def _log(self, uid, stamp, values):
+        """
+        Adds an update with one stamp for every field to
+        the lines to be saved.
+        """
+
+        self._lines.append(json.dumps([uid, {field: [stamp, value] for field, value in values.items()}]))
+
+
+    def _apply(self, uid, fields):
+        """
+        Applies an update from another replica, keeping each
+        field whose stamp is later than the local one. The
+        winning fields are logged as they are, and the number
+        of shown fields whose value changed is returned.
+        """
+
+        if uid in self._deleted:
+            return 0
+
+        if "deleted" in fields:
+            stamp = fields["deleted"][0]
+            self._deleted[uid] = stamp
+            self._waiting.pop(uid, None)
+            self._lines.append(json.dumps([uid, {"deleted": [stamp, True]}]))
+            entry = self._live.get(uid)
+            if entry is not None:
+                source, parent = entry
+                self._applying = True
+                try:
+                    if parent is None:
+                        self._remove_group(source)
+                    else:
+                        self._unfollow_task(source)
+                        parent.remove_task(source)
+                finally:
+                    self._applying = False
+            return 1
+
+        if uid not in self._created:
+            waiting = self._waiting.setdefault(uid, {})
+            for field, (stamp, value) in fields.items():
+                if field not in waiting or stamp > waiting[field][0]:
+                    waiting[field] = [stamp, value]
+            if "kind" not in waiting:
+                return 0
+            fields = self._waiting.pop(uid)
+            created = min(stamp for stamp, _ in fields.values())
+            self._created[uid] = created
+            for field, (stamp, _) in fields.items():
+                if stamp != created:
+                    self._changed[(uid, field)] = stamp
+            self._lines.append(json.dumps([uid, fields]))
+            self._create(uid, {field: value for field, (_, value) in fields.items()})
+            return len(fields)
+
+        winners = {}
+        created = self._created[uid]
+        for field, (stamp, value) in fields.items():
+            if stamp > self._changed.get((uid, field), created):
+                self._changed[(uid, field)] = stamp
+                winners[field] = [stamp, value]
+        if not winners:
+            return 0
+
+        self._lines.append(json.dumps([uid, winners]))
+        entry = self._live.get(uid)
+        if entry is None:
+            return 0
+
+        changes = 0
+        self._applying = True
+        try:
+            for field, (_, value) in winners.items():
+                if field in TASK_FIELDS or field in GROUP_FIELDS:
+                    if _value(entry[0], field) == value:
+                        continue
+                elif field != "group" or entry[1].get_uid() == value:
+                    continue
+                _assign(entry[0], field, value, self._live)
+                changes += 1
+        finally:
+            self._applying = False
+        return changes
+
+
+    def _create(self, uid, values):
+        """
+        Builds a task or group received from another replica
+        and adds it to the application. A task whose group is
+        not shown is only kept in the stamps.
+        """
+
+        self._applying = True
+        try:
+            if values["kind"] == "group":
+                grp = Group(values["name"])
+                grp.set_uid(uid)
+                for field in GROUP_FIELDS:
+                    if field in values:
+                        _assign(grp, field, values[field], self._live)
+                self._groups.append(grp)
+                self._live[uid] = (grp, None)
+                grp.add_observer(self._group_changed)
+                if self._on_group_added is not None:
+                    self._on_group_added(grp)
+                return
+
+            entry = self._live.get(values.get("group"))
+            if entry is None or entry[1] is not None:
+                return
+            task = Task(self._task_ids.next_id())
+            task.set_uid(uid)
+            for field in TASK_FIELDS:
+                if field in values:
+                    _assign(task, field, values[field], self._live)
+            self._live[uid] = (task, entry[0])
+            task.add_observer(self._task_changed)
+            entry[0].add_task(task)
+        finally:
+            self._applying = False
+
+
+    def _remove_group(self, grp):
+        """
+        Removes a deleted group from the application.
+        """
+
+        self._unfollow_group(grp)
+        for index, listed in enumerate(self._groups):
+            if listed is grp:
+                del self._groups[index]
+                if self._on_group_removed is not None:
+                    self._on_group_removed(grp)
+                return
+
+
+    def _task_changed(self, event):
+        """
+        Observer for the followed tasks, logs local changes
+        to their fields.
+        """
+
+        if self._applying or event.field not in TASK_FIELDS:
+            return
+
+        uid = event.source.get_uid()
+        if uid in self._live and uid not in self._deleted:
+            self._record(uid, {event.field: _value(event.source, event.field)})
+
+
+    def _group_changed(self, event):
+        """
+        Observer for the followed groups, logs created and
+        deleted tasks and local changes to group fields.
+        """
+
+        if self._applying:
+            return
+
+        if isinstance(event, TaskAdded):
+            uid = event.task.get_uid()
+            if uid in self._created and uid not in self._live:
+                self._rejoin(event.task, event.group)
+            else:
+                self._follow_task(event.task, event.group, self._clock.now())
+        elif isinstance(event, TaskRemoved):
+            self._unfollow_task(event.task)
+            self._record(event.task.get_uid(), {"deleted": True})
+        elif isinstance(event, TasksReplaced):
+            kept = {id(task) for task in event.new}
+            for task in event.old:
+                if id(task) not in kept:
+                    self._unfollow_task(task)
+                    if not event.archived:
+                        self._record(task.get_uid(), {"deleted": True})
+            stamp = self._clock.now()
+            for task in event.new:
+                uid = task.get_uid()
+                if uid in self._created and uid not in self._live:
+                    self._rejoin(task, event.group)
+                else:
+                    self._follow_task(task, event.group, stamp)
+        elif isinstance(event, FieldChanged) and event.field in GROUP_FIELDS:
+            self._record(event.source.get_uid(), {event.field: _value(event.source, event.field)})
+
+
+def _decode(line):
+    """
+    Returns the JSON value of a log line.
+    """
+
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise ValueError("Corrupt replica log line")
+
+
+def _values(source, parent):
+    """
+    Returns every register value of a task or group, along
+    with its kind and the uid of the group of a task.
+    """
+
+    if parent is None:
+        values = {"kind": "group"}
+        values.update((field, _value(source, field)) for field in GROUP_FIELDS)
+        return values
+
+    values = {"kind": "task", "group": parent.get_uid()}
+    values.update((field, _value(source, field)) for field in TASK_FIELDS)
+    return values
+
+
+def _value(source, field):
+    """
+    Returns the value of a field of a task or group in
+    the form stored in the log.
+    """
+
+    if field == "priority":
+        return source.get_priority().value
+    if field == "recurrence":
+        recurrence = source.get_recurrence()
+        if recurrence is None:
+            return None
+        return [recurrence.get_frequency().value, recurrence.get_interval(), recurrence.get_until()]
+    if field == "occurrences":
+        return sorted(source.get_completed_occurrences())
+    if field == "attachments":
+        return list(source.get_attachments())
+    return getattr(source, f"get_{field}")()
+
+
+def _assign(source, field, value, live):
+    """
+    Sets a field of a task or group to a value from the
+    log through its setters, so every observer of the
+    application sees the change.
+    """
+
+    if field == "priority":
+        source.set_priority(Priority(value))
+    elif field == "recurrence":
+        source.set_recurrence(None if value is None else Recurrence(Frequency(value[0]), value[1], value[2]))
+    elif field == "occurrences":
+        target = set(value)
+        current = set(source.get_completed_occurrences())
+        for ordinal in current - target:
+            source.set_occurrence_completion(ordinal_date(ordinal), False)
+        for ordinal in sorted(target - current):
+            source.set_occurrence_completion(ordinal_date(ordinal), True)
+    elif field == "attachments":
+        for path in source.get_attachments()[:]:
+            if path not in value:
+                source.remove_attachment(path)
+        for path in value:
+            if path not in source.get_attachments():
+                source.add_attachment(path)
+    elif field == "group":
+        entry = live.get(value)
+        current = live.get(source.get_uid())
+        if entry is not None and entry[1] is None and current is not None and current[1] is not entry[0]:
+            current[1].remove_task(source)
+            entry[0].add_task(source)
+            live[source.get_uid()] = (source, entry[0])
+    elif field != "kind":
+        getattr(source, f"set_{field}")(value)
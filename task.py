@@ -1,4 +1,48 @@
+from array import array
+from datetime import date as Date
 from enum import Enum
+import os
+import time
+
+from events import FieldChanged, emit
+
+# Constants for the module
+DATE_FORMAT = "%m-%d-%Y"    # strftime format of Task dates, MM-DD-YYYY
+NO_DATE = "N/A"             # Placeholder for tasks without a date
+UID_BYTES = 16              # Size of the random identifiers shared between machines
+
+
+def date_ordinal(date):
+    """
+    Converts a date string in the format of MM-DD-YYYY
+    into a proleptic Gregorian ordinal, returns None
+    when the task has no valid date.
+    """
+
+    try:
+        month, day, year = date.split("-")
+        return Date(int(year), int(month), int(day)).toordinal()
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def ordinal_date(ordinal):
+    """
+    Converts a proleptic Gregorian ordinal into a date
+    string in the format of MM-DD-YYYY.
+    """
+
+    return Date.fromordinal(ordinal).strftime(DATE_FORMAT)
+
+
+def new_uid():
+    """
+    Returns a random 128-bit identifier that stays the
+    same for a task or group on every machine it is
+    synced to.
+    """
+
+    return int.from_bytes(os.urandom(UID_BYTES), "little")
 
 
 class Priority(Enum):
@@ -12,6 +56,58 @@ class Priority(Enum):
     LATE = 4
 
 
+class IdAllocator:
+    """
+    A class built to hand out task identification numbers.
+
+    Numbers are never handed out twice, not even after the
+    task holding one is deleted or archived, so a number
+    always names at most one task. Every part of the
+    application that creates tasks shares one allocator.
+
+    Attributes:
+    --------------------
+    _next : int
+        The identification number handed out next.
+
+    Methods:
+    --------------------
+    next_id()
+        Returns an unused identification number.
+    reserve()
+        Marks an identification number as used.
+    """
+
+    def __init__(self, used = 0):
+        """
+        A one-argument constructor for the class that
+        accepts the largest identification number already
+        in use.
+        """
+
+        self._next = used + 1
+
+
+    def next_id(self):
+        """
+        Returns an identification number no task has
+        been given yet.
+        """
+
+        id_num = self._next
+        self._next += 1
+        return id_num
+
+
+    def reserve(self, id_num):
+        """
+        Marks every identification number up to a given
+        one as used.
+        """
+
+        self._next = max(self._next, id_num + 1)
+
+
 class Task:
     """
     A class built to keep track of different possible
@@ -30,6 +126,28 @@ class Task:
         using a custom built Enum.
     _description : 
         A description of the task.
+    _recurrence : Recurrence
+        The rule the task repeats by, None when the
+        task does not repeat.
+    _completed_occurrences : set
+        The ordinals of the occurrences of a recurring
+        task that have been completed.
+    _attachments : list
+        The paths of the documents attached to the task.
+    _intervals : array
+        The start and stop timestamps of every tracked
+        interval, flattened into one append-only array
+        of 64-bit integers.
+    _timer_start : int
+        The timestamp the running timer was started at,
+        None when no timer is running.
+    _uid : int
+        The identifier of the task shared between machines,
+        None until it is first asked for.
+    _observers : list
+        A list of callbacks that are called with a
+        FieldChanged event whenever one of the setters
+        changes a field.
 
     Methods:
     --------------------
@@ -65,9 +183,52 @@ class Task:
     set_completion()
         Sets the completion status of the task to the
         value given to the method call.
+    get_recurrence()
+        Returns the rule the task repeats by.
+    set_recurrence()
+        Sets the rule the task repeats by to the value
+        given to the method call.
+    get_occurrences()
+        Returns the occurrences of a recurring task
+        within a window of dates.
+    get_completed_occurrences()
+        Returns the ordinals of the completed occurrences.
+    next_occurrence()
+        Returns the date of the next open occurrence.
+    set_occurrence_completion()
+        Sets the completion status of a single occurrence
+        of a recurring task.
+    get_attachments()
+        Returns the paths of the attached documents.
+    add_attachment()
+        Attaches a document to the task.
+    remove_attachment()
+        Detaches a document from the task.
+    start_timer()
+        Starts tracking time spent on the task.
+    stop_timer()
+        Stops the running timer and records its interval.
+    add_interval()
+        Records an interval of time spent on the task.
+    get_intervals()
+        Returns the tracked intervals.
+    get_interval_count()
+        Returns the number of tracked intervals.
+    get_timer_start()
+        Returns when the running timer was started.
+    get_time_spent()
+        Returns the total number of tracked seconds.
+    get_uid()
+        Returns the identifier shared between machines.
+    set_uid()
+        Sets the identifier shared between machines.
+    add_observer()
+        Registers a callback to be notified of changes.
+    remove_observer()
+        Unregisters a previously registered callback.
     """
 
-    def __init__(self, id_num, name = "Generic Task", date = "N/A", priority = Priority.LOW, complete = False):
+    def __init__(self, id_num, name = "Generic Task", date = NO_DATE, priority = Priority.LOW, complete = False):
         """
         A four-argument constructor for the class that
         requires an identification number to be provided
@@ -82,6 +243,13 @@ class Task:
         self._priority = priority
         self._description = "No known description."
         self._complete = complete
+        self._recurrence = None
+        self._completed_occurrences = set()
+        self._attachments = []
+        self._intervals = array("q")
+        self._timer_start = None
+        self._uid = None
+        self._observers = []
 
 
     def get_id_num(self):
@@ -141,7 +309,10 @@ class Task:
         to the value given at the method call.
         """
         
+        old = self._id_num
         self._id_num = id_num
+        if self._observers and old != id_num:
+            emit(self._observers, FieldChanged(self, "id_num", old, id_num))
 
 
     def set_name(self, name):
@@ -150,7 +321,10 @@ class Task:
         given at the method call.
         """
         
+        old = self._name
         self._name = name
+        if self._observers and old != name:
+            emit(self._observers, FieldChanged(self, "name", old, name))
 
 
     def set_date(self, date):
@@ -160,7 +334,10 @@ class Task:
         requires a format of MM-DD-YYYY.
         """
 
+        old = self._date
         self._date = date
+        if self._observers and old != date:
+            emit(self._observers, FieldChanged(self, "date", old, date))
 
 
     def set_priority(self, priority):
@@ -170,7 +347,10 @@ class Task:
         object representaion.
         """
         
+        old = self._priority
         self._priority = priority
+        if self._observers and old != priority:
+            emit(self._observers, FieldChanged(self, "priority", old, priority))
 
 
     def set_description(self, description):
@@ -179,7 +359,10 @@ class Task:
         given at the method call.
         """
         
+        old = self._description
         self._description = description
+        if self._observers and old != description:
+            emit(self._observers, FieldChanged(self, "description", old, description))
 
 
     def set_completion(self, complete):
@@ -188,7 +371,272 @@ class Task:
         value given at the method call.
         """
 
+        old = self._complete
         self._complete = complete
+        if self._observers and old != complete:
+            emit(self._observers, FieldChanged(self, "completion", old, complete))
+
+
+    def get_recurrence(self):
+        """
+        Returns the rule the task repeats by as a
+        Recurrence object, None when the task does
+        not repeat.
+        """
+
+        return self._recurrence
+
+
+    def set_recurrence(self, recurrence):
+        """
+        Sets the rule the task repeats by to the value given
+        at the method call, the date of the task is used as
+        the first occurrence. Completed occurrences of the
+        previous rule are forgotten.
+        """
+
+        old = self._recurrence
+        self._recurrence = recurrence
+        self._completed_occurrences = set()
+        if self._observers:
+            emit(self._observers, FieldChanged(self, "recurrence", old, recurrence))
+
+
+    def get_occurrences(self, start, end):
+        """
+        Returns a list of pairs of the date and completion
+        status of every occurrence between the start and end
+        dates inclusive, both in the format of MM-DD-YYYY.
+        A task that does not repeat has a single occurrence
+        on its own date.
+        """
+
+        anchor = date_ordinal(self._date)
+        first = date_ordinal(start)
+        last = date_ordinal(end)
+        if anchor is None or first is None or last is None:
+            return []
+
+        if self._recurrence is None:
+            if first <= anchor <= last:
+                return [(self._date, self._complete)]
+            return []
+
+        return [
+            (ordinal_date(ordinal), ordinal in self._completed_occurrences)
+            for ordinal in self._recurrence.occurrences(anchor, first, last)
+        ]
+
+
+    def get_completed_occurrences(self):
+        """
+        Returns a set of the ordinals of the completed
+        occurrences of a recurring task.
+        """
+
+        return set(self._completed_occurrences)
+
+
+    def next_occurrence(self, start):
+        """
+        Returns the date of the first occurrence on or after
+        the start date that has not been completed, in the
+        format of MM-DD-YYYY, or None if there is none.
+        """
+
+        anchor = date_ordinal(self._date)
+        first = date_ordinal(start)
+        if anchor is None or first is None:
+            return None
+
+        if self._recurrence is None:
+            if anchor >= first and not self._complete:
+                return self._date
+            return None
+
+        for ordinal in self._recurrence.occurrences(anchor, first, Date.max.toordinal()):
+            if ordinal not in self._completed_occurrences:
+                return ordinal_date(ordinal)
+        return None
+
+
+    def set_occurrence_completion(self, date, complete):
+        """
+        Sets the completion status of the occurrence of a
+        recurring task on the date given at the method call,
+        only the dates of completed occurrences are stored.
+        """
+
+        ordinal = date_ordinal(date)
+        if ordinal is None:
+            raise ValueError(f"Invalid occurrence date: {date}")
+
+        old = frozenset(self._completed_occurrences) if self._observers else None
+        if complete:
+            self._completed_occurrences.add(ordinal)
+        else:
+            self._completed_occurrences.discard(ordinal)
+        if self._observers and (ordinal in old) != complete:
+            emit(self._observers, FieldChanged(self, "occurrences", old, frozenset(self._completed_occurrences)))
+
+
+    def get_attachments(self):
+        """
+        Returns a list of the paths of the documents
+        attached to the task.
+        """
+
+        return list(self._attachments)
+
+
+    def add_attachment(self, path):
+        """
+        Attaches the document at the path given at the
+        method call to the task.
+        """
+
+        if path not in self._attachments:
+            old = tuple(self._attachments)
+            self._attachments.append(path)
+            if self._observers:
+                emit(self._observers, FieldChanged(self, "attachments", old, tuple(self._attachments)))
+
+
+    def remove_attachment(self, path):
+        """
+        Detaches the document at the path given at the
+        method call from the task.
+        """
+
+        if path in self._attachments:
+            old = tuple(self._attachments)
+            self._attachments.remove(path)
+            if self._observers:
+                emit(self._observers, FieldChanged(self, "attachments", old, tuple(self._attachments)))
+
+
+    def start_timer(self, now = None):
+        """
+        Starts tracking time spent on the task at a given
+        timestamp or now, nothing happens when the timer
+        is already running.
+        """
+
+        if self._timer_start is not None:
+            return
+
+        self._timer_start = int(now if now is not None else time.time())
+        if self._observers:
+            emit(self._observers, FieldChanged(self, "timer", None, self._timer_start))
+
+
+    def stop_timer(self, now = None):
+        """
+        Stops the running timer at a given timestamp or now
+        and records the interval it covered.
+        """
+
+        if self._timer_start is None:
+            return
+
+        start = self._timer_start
+        self._timer_start = None
+        if self._observers:
+            emit(self._observers, FieldChanged(self, "timer", start, None))
+        self.add_interval(start, max(start, int(now if now is not None else time.time())))
+
+
+    def add_interval(self, start, stop):
+        """
+        Appends an interval between two timestamps to the
+        tracked time of the task. Intervals are never changed
+        once recorded.
+        """
+
+        if stop < start:
+            raise ValueError(f"Interval stops before it starts: {start} > {stop}")
+
+        count = len(self._intervals) // 2
+        self._intervals.append(start)
+        self._intervals.append(stop)
+        if self._observers:
+            emit(self._observers, FieldChanged(self, "time", count, count + 1))
+
+
+    def get_intervals(self, first = 0):
+        """
+        Returns a list of (start, stop) timestamp pairs of
+        the tracked intervals, starting at a given index.
+        """
+
+        values = self._intervals[first * 2:]
+        return list(zip(values[0::2], values[1::2]))
+
+
+    def get_interval_count(self):
+        """
+        Returns the number of tracked intervals.
+        """
+
+        return len(self._intervals) // 2
+
+
+    def get_timer_start(self):
+        """
+        Returns the timestamp the running timer was started
+        at, None when no timer is running.
+        """
+
+        return self._timer_start
+
+
+    def get_time_spent(self):
+        """
+        Returns the total number of seconds of every
+        tracked interval, without the running timer.
+        """
+
+        return sum(self._intervals[1::2]) - sum(self._intervals[0::2])
+
+
+    def get_uid(self):
+        """
+        Returns the identifier of the task shared between
+        machines, one is made the first time it is needed.
+        """
+
+        if self._uid is None:
+            self._uid = new_uid()
+        return self._uid
+
+
+    def set_uid(self, uid):
+        """
+        Sets the identifier of the task shared between
+        machines, used when loading and syncing tasks.
+        """
+
+        self._uid = uid
+
+
+    def add_observer(self, callback):
+        """
+        Registers a callback that is called with a
+        FieldChanged event every time one of the setters
+        changes a field of the task.
+        """
+
+        self._observers.append(callback)
+
+
+    def remove_observer(self, callback):
+        """
+        Unregisters a callback that was previously
+        given to add_observer().
+        """
+
+        if callback in self._observers:
+            self._observers.remove(callback)
 
 
     def __eq__(self, other):
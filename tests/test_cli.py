@@ -0,0 +1,16 @@
+import io
+
+import cli
+
+
+def test_batch_keeps_lines_around_a_bad_quote(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "tasks.ktsnap")
+    monkeypatch.setattr("sys.stdin", io.StringIO('add Work good\nadd Work "bad\nadd Work after\n'))
+
+    assert cli.main(["--file", path, "batch"]) == 1
+    assert "line 2: No closing quotation" in capsys.readouterr().err
+
+    assert cli.main(["--file", path, "list"]) == 0
+    listed = capsys.readouterr().out
+    assert "good" in listed
+    assert "after" in listed
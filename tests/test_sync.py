@@ -0,0 +1,225 @@
+import shutil
+
+import pytest
+
+import sync
+from archive import Archive
+from group import Group
+from snapshot import Snapshot, write_snapshot
+from sync import Replica
+from task import Task, Priority
+
+
+class Machine:
+    """
+    One copy of the application, its groups loaded from a
+    save file and its changes logged by its own replica.
+    """
+
+    def __init__(self, folder, name, snapshot_path):
+        save_path = folder / f"{name}.ktsnap"
+        shutil.copy(snapshot_path, save_path)
+        snapshot = Snapshot(str(save_path))
+        self.groups = snapshot.load_groups()
+        for grp in self.groups:
+            grp.get_tasks()
+        snapshot.close()
+        self.log = str(folder / f"{name}.ktlog")
+        self.replica = Replica(self.log, self.groups)
+
+
+    def task(self, name):
+        return next(task for grp in self.groups for task in grp.get_tasks() if task.get_name() == name)
+
+
+    def merge(self, other):
+        other.replica.save()
+        return self.replica.merge(other.log)
+
+
+def state(machine):
+    """
+    Returns every group and task of a machine in an order
+    that does not depend on how they were merged.
+    """
+
+    return sorted(
+        (
+            grp.get_uid(),
+            grp.get_name(),
+            grp.get_color(),
+            sorted(
+                (task.get_uid(), task.get_name(), task.get_date(), task.get_priority().value, task.get_completion())
+                for task in grp.get_tasks()
+            )
+        )
+        for grp in machine.groups
+    )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Replaces the wall clock of the replicas with one the
+    test moves by hand, in milliseconds.
+    """
+
+    now = {"ms": 1000}
+    monkeypatch.setattr(sync.time, "time_ns", lambda: now["ms"] * 1000000)
+    return now
+
+
+@pytest.fixture
+def base(tmp_path):
+    """
+    Writes the save file every machine starts from.
+    """
+
+    grp = Group("Work")
+    grp.set_tasks([Task(1, "Report"), Task(2, "Review"), Task(3, "Email")])
+    path = tmp_path / "base.ktsnap"
+    write_snapshot(str(path), [grp])
+    return path
+
+
+def test_divergent_logs_converge(tmp_path, clock, base):
+    first = Machine(tmp_path, "first", base)
+    second = Machine(tmp_path, "second", base)
+    assert state(first) == state(second)
+
+    first.task("Report").set_name("Quarterly report")
+    first.groups[0].set_color("#ff0000")
+    clock["ms"] += 1
+    second.task("Review").set_priority(Priority.HIGH)
+    second.groups[0].add_task(Task(10, "Call"))
+    extra = Group("Home")
+    extra.add_task(Task(11, "Dishes"))
+    second.groups.append(extra)
+    second.replica.add_group(extra)
+
+    assert first.merge(second) > 0
+    assert second.merge(first) > 0
+    assert state(first) == state(second)
+    assert first.task("Quarterly report").get_uid() == second.task("Quarterly report").get_uid()
+    assert first.task("Review").get_priority() == Priority.HIGH
+    assert [grp.get_name() for grp in first.groups] == ["Work", "Home"]
+    assert first.groups[0].get_color() == "#ff0000"
+
+
+def test_concurrent_edits_keep_the_latest(tmp_path, clock, base):
+    first = Machine(tmp_path, "first", base)
+    second = Machine(tmp_path, "second", base)
+
+    clock["ms"] = 5000
+    second.task("Report").set_name("Written later")
+    clock["ms"] = 2000
+    first.task("Report").set_name("Written earlier")
+
+    first.merge(second)
+    second.merge(first)
+    assert state(first) == state(second)
+    first.task("Written later")
+    second.task("Written later")
+
+
+def test_edit_after_seeing_a_change_wins_over_a_fast_clock(tmp_path, clock, base):
+    first = Machine(tmp_path, "first", base)
+    second = Machine(tmp_path, "second", base)
+
+    clock["ms"] = 9000
+    first.task("Report").set_name("From the fast clock")
+    second.merge(first)
+    clock["ms"] = 1000
+    second.task("From the fast clock").set_name("Made after seeing it")
+
+    first.merge(second)
+    assert state(first) == state(second)
+    first.task("Made after seeing it")
+
+
+def test_delete_wins_over_a_concurrent_edit(tmp_path, clock, base):
+    first = Machine(tmp_path, "first", base)
+    second = Machine(tmp_path, "second", base)
+
+    clock["ms"] = 2000
+    first.groups[0].remove_task(first.task("Email"))
+    clock["ms"] = 3000
+    second.task("Email").set_name("Edited after the delete")
+    second.task("Review").set_completion(True)
+
+    first.merge(second)
+    second.merge(first)
+    assert state(first) == state(second)
+    names = [task.get_name() for task in second.groups[0].get_tasks()]
+    assert names == ["Report", "Review"]
+    assert second.task("Review").get_completion()
+
+
+def test_merge_order_does_not_matter(tmp_path, clock, base):
+    first = Machine(tmp_path, "first", base)
+    second = Machine(tmp_path, "second", base)
+    one_way = Machine(tmp_path, "one_way", base)
+    other_way = Machine(tmp_path, "other_way", base)
+
+    clock["ms"] = 2000
+    first.task("Report").set_name("First name")
+    first.groups[0].remove_task(first.task("Email"))
+    first.groups[0].add_task(Task(20, "From first"))
+    clock["ms"] = 3000
+    second.task("Report").set_name("Second name")
+    second.task("Email").set_priority(Priority.HIGH)
+    second.groups[0].add_task(Task(21, "From second"))
+
+    one_way.merge(first)
+    one_way.merge(second)
+    other_way.merge(second)
+    other_way.merge(first)
+    assert state(one_way) == state(other_way)
+    assert sorted(task.get_name() for task in one_way.groups[0].get_tasks()) == [
+        "From first", "From second", "Review", "Second name"
+    ]
+
+
+def test_merging_again_changes_nothing(tmp_path, clock, base):
+    first = Machine(tmp_path, "first", base)
+    second = Machine(tmp_path, "second", base)
+
+    clock["ms"] = 2000
+    second.task("Report").set_name("Renamed")
+    second.groups[0].remove_task(second.task("Email"))
+    second.groups[0].add_task(Task(30, "Added"))
+
+    assert first.merge(second) > 0
+    merged = state(first)
+    assert first.merge(second) == 0
+    assert state(first) == merged
+
+    # A replica that forgot how far it read gets the same result
+    # from reading the whole log again
+    first.replica._peers.clear()
+    assert first.merge(second) == 0
+    assert state(first) == merged
+    assert len(first.groups[0].get_tasks()) == 3
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_edit_of_an_archived_task_reaches_it_when_restored(tmp_path, clock, base, compact):
+    first = Machine(tmp_path, "first", base)
+    second = Machine(tmp_path, "second", base)
+    archive = Archive(str(tmp_path / "first.ktarc"))
+
+    clock["ms"] = 2000
+    report = first.task("Report")
+    uid = report.get_uid()
+    archive.archive(first.groups[0], [report])
+    clock["ms"] = 3000
+    second.task("Report").set_name("Edited while archived")
+
+    first.merge(second)
+    if compact:
+        first.replica.compact()
+    archive.restore(first.groups, uid, 1)
+    assert first.task("Edited while archived").get_uid() == uid
+
+    second.merge(first)
+    assert state(first) == state(second)
@@ -0,0 +1,206 @@
+# Colors of every theme mapped by the role they play in the GUI
+THEMES = {
+    "Default": {
+        "backdrop": "#000000",      # HEX color black
+        "button": "#2b2b2b",        # HEX color dark gray
+        "button_active": "#5c5c5c", # HEX color gray
+        "button_text": "#FFFFFF",   # HEX color white
+        "panel": "#949494",         # HEX color light gray
+        "panel_text": "#000000",    # HEX color black
+        "row": "#FFFFFF",           # HEX color white
+        "row_text": "#000000",      # HEX color black
+        "border": "#000000",        # HEX color black
+        "accent": "#00f7ff"         # HEX color cyan
+    },
+    "Light": {
+        "backdrop": "#c8c8c8",
+        "button": "#e6e6e6",
+        "button_active": "#b4b4b4",
+        "button_text": "#1e1e1e",
+        "panel": "#f5f5f5",
+        "panel_text": "#1e1e1e",
+        "row": "#FFFFFF",
+        "row_text": "#1e1e1e",
+        "border": "#7a7a7a",
+        "accent": "#4f9dff"
+    },
+    "Midnight": {
+        "backdrop": "#0b0e1a",
+        "button": "#1b2036",
+        "button_active": "#2e3557",
+        "button_text": "#e3e6f5",
+        "panel": "#141829",
+        "panel_text": "#e3e6f5",
+        "row": "#222842",
+        "row_text": "#e3e6f5",
+        "border": "#0b0e1a",
+        "accent": "#b48cff"
+    }
+}
+
+DEFAULT_THEME = "Default"
+
+# Widget options mapped to the role that colors them for every style
+STYLES = {
+    "backdrop": {"bg": "backdrop"},
+    "panel": {"bg": "panel"},
+    "panel_label": {"bg": "panel", "fg": "panel_text"},
+    "panel_button": {
+        "bg": "panel",
+        "fg": "panel_text",
+        "activebackground": "button_active",
+        "activeforeground": "button_text"
+    },
+    "button": {
+        "bg": "button",
+        "fg": "button_text",
+        "activebackground": "button_active",
+        "activeforeground": "button_text"
+    },
+    "button_selected": {
+        "bg": "button_active",
+        "fg": "button_text",
+        "activebackground": "button_active",
+        "activeforeground": "button_text"
+    },
+    "row_label": {"bg": "row", "fg": "row_text"},
+    "row_blocked": {"bg": "panel", "fg": "panel_text"},
+    "row_list": {
+        "bg": "row",
+        "fg": "row_text",
+        "selectbackground": "button_active",
+        "selectforeground": "button_text"
+    },
+    "row_button": {
+        "bg": "row",
+        "fg": "row_text",
+        "activebackground": "button_active",
+        "activeforeground": "button_text"
+    },
+    "tile": {"border_color": "border"}
+}
+
+
+class ThemeRegistry:
+    """
+    A class built to keep track of every themed widget so
+    the colorscheme can be switched in place.
+
+    Widgets are registered with a style that maps their color
+    options to roles. Switching the theme walks the registered
+    widgets once and reconfigures each of them with the colors
+    of the new theme, no page has to be rebuilt.
+
+    Attributes:
+    --------------------
+    _name : str
+        The name of the active theme.
+    _colors : dict
+        The colors of the active theme mapped by role.
+    _widgets : dict
+        Maps the Tk path of each registered widget to the
+        widget and the options to role mapping of its style.
+    _alive : int
+        The number of registered widgets after the last
+        time destroyed widgets were pruned.
+
+    Methods:
+    --------------------
+    get_name()
+        Returns the name of the active theme.
+    color()
+        Returns the color of a role in the active theme.
+    style()
+        Colors a widget with a style and registers it.
+    set_theme()
+        Switches every registered widget to another theme.
+    """
+
+    def __init__(self, name = DEFAULT_THEME):
+        """
+        A one-argument constructor for the class that
+        accepts the name of the theme to start with.
+        """
+
+        if name not in THEMES:
+            raise ValueError(f"Unknown theme: {name}")
+
+        self._name = name
+        self._colors = THEMES[name]
+        self._widgets = {}
+        self._alive = 0
+
+
+    def get_name(self):
+        """
+        Returns the name of the active theme.
+        """
+
+        return self._name
+
+
+    def color(self, role):
+        """
+        Returns the color of a role in the active theme
+        as a HEX representation.
+        """
+
+        return self._colors[role]
+
+
+    def style(self, widget, style):
+        """
+        Colors a widget with the given style and registers
+        it so it follows later theme switches, returns the
+        widget.
+        """
+
+        options = STYLES[style]
+        widget.configure(**{option: self._colors[role] for option, role in options.items()})
+        self._widgets[str(widget)] = (widget, options)
+        if len(self._widgets) > 2 * self._alive + 256:
+            self._prune()
+        return widget
+
+
+    def set_theme(self, name):
+        """
+        Switches to the theme with the given name and
+        recolors every registered widget in a single pass.
+        """
+
+        if name not in THEMES:
+            raise ValueError(f"Unknown theme: {name}")
+
+        self._name = name
+        self._colors = THEMES[name]
+        colors = self._colors
+        for path, (widget, options) in list(self._widgets.items()):
+            if not widget.winfo_exists():
+                del self._widgets[path]
+                continue
+            widget.configure(**{option: colors[role] for option, role in options.items()})
+        self._alive = len(self._widgets)
+
+
+    def _prune(self):
+        """
+        Forgets the registered widgets that have been
+        destroyed along with their pages.
+        """
+
+        for path, (widget, options) in list(self._widgets.items()):
+            if not widget.winfo_exists():
+                del self._widgets[path]
+        self._alive = len(self._widgets)
+
+
+def contrast_color(color):
+    """
+    Returns black or white, whichever is easier to read
+    on top of the given HEX color.
+    """
+
+    red, green, blue = (int(color[index:index + 2], 16) for index in (1, 3, 5))
+    luminance = 0.299 * red + 0.587 * green + 0.114 * blue
+    return "#000000" if luminance > 150 else "#FFFFFF"
@@ -0,0 +1,420 @@
+from array import array
+from datetime import date, datetime, time as Time, timedelta
+from functools import lru_cache, partial
+
+from events import TaskAdded, TaskRemoved, TasksReplaced
+
+# Constants for the module
+DAYS_PER_WEEK = 7
+SECONDS_PER_HOUR = 3600
+
+
+def week_of(ordinal):
+    """
+    Returns the number of the Monday based week a
+    proleptic Gregorian ordinal falls in.
+    """
+
+    return (ordinal - 1) // DAYS_PER_WEEK
+
+
+def week_range(day):
+    """
+    Returns the ordinals of the first and last day of
+    the week a date falls in.
+    """
+
+    first = day.toordinal() - day.weekday()
+    return (first, first + DAYS_PER_WEEK - 1)
+
+
+def month_range(day):
+    """
+    Returns the ordinals of the first and last day of
+    the month a date falls in.
+    """
+
+    first = day.replace(day = 1)
+    following = (first + timedelta(days = 32)).replace(day = 1)
+    return (first.toordinal(), following.toordinal() - 1)
+
+
+def split_days(start, stop):
+    """
+    Yields (ordinal, seconds) pairs for the local days an
+    interval between two timestamps covers.
+    """
+
+    while start < stop:
+        ordinal = date.fromtimestamp(start).toordinal()
+        end = min(stop, _midnight(ordinal))
+        yield (ordinal, end - start)
+        start = end
+
+
+@lru_cache(maxsize = 4096)
+def _midnight(ordinal):
+    """
+    Returns the timestamp of the local midnight that ends
+    a day, cached since intervals cluster on few days.
+    """
+
+    following = date.fromordinal(ordinal + 1)
+    return int(datetime.combine(following, Time()).timestamp())
+
+
+class Rollup:
+    """
+    A class built to hold the seconds tracked per day and
+    per week, so totals over a range of dates read a few
+    buckets instead of every interval.
+
+    Buckets are stored densely in arrays of 64-bit integers
+    starting at the Monday of the first tracked week, which
+    costs 8 bytes per day and 8 bytes per week of history.
+
+    Attributes:
+    --------------------
+    _first : int
+        The ordinal of the day held by the first daily
+        bucket, always a Monday, None while empty.
+    _days : array
+        The seconds of each day starting at _first.
+    _weeks : array
+        The seconds of each week starting at _first.
+
+    Methods:
+    --------------------
+    add()
+        Adds the seconds of an interval.
+    add_day()
+        Adds seconds to a single day.
+    total()
+        Returns the seconds tracked within a range of days.
+    get_days()
+        Returns the seconds of every day.
+    """
+
+    def __init__(self):
+        """
+        A constructor for the class that creates an
+        empty rollup.
+        """
+
+        self._first = None
+        self._days = array("q")
+        self._weeks = array("q")
+
+
+    def add(self, start, stop):
+        """
+        Adds the seconds of an interval between two
+        timestamps to the days and weeks it covers.
+        """
+
+        for ordinal, seconds in split_days(start, stop):
+            self.add_day(ordinal, seconds)
+
+
+    def add_day(self, ordinal, seconds):
+        """
+        Adds seconds to a day and its week, growing the
+        arrays to cover the day when needed.
+        """
+
+        monday = ordinal - (ordinal - 1) % DAYS_PER_WEEK
+        if self._first is None:
+            self._first = monday
+        elif monday < self._first:
+            weeks = (self._first - monday) // DAYS_PER_WEEK
+            self._days[0:0] = array("q", bytes(8 * weeks * DAYS_PER_WEEK))
+            self._weeks[0:0] = array("q", bytes(8 * weeks))
+            self._first = monday
+
+        index = ordinal - self._first
+        if index >= len(self._days):
+            weeks = index // DAYS_PER_WEEK + 1 - len(self._weeks)
+            self._days.extend(array("q", bytes(8 * weeks * DAYS_PER_WEEK)))
+            self._weeks.extend(array("q", bytes(8 * weeks)))
+        self._days[index] += seconds
+        self._weeks[index // DAYS_PER_WEEK] += seconds
+
+
+    def total(self, first, last):
+        """
+        Returns the seconds tracked between two day ordinals,
+        inclusive. Whole weeks are read from the weekly
+        buckets and only the days at the edges from the
+        daily buckets.
+        """
+
+        if self._first is None:
+            return 0
+
+        start = max(first - self._first, 0)
+        stop = min(last - self._first + 1, len(self._days))
+        if start >= stop:
+            return 0
+
+        week_start = -(-start // DAYS_PER_WEEK)
+        week_stop = stop // DAYS_PER_WEEK
+        if week_start >= week_stop:
+            return sum(self._days[start:stop])
+        return (
+            sum(self._days[start:week_start * DAYS_PER_WEEK])
+            + sum(self._weeks[week_start:week_stop])
+            + sum(self._days[week_stop * DAYS_PER_WEEK:stop])
+        )
+
+
+    def get_days(self):
+        """
+        Returns a list of (ordinal, seconds) pairs for
+        every day with tracked time.
+        """
+
+        return [
+            (self._first + index, seconds)
+            for index, seconds in enumerate(self._days)
+            if seconds
+        ]
+
+
+class TimeStats:
+    """
+    A class built to keep the rollups of the time tracked
+    on every task and group up to date.
+
+    Group rollups are built once when a group is added and
+    then only receive the intervals recorded afterwards, which
+    arrive through the change events of the tasks. The rollup
+    of a task is only built the first time it is asked for,
+    so memory grows with the number of groups rather than
+    the number of tasks.
+
+    Attributes:
+    --------------------
+    _tasks : dict
+        Maps the id of each task whose rollup has been
+        asked for to its rollup.
+    _seen : dict
+        Maps the id of each observed task to the number of
+        its intervals already in the rollups.
+    _groups : dict
+        Maps the id of each watched group to a pair of the
+        group and its rollup.
+    _callbacks : dict
+        Maps the id of each watched group to the callback
+        its tasks are observed with.
+
+    Methods:
+    --------------------
+    add_group()
+        Starts keeping the rollups of a group.
+    remove_group()
+        Drops the rollups of a group.
+    add_archived()
+        Adds the time of archived tasks to a group.
+    remove_archived()
+        Takes the time of a restored task out of a group.
+    task_seconds()
+        Returns the seconds tracked on a task in a range.
+    group_seconds()
+        Returns the seconds tracked on a group in a range.
+    group_hours()
+        Returns the hours of every group in a range.
+    """
+
+    def __init__(self):
+        """
+        A constructor for the class that creates empty
+        statistics.
+        """
+
+        self._tasks = {}
+        self._seen = {}
+        self._groups = {}
+        self._callbacks = {}
+
+
+    def add_group(self, grp):
+        """
+        Builds the rollups of a group and its tasks and
+        starts following their changes.
+        """
+
+        if id(grp) in self._groups:
+            return
+
+        self._groups[id(grp)] = (grp, Rollup())
+        self._callbacks[id(grp)] = partial(self._task_changed, grp)
+        for task in grp.get_tasks():
+            self._track(task, grp)
+        grp.add_observer(self._group_changed)
+
+
+    def remove_group(self, grp):
+        """
+        Stops following a group and drops the rollups
+        of the group and its tasks.
+        """
+
+        if id(grp) not in self._groups:
+            return
+
+        grp.remove_observer(self._group_changed)
+        for task in grp.get_tasks():
+            self._untrack(task, grp)
+        del self._groups[id(grp)]
+        del self._callbacks[id(grp)]
+
+
+    def add_archived(self, grp, days):
+        """
+        Adds (ordinal, seconds) pairs of the time tracked on
+        archived tasks to the rollup of a watched group.
+        """
+
+        entry = self._groups.get(id(grp))
+        if entry is None:
+            return
+        for ordinal, seconds in days:
+            entry[1].add_day(ordinal, seconds)
+
+
+    def remove_archived(self, grp, task):
+        """
+        Takes the time of a task that was restored from the
+        archive out of the rollup of a watched group, since
+        the task brings the same time back with it.
+        """
+
+        entry = self._groups.get(id(grp))
+        if entry is None:
+            return
+        for start, stop in task.get_intervals():
+            for ordinal, seconds in split_days(start, stop):
+                entry[1].add_day(ordinal, -seconds)
+
+
+    def task_seconds(self, task, first, last):
+        """
+        Returns the seconds tracked on a task between two
+        day ordinals, inclusive.
+        """
+
+        rollup = self._tasks.get(id(task))
+        if rollup is None:
+            rollup = Rollup()
+            for start, stop in task.get_intervals():
+                rollup.add(start, stop)
+            if id(task) in self._seen:
+                self._tasks[id(task)] = rollup
+        return rollup.total(first, last)
+
+
+    def group_seconds(self, grp, first, last):
+        """
+        Returns the seconds tracked on the tasks of a group
+        between two day ordinals, inclusive.
+        """
+
+        entry = self._groups.get(id(grp))
+        return entry[1].total(first, last) if entry is not None else 0
+
+
+    def group_hours(self, first, last):
+        """
+        Returns a list of (group, hours) pairs for every
+        watched group between two day ordinals, inclusive.
+        """
+
+        return [
+            (grp, rollup.total(first, last) / SECONDS_PER_HOUR)
+            for grp, rollup in self._groups.values()
+        ]
+
+
+    def _track(self, task, grp):
+        """
+        Adds the intervals of a task to the rollups and
+        starts observing the task.
+        """
+
+        self._seen[id(task)] = 0
+        task.add_observer(self._callbacks[id(grp)])
+        self._collect(task, grp)
+
+
+    def _untrack(self, task, grp, keep_time = False):
+        """
+        Removes the time of a task from its group unless told
+        to keep it and stops observing the task.
+        """
+
+        seen = self._seen.pop(id(task), None)
+        if seen is None:
+            return
+
+        task.remove_observer(self._callbacks[id(grp)])
+        self._tasks.pop(id(task), None)
+        if keep_time:
+            return
+        group_rollup = self._groups[id(grp)][1]
+        for start, stop in task.get_intervals()[:seen]:
+            for ordinal, seconds in split_days(start, stop):
+                group_rollup.add_day(ordinal, -seconds)
+
+
+    def _collect(self, task, grp):
+        """
+        Adds the intervals a task recorded since it was
+        last collected to its rollup and its group.
+        """
+
+        seen = self._seen[id(task)]
+        if task.get_interval_count() == seen:
+            return
+
+        rollup = self._tasks.get(id(task))
+        group_rollup = self._groups[id(grp)][1]
+        for start, stop in task.get_intervals(seen):
+            for ordinal, seconds in split_days(start, stop):
+                group_rollup.add_day(ordinal, seconds)
+                if rollup is not None:
+                    rollup.add_day(ordinal, seconds)
+        self._seen[id(task)] = task.get_interval_count()
+
+
+    def _task_changed(self, grp, event):
+        """
+        Observer for the tasks of the watched groups, adds
+        newly recorded intervals to the rollups.
+        """
+
+        if event.field == "time" and id(event.source) in self._seen:
+            self._collect(event.source, grp)
+
+
+    def _group_changed(self, event):
+        """
+        Observer for the watched groups, keeps the rollups
+        in step with tasks being added and removed.
+        """
+
+        if isinstance(event, TaskAdded):
+            self._track(event.task, event.group)
+        elif isinstance(event, TaskRemoved):
+            self._untrack(event.task, event.group)
+        elif isinstance(event, TasksReplaced) and event.archived:
+            # Archived tasks keep their time in the group, only
+            # the tasks that left are no longer observed
+            kept = {id(task) for task in event.new}
+            for task in event.old:
+                if id(task) not in kept:
+                    self._untrack(task, event.group, keep_time = True)
+        elif isinstance(event, TasksReplaced):
+            for task in event.old:
+                self._untrack(task, event.group)
+            for task in event.new:
+                self._track(task, event.group)
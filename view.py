@@ -0,0 +1,405 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+from heapq import merge
+from itertools import count
+
+from events import TaskAdded, TaskRemoved, TasksReplaced
+from task import date_ordinal
+
+# Constants for the module
+UNDATED = date.max.toordinal() + 1  # Sort key used for tasks without a date
+
+# Sortable columns mapped to the Task fields they depend on and
+# the function used to build the primary sort key of a task
+SORT_KEYS = {
+    "added": ((), lambda task: 0),
+    "name": (("name",), lambda task: task.get_name().lower()),
+    "date": (("date",), lambda task: date_ordinal(task.get_date()) or UNDATED),
+    "priority": (("priority",), lambda task: -task.get_priority().value),
+    "completion": (("completion",), lambda task: task.get_completion())
+}
+
+# Task fields that can change whether a task passes the filter
+FILTER_FIELDS = ("name", "priority", "completion")
+
+
+class GroupView:
+    """
+    A class built to provide sorted and filtered views
+    of the tasks within a group.
+
+    Sort keys are computed once per task and column and the
+    ordered sequence of every column that has been requested
+    is cached. Changes made through the Task setters only move
+    the changed task within the cached orders of the affected
+    columns, so switching back and forth between columns never
+    sorts the whole group again.
+
+    Attributes:
+    --------------------
+    _group : Group
+        The group that is being viewed.
+    _column : str
+        The name of the column the view is sorted by,
+        one of the keys of SORT_KEYS.
+    _reverse : bool
+        Whether the sort order is reversed.
+    _completion : bool
+        Only tasks with this completion status are shown,
+        None shows every task.
+    _priority : Priority
+        Only tasks with this priority are shown, None
+        shows every task.
+    _text : str
+        Only tasks whose name contains this text are
+        shown, case insensitive.
+    _seq : dict
+        Maps the id of each task to its insertion number,
+        used as a tie breaker so every sort key is unique.
+    _tracked : dict
+        Maps the id of each observed task to the task.
+    _keys : dict
+        Maps each built column to a dictionary of task ids
+        and their current sort keys.
+    _orders : dict
+        Maps each built column to a pair of parallel lists
+        holding the sorted keys and tasks.
+    _visible : list
+        The cached list of tasks for the current sort and
+        filter, None when it needs to be rebuilt.
+
+    Methods:
+    --------------------
+    get_group()
+        Returns the group being viewed.
+    get_sort()
+        Returns the current sort column and direction.
+    set_sort()
+        Sets the column and direction the view is sorted by.
+    get_filter()
+        Returns the current filter settings.
+    set_filter()
+        Sets the completion, priority and text filters.
+    get_tasks()
+        Returns the sorted and filtered list of tasks.
+    iter_order()
+        Lazily yields the sort keys and tasks of a column.
+    depends_on()
+        Returns whether a task field affects the visible tasks.
+    detach()
+        Stops the view from observing the group and its tasks.
+    """
+
+    def __init__(self, grp, column = "added", reverse = False):
+        """
+        A three-argument constructor for the class that
+        requires a group and accepts an optional column
+        and direction to sort by.
+        """
+
+        if column not in SORT_KEYS:
+            raise ValueError(f"Unknown sort column: {column}")
+
+        self._group = grp
+        self._column = column
+        self._reverse = reverse
+        self._completion = None
+        self._priority = None
+        self._text = ""
+        self._counter = count()
+        self._seq = {}
+        self._tracked = {}
+        self._keys = {}
+        self._orders = {}
+        self._visible = None
+
+        for task in grp.get_tasks():
+            self._track(task)
+        grp.add_observer(self._group_changed)
+
+
+    def get_group(self):
+        """
+        Returns the group being viewed.
+        """
+
+        return self._group
+
+
+    def get_sort(self):
+        """
+        Returns a tuple of the column the view is sorted
+        by and whether the order is reversed.
+        """
+
+        return (self._column, self._reverse)
+
+
+    def set_sort(self, column, reverse = False):
+        """
+        Sets the column and direction the view is sorted by,
+        the order of a column is only built the first time
+        it is requested.
+        """
+
+        if column not in SORT_KEYS:
+            raise ValueError(f"Unknown sort column: {column}")
+
+        if (column, reverse) != (self._column, self._reverse):
+            self._column = column
+            self._reverse = reverse
+            self._visible = None
+
+
+    def get_filter(self):
+        """
+        Returns a tuple of the completion, priority and
+        text filters of the view.
+        """
+
+        return (self._completion, self._priority, self._text)
+
+
+    def set_filter(self, completion = None, priority = None, text = ""):
+        """
+        Sets the filters of the view, a value of None
+        or an empty string disables that filter.
+        """
+
+        self._completion = completion
+        self._priority = priority
+        self._text = text.lower()
+        self._visible = None
+
+
+    def get_tasks(self):
+        """
+        Returns the list of tasks in the current sort order
+        that pass the current filters.
+        """
+
+        if self._visible is None:
+            tasks = self._order(self._column)[1]
+            if self._reverse:
+                tasks = tasks[::-1]
+            if self._completion is None and self._priority is None and not self._text:
+                self._visible = list(tasks)
+            else:
+                self._visible = [task for task in tasks if self._matches(task)]
+        return self._visible
+
+
+    def iter_order(self, column, reverse = False):
+        """
+        Lazily yields pairs of the primary sort key and task
+        for every task of the group in the order of a given
+        column, ignoring the filters of the view. The place
+        in the order is kept as the full key of the last task
+        yielded rather than an index, so tasks added, removed
+        or moved between two steps never make the others be
+        skipped or yielded twice.
+        """
+
+        last = None
+        while True:
+            order_keys, order_tasks = self._order(column)
+            if last is None:
+                index = len(order_keys) - 1 if reverse else 0
+            elif reverse:
+                index = bisect_left(order_keys, last) - 1
+            else:
+                index = bisect_right(order_keys, last)
+            if not 0 <= index < len(order_keys):
+                return
+            last = order_keys[index]
+            yield (last[0], order_tasks[index])
+
+
+    def depends_on(self, field):
+        """
+        Returns whether a change to a task field can move
+        the task or change whether it is shown under the
+        current sort and filters.
+        """
+
+        if field in SORT_KEYS[self._column][0]:
+            return True
+        if field == "name":
+            return bool(self._text)
+        if field == "priority":
+            return self._priority is not None
+        if field == "completion":
+            return self._completion is not None
+        return False
+
+
+    def detach(self):
+        """
+        Removes every observer registered by the view,
+        the view should not be used afterwards.
+        """
+
+        self._group.remove_observer(self._group_changed)
+        for task in self._tracked.values():
+            task.remove_observer(self._task_changed)
+        self._seq.clear()
+        self._tracked.clear()
+        self._keys.clear()
+        self._orders.clear()
+        self._visible = None
+
+
+    def _matches(self, task):
+        """
+        Returns whether a task passes the current filters.
+        """
+
+        if self._completion is not None and task.get_completion() != self._completion:
+            return False
+        if self._priority is not None and task.get_priority() != self._priority:
+            return False
+        return self._text in task.get_name().lower()
+
+
+    def _order(self, column):
+        """
+        Returns the sorted keys and tasks of a column,
+        building and caching them on the first request.
+        """
+
+        if column not in self._orders:
+            func = SORT_KEYS[column][1]
+            keys = {}
+            pairs = []
+            for task in self._group.get_tasks():
+                # Tasks added inside a batch are seen before
+                # their TaskAdded event is delivered
+                if id(task) not in self._seq:
+                    self._track(task)
+                key = (func(task), self._seq[id(task)])
+                keys[id(task)] = key
+                pairs.append((key, task))
+            pairs.sort(key = lambda pair: pair[0])
+            self._keys[column] = keys
+            self._orders[column] = (
+                [pair[0] for pair in pairs],
+                [pair[1] for pair in pairs]
+            )
+        return self._orders[column]
+
+
+    def _track(self, task):
+        """
+        Starts observing a task and gives it the next
+        insertion number.
+        """
+
+        self._seq[id(task)] = next(self._counter)
+        self._tracked[id(task)] = task
+        task.add_observer(self._task_changed)
+
+
+    def _insert(self, column, task):
+        """
+        Inserts a task into the cached order of a column.
+        """
+
+        key = (SORT_KEYS[column][1](task), self._seq[id(task)])
+        self._keys[column][id(task)] = key
+        order_keys, order_tasks = self._orders[column]
+        index = bisect_left(order_keys, key)
+        order_keys.insert(index, key)
+        order_tasks.insert(index, task)
+
+
+    def _discard(self, column, task):
+        """
+        Removes a task from the cached order of a column,
+        if the order holds it.
+        """
+
+        key = self._keys[column].pop(id(task), None)
+        if key is None:
+            return
+        order_keys, order_tasks = self._orders[column]
+        index = bisect_left(order_keys, key)
+        del order_keys[index]
+        del order_tasks[index]
+
+
+    def _task_changed(self, event):
+        """
+        Observer for the tasks of the group, moves the
+        changed task within the cached orders of the
+        columns that depend on the changed field.
+        """
+
+        task, field = event.source, event.field
+        for column, (fields, func) in SORT_KEYS.items():
+            if field in fields and column in self._orders:
+                if (func(task), self._seq[id(task)]) != self._keys[column][id(task)]:
+                    self._discard(column, task)
+                    self._insert(column, task)
+                    if column == self._column:
+                        self._visible = None
+        if field in FILTER_FIELDS and self.depends_on(field):
+            self._visible = None
+
+
+    def _group_changed(self, event):
+        """
+        Observer for the group, keeps the cached orders in
+        step with tasks being added and removed.
+        """
+
+        if isinstance(event, TaskAdded):
+            task = event.task
+            if id(task) not in self._tracked:
+                self._track(task)
+            for column in self._orders:
+                if id(task) not in self._keys[column]:
+                    self._insert(column, task)
+        elif isinstance(event, TaskRemoved):
+            task = event.task
+            task.remove_observer(self._task_changed)
+            for column in self._orders:
+                self._discard(column, task)
+            self._seq.pop(id(task), None)
+            self._tracked.pop(id(task), None)
+        elif isinstance(event, TasksReplaced):
+            for tracked in self._tracked.values():
+                tracked.remove_observer(self._task_changed)
+            self._seq.clear()
+            self._tracked.clear()
+            self._keys.clear()
+            self._orders.clear()
+            for tracked in event.new:
+                self._track(tracked)
+        else:
+            return
+        self._visible = None
+
+
+
+def merge_views(views, column, reverse = False):
+    """
+    Lazily yields pairs of group and task for the tasks of
+    every given view in the order of a column. The cached
+    order of each view is merged with a k-way merge, so the
+    first rows are available without sorting every task.
+    """
+
+    streams = [_tag_order(view, column, reverse) for view in views]
+    for key, grp, task in merge(*streams, key = lambda item: item[0], reverse = reverse):
+        yield (grp, task)
+
+
+def _tag_order(view, column, reverse):
+    """
+    Lazily yields the sort key, group and task for every
+    task of a view in the order of a given column.
+    """
+
+    grp = view.get_group()
+    for key, task in view.iter_order(column, reverse):
+        yield (key, grp, task)
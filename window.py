@@ -1,19 +1,66 @@
+from datetime import date
 from functools import partial
+import os
+from pathlib import Path
 import tkinter as tk
+from tkinter import filedialog
+import webbrowser
 import customtkinter as ctk
 
-from task import Task, Priority
+from task import Task, IdAllocator, Priority, date_ordinal, ordinal_date
+from archive import Archive, archive_path
+from dependency import DependencyGraph
+from events import FieldChanged
 from group import Group
+from maintenance import Maintenance
+from palette import PaletteIndex, ACTION, GROUP
+from recent import MetadataCache, RecentFiles, describe
+from recurrence import Recurrence, Frequency
+from reminder import ReminderScheduler
+from rpc import TaskApi, RpcServer
+from snapshot import Snapshot, SAVE_PATH, write_snapshot
+from sync import Replica, replica_path
+from theme import ThemeRegistry, THEMES, contrast_color
+from timelog import TimeStats, SECONDS_PER_HOUR, month_range, week_range
+from view import GroupView, SORT_KEYS, merge_views
 
 # Constants for the class
 APPLICATION_TITLE = "KittyTask"
-
-BLACK = "#000000"       # HEX color black
-DARK_GRAY = "#2b2b2b"   # HEX color dark gray
-GRAY = "#5c5c5c"        # HEX color gray
-LIGHT_GRAY = "#949494"  # HEX color light gray
-WHITE = "#FFFFFF"       # HEX color white
-CYAN = "#00f7ff"        # HEX color cyan
+RECENT_PATH = os.path.join(os.path.expanduser("~"), ".kittytask", "recent.json")
+
+# Sort buttons shown on the group page mapped to view columns
+SORT_BUTTONS = (
+    ("Added", "added"),
+    ("Name", "name"),
+    ("Date", "date"),
+    ("Priority", "priority"),
+    ("Done", "completion")
+)
+
+# Sort buttons shown on the all tasks page mapped to view columns
+MERGE_BUTTONS = (
+    ("Date", "date"),
+    ("Priority", "priority")
+)
+
+# Recurrence rules cycled through by the repeat button of a task
+REPEAT_CYCLE = (None, Frequency.DAILY, Frequency.WEEKLY, Frequency.MONTHLY)
+
+OCCURRENCE_WINDOW = 14      # Days of occurrences shown for recurring tasks
+ALL_TASKS_PAGE_SIZE = 50    # Rows pulled from the merge per scroll step
+REMINDER_ROWS = 10          # Most task names listed in a reminder popup
+OVERVIEW_ROWS = 20          # Most groups listed in the home page overview
+RECENT_ROWS = 8             # Most documents listed in the recent files panel
+PALETTE_ROWS = 12           # Most matches listed in the command palette
+MAINTENANCE_POLL = 100      # Milliseconds between checks for a finished verification
+WATCH_DELAY = 1             # Milliseconds between groups watched after startup
+
+# Filter buttons shown on the group page mapped to completion states
+FILTER_BUTTONS = (
+    ("All", None),
+    ("Open", False),
+    ("Completed", True)
+)
 
 
 class Window:
@@ -34,6 +81,79 @@ class Window:
     active_frames : dict
         a dictionary that keeps track of the active
         main frame.
+    groups : list
+        a list of the groups created in the application.
+    group_views : dict
+        a dictionary that maps the id of each opened group
+        to the GroupView used to sort and filter its tasks.
+    all_tasks_column : str
+        the column the all tasks page is merged by.
+    all_tasks_stream : generator
+        the lazy merge of every group that feeds the rows
+        of the all tasks page.
+    all_tasks_loading : bool
+        whether rows were pulled for the all tasks page that
+        have not been rendered yet.
+    reminders : ReminderScheduler
+        the scheduler that shows reminders for due tasks.
+    dependencies : DependencyGraph
+        the tasks that block other tasks across every group.
+    time_stats : TimeStats
+        the rollups of the time tracked on every group.
+    palette : PaletteIndex
+        the index of actions, groups and tasks searched by
+        the command palette.
+    palette_popup : tkinter.Toplevel
+        the open command palette, None when it is closed.
+    replica : Replica
+        the log of changes merged with other machines, None
+        until the loaded groups are watched.
+    unwatched_groups : list
+        the loaded groups whose reminders, time stats,
+        palette entries and replica are not built yet.
+    archive : Archive
+        the compressed cold storage of old completed tasks.
+    maintenance : Maintenance
+        the worker processes that verify the save file.
+    stats_labels : dict
+        a dictionary that maps the id of each group listed
+        on the home page to its label, along with the key
+        "total" for the label of every group together.
+    theme : ThemeRegistry
+        the registry that colors every widget and recolors
+        them when the colorscheme changes.
+    recent : RecentFiles
+        the background scanner and cache of the documents
+        attached to tasks.
+    recent_labels : dict
+        a dictionary that maps the path of each document
+        shown in the recent files panel to its label.
+    rpc_server : RpcServer
+        the local automation server, None unless started.
+    current_group : Group
+        the group shown by the group page.
+    page_observers : list
+        pairs of the tasks and groups observed by the rows of
+        the displayed page and their callbacks.
+    page_stale : bool
+        whether a change was seen that the displayed page
+        cannot show by updating its rows in place.
+    task_rows : dict
+        a dictionary that maps the id of each task shown on
+        the group page to the cells of its row.
+    save_path : str
+        the path of the save file the groups are loaded
+        from and saved to.
+    snapshot : Snapshot
+        the memory mapped save file the groups were loaded
+        from, None when there was nothing to load.
+    task_ids : IdAllocator
+        hands out the identification numbers of new tasks,
+        shared with the automation server and the replica.
+    save_enabled : bool
+        whether the groups are written to the save file on
+        closing, False when the save file could not be read
+        so it is never written over.
 
     Methods:
     --------------------
@@ -41,6 +161,10 @@ class Window:
         loops through the possible active main frames in
         the actove_frames dictionary and sets all keys to
         False in order to "clear" each frame.
+    observe()
+        registers a callback of the displayed page.
+    release_page()
+        unregisters every callback of the displayed page.
     create_menu_bar()
         initializes the top widget bar for the GUI application.
     create_home_page()
@@ -58,33 +182,172 @@ class Window:
         the GUI application.
     switch_to_group()
         switches the main body from to the internal group display.
+    get_group_view()
+        returns the sorted and filtered view of a group.
+    sort_group()
+        changes the column the group page is sorted by.
+    filter_group()
+        changes the completion filter of the group page.
+    load_occurrence()
+        creates a row for one occurrence of a recurring task.
+    toggle_task()
+        completes or reopens a task.
+    toggle_timer()
+        starts or stops tracking time spent on a task.
+    timer_title()
+        returns the text of the timer cell of a task row.
+    task_title()
+        returns the text of the name cell of a task row.
+    update_task_row()
+        updates the cells of a task row after a change.
+    blocked_changed()
+        updates the row of a task that became blocked or
+        unblocked.
+    group_page_changed()
+        marks the group page stale when its task list changes.
+    attach_document()
+        attaches a document chosen by the user to a task.
+    update_recent()
+        fills in a recent files panel entry after its scan.
+    open_document()
+        opens a document from the recent files panel.
+    cycle_recurrence()
+        switches a task to the next recurrence rule.
+    toggle_occurrence()
+        completes or reopens one occurrence of a recurring task.
+    create_all_tasks_page()
+        initializes the page listing the tasks of every group.
+    switch_to_all_tasks()
+        switches the main body frame to the all tasks display.
+    sort_all_tasks()
+        changes the column the all tasks page is merged by.
+    render_all_tasks()
+        fits the scroll region of the all tasks page to its rows.
+    load_more_tasks()
+        pulls the next rows of the all tasks page from the merge.
+    show_reminders()
+        shows a popup listing the tasks that just became due.
     create_settings_page()
         initializes the settings page frame for the GUI application.
+    switch_theme()
+        recolors the GUI application with another colorscheme.
     switch_to_settings()
         switches the main body frame to the settings page display.
+    load_snapshot()
+        opens the save file and lazily loads its groups.
+    watch_groups()
+        starts watching the loaded groups one at a time.
+    watch_next_group()
+        archives old completed tasks, then schedules the
+        reminders and builds the time stats, palette index
+        and replica of the next loaded group.
+    watch_group()
+        starts the reminders, dependencies, time stats,
+        palette index and replica of a new group.
+    open_palette()
+        shows the command palette.
+    search_palette()
+        lists the matches of the text typed in the palette.
+    move_palette()
+        moves the selection of the palette.
+    pick_palette()
+        runs the selected match of the palette.
+    group_action()
+        runs a palette action on the current group.
+    sync_replica()
+        merges the changes of another machine.
+    open_archive()
+        shows the popup that searches archived tasks.
+    search_archive()
+        lists the archived tasks matching a text.
+    restore_archived()
+        moves the selected archived task back to its group.
+    verify_snapshot()
+        checks the save file in worker processes.
+    check_verification()
+        shows the result of a finished verification.
+    show_message()
+        shows a popup with a line of text.
+    save_snapshot()
+        writes every group to the save file.
+    update_stats()
+        fills in the time stats of the home page.
+    forget_group()
+        drops the reminders, dependencies, time stats, palette
+        entries and view kept for a removed group and records
+        its deletion in the replica.
+    start_rpc()
+        starts the local automation server.
+    refresh_page()
+        rebuilds the displayed page after outside changes
+        it could not show in place.
+    close()
+        saves every group and closes the GUI application.
     start()
         starts the GUI application.
     """
 
-    def __init__(self):
+    def __init__(self, save_path = SAVE_PATH):
         """ 
-        A constructor for the class
+        A constructor for the class that accepts
+        the path of the save file.
         """
 
         self.root = tk.Tk()
         self.root.title(APPLICATION_TITLE)
+        self.theme = ThemeRegistry()
+        self.theme_buttons = {}
         self.main_frame = tk.Frame(self.root)
         self.active_frames = {
             "home": False,
             "task": False,
             "settings": False,
-            "group": False
+            "group": False,
+            "all": False
         }
         self.groups = []
+        self.group_views = {}
+        self.all_tasks_column = "date"
+        self.all_tasks_stream = None
+        self.all_tasks_loading = False
+        self.reminders = ReminderScheduler(self.root, self.show_reminders)
+        self.dependencies = DependencyGraph()
+        self.time_stats = TimeStats()
+        self.palette = PaletteIndex()
+        self.palette.add_action("Home", self.switch_to_home)
+        self.palette.add_action("Tasks", self.switch_to_task)
+        self.palette.add_action("All Tasks", self.switch_to_all_tasks)
+        self.palette.add_action("Settings", self.switch_to_settings)
+        self.palette.add_action("Add Task", partial(self.group_action, self.new_task))
+        self.palette.add_action("Delete Group", partial(self.group_action, self.delete_group))
+        self.palette.add_action("Sync With Replica", self.sync_replica)
+        self.palette.add_action("Search Archive", self.open_archive)
+        self.palette.add_action("Verify Save File", self.verify_snapshot)
+        self.palette_popup = None
+        self.replica = None
+        self.unwatched_groups = []
+        self.archive = Archive(archive_path(save_path))
+        self.maintenance = Maintenance()
+        self.stats_labels = {}
+        self.recent = RecentFiles(self.root, MetadataCache(RECENT_PATH))
+        self.recent.get_cache().load()
+        self.recent_labels = {}
+        self.save_path = save_path
+        self.snapshot = None
+        self.save_enabled = True
+        self.rpc_server = None
+        self.current_group = None
+        self.page_observers = []
+        self.page_stale = False
+        self.task_rows = {}
         self.active_group_buttons = 0
-        self.active_tasks = 0
+        self.task_ids = IdAllocator(self.archive.max_id())
+        self.load_snapshot()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.root.bind("<Control-k>", self.open_palette)
         self.create_menu_bar()
         self.create_home_page()
+        self.root.after_idle(self.watch_groups)
 
 
     def clear_active_frames(self):
@@ -95,6 +358,30 @@ class Window:
 
         for key in self.active_frames:
             self.active_frames[key] = False
+        self.release_page()
+
+
+    def observe(self, source, callback):
+        """
+        This method registers a callback with a task or
+        group for as long as the current page is shown.
+        """
+
+        source.add_observer(callback)
+        self.page_observers.append((source, callback))
+
+
+    def release_page(self):
+        """
+        This method unregisters every callback registered
+        by the rows of the page that is being replaced.
+        """
+
+        for source, callback in self.page_observers:
+            source.remove_observer(callback)
+        self.page_observers = []
+        self.page_stale = False
+        self.task_rows = {}
 
 
     def create_menu_bar(self):
@@ -116,41 +403,41 @@ class Window:
         menu_bar_frame.columnconfigure(0, weight = 1)
         menu_bar_frame.columnconfigure(1, weight = 1)
         menu_bar_frame.columnconfigure(2, weight = 1)
+        menu_bar_frame.columnconfigure(3, weight = 1)
         menu_bar_frame.rowconfigure(0, weight = 1)
         menu_bar_frame.pack(fill = "both")
         home_button = tk.Button(
             menu_bar_frame,
             text = "Home",
             command = self.switch_to_home,
-            bg = DARK_GRAY,
-            fg = WHITE,
-            activebackground = GRAY,
-            activeforeground = WHITE,
             cursor = "hand2"
         )
+        self.theme.style(home_button, "button")
         home_button.grid(row = 0, column = 0, sticky = tk.NSEW)
         task_button = tk.Button(
             menu_bar_frame,
             text = "Tasks",
             command = self.switch_to_task,
-            bg = DARK_GRAY,
-            fg = WHITE,
-            activebackground = GRAY,
-            activeforeground = WHITE,
             cursor = "hand2"
         )
+        self.theme.style(task_button, "button")
         task_button.grid(row = 0, column = 1, sticky = tk.NSEW)
+        all_tasks_button = tk.Button(
+            menu_bar_frame,
+            text = "All Tasks",
+            command = self.switch_to_all_tasks,
+            cursor = "hand2"
+        )
+        self.theme.style(all_tasks_button, "button")
+        all_tasks_button.grid(row = 0, column = 2, sticky = tk.NSEW)
         settings_button = tk.Button(
             menu_bar_frame,
             text = "Settings",
             command = self.switch_to_settings,
-            bg = DARK_GRAY,
-            fg = WHITE,
-            activebackground = GRAY,
-            activeforeground = WHITE,
             cursor = "hand2"
         )
-        settings_button.grid(row = 0, column = 2, sticky = tk.NSEW)
+        self.theme.style(settings_button, "button")
+        settings_button.grid(row = 0, column = 3, sticky = tk.NSEW)
 
 
     def create_home_page(self):
@@ -182,29 +469,72 @@ class Window:
         upper_frame.pack(fill = "both", expand = True)
         overview_frame = tk.Frame(
             upper_frame, 
-            bg = LIGHT_GRAY,
             bd = 1,
             relief = "solid"
         )
+        self.theme.style(overview_frame, "panel")
         overview_frame.grid(row = 0, column = 0, sticky = tk.NSEW)
         hotbox_frame = tk.Frame(
             upper_frame, 
-            bg = LIGHT_GRAY,
             bd = 1,
             relief = "solid"
         )
+        self.theme.style(hotbox_frame, "panel")
         hotbox_frame.grid(row = 0, column = 1, stick = tk.NSEW)
         
         recent_pdfs_frame = tk.Frame(
             self.main_frame, 
             height = w_height * 0.25, 
             width = w_width, 
-            bg = LIGHT_GRAY,
             bd = 1,
             relief = "solid"
         )
+        self.theme.style(recent_pdfs_frame, "panel")
         recent_pdfs_frame.pack(fill = "both")
 
+        # Group and task counts only read the save file
+        # header, no task is loaded to show them
+        task_count = sum(grp.get_task_count() for grp in self.groups)
+        count_label = tk.Label(
+            overview_frame,
+            text = f"{len(self.groups)} groups, {task_count} tasks"
+        )
+        self.theme.style(count_label, "panel_label")
+        count_label.pack(fill = "x", padx = 5, pady = (5, 0))
+        self.stats_labels = {"total": count_label}
+        for grp in self.groups[:OVERVIEW_ROWS]:
+            group_label = tk.Label(
+                overview_frame,
+                text = f"{grp.get_name()}: {grp.get_task_count()} tasks",
+                bd = 1,
+                relief = "solid",
+                anchor = "w"
+            )
+            self.theme.style(group_label, "row_label")
+            group_label.pack(fill = "x", padx = 5, pady = (5, 0))
+            self.stats_labels[id(grp)] = group_label
+        self.update_stats()
+
+        # Recent documents start out with their cached details
+        # and are filled in as the background scans finish
+        cache = self.recent.get_cache()
+        paths = cache.paths()[:RECENT_ROWS]
+        self.recent_labels = {}
+        for path in paths:
+            recent_label = tk.Label(
+                recent_pdfs_frame,
+                text = describe(path, cache.get(path)),
+                cursor = "hand2",
+                bd = 1,
+                relief = "solid",
+                anchor = "w"
+            )
+            self.theme.style(recent_label, "row_label")
+            recent_label.bind("<Button-1>", partial(self.open_document, path))
+            recent_label.pack(fill = "x", padx = 5, pady = (5, 0))
+            self.recent_labels[path] = recent_label
+        self.recent.refresh(paths, self.update_recent)
+
 
     def switch_to_home(self):
         """
@@ -240,7 +570,8 @@ class Window:
         w_width = self.root.winfo_screenwidth()
 
         # Another menu bar at the top of page
-        button_container = tk.Frame(self.main_frame, bg = BLACK)
+        button_container = tk.Frame(self.main_frame)
+        self.theme.style(button_container, "backdrop")
         button_container.pack(fill = "x")
         group_button_bar = tk.Frame(
             button_container,
@@ -255,22 +586,21 @@ class Window:
         # Main body of the page
         body_frame = tk.Frame(self.main_frame)
         body_frame.pack(side = "bottom", fill = "both", expand = True)
-        task_canvas = tk.Canvas(body_frame, bg = LIGHT_GRAY)
+        task_canvas = tk.Canvas(body_frame)
+        self.theme.style(task_canvas, "panel")
         task_canvas.pack(side = "left", fill = "both", expand = True)
         
-        scrollable_frame = tk.Frame(task_canvas, bg = LIGHT_GRAY)
+        scrollable_frame = tk.Frame(task_canvas)
+        self.theme.style(scrollable_frame, "panel")
         scrollable_frame.pack(fill = "both", expand = True)
 
         add_group_button = tk.Button(
             group_button_bar,
             text = "Add Group",
             command = partial(self.new_group, scrollable_frame),
-            bg = DARK_GRAY,
-            fg = WHITE,
-            activebackground = GRAY,
-            activeforeground = WHITE,
             cursor = "hand2"
         )
+        self.theme.style(add_group_button, "button")
         add_group_button.grid(row = 0, column = 0, sticky = tk.NSEW)
         
         scroll_bar_frame = tk.Frame(body_frame)
@@ -327,7 +657,9 @@ class Window:
 
         num = len(self.groups)
         grp = Group(f"Group #{num + 1}")
+        grp.set_color(self.theme.color("accent"))
         self.groups.append(grp)
+        self.watch_group(grp)
         self.add_group(grp, scrollable_frame)
 
 
@@ -338,8 +670,36 @@ class Window:
         """
 
         self.groups.remove(grp)
+        self.forget_group(grp)
         self.switch_to_task()
 
+
+    def forget_group(self, grp):
+        """
+        This method drops the reminders, dependencies, time
+        stats, palette entries and view kept for a group that
+        has been removed from the groups list, and records
+        the deletion so it reaches other machines.
+        """
+
+        self.reminders.remove_group(grp)
+        self.dependencies.remove_group(grp)
+        self.time_stats.remove_group(grp)
+        self.palette.remove_group(grp)
+        if self.replica is not None:
+            # A group removed before it was watched is still
+            # followed first, so its deletion is recorded
+            if any(unwatched is grp for unwatched in self.unwatched_groups):
+                self.unwatched_groups = [unwatched for unwatched in self.unwatched_groups if unwatched is not grp]
+                self.replica.follow_group(grp)
+            self.replica.delete_group(grp)
+        view = self.group_views.pop(id(grp), None)
+        if view is not None:
+            view.detach()
+        if self.current_group is grp:
+            self.current_group = None
+
+
     def add_group(self, grp, scrollable_frame):
         """
         This method handles the logic for adding a new group
@@ -363,11 +723,11 @@ class Window:
             corner_radius = 8,
             border_width = 3,
             cursor = "hand2",
-            border_color = BLACK,
-            fg_color = CYAN,
-            text_color = BLACK,
+            fg_color = grp.get_color(),
+            text_color = contrast_color(grp.get_color()),
             command = partial(self.switch_to_group, grp)
         )
+        self.theme.style(button, "tile")
         button.grid(
             row = row, 
             column = col, 
@@ -389,13 +749,17 @@ class Window:
             self.clear_active_frames()
             self.active_frames["group"] = True
 
+        self.current_group = grp
+        self.observe(grp, self.group_page_changed)
+        self.observe(self.dependencies, self.blocked_changed)
         self.main_frame = tk.Frame(self.root)
         self.main_frame.pack(fill = "both", expand = True)
         w_height = self.root.winfo_screenheight()
         w_width = self.root.winfo_screenwidth()
 
         # Another menu frame for the top of the page 
-        button_container = tk.Frame(self.main_frame, bg = BLACK)
+        button_container = tk.Frame(self.main_frame)
+        self.theme.style(button_container, "backdrop")
         button_container.pack(fill = "x")
         task_button_bar = tk.Frame(
             button_container,
@@ -411,37 +775,57 @@ class Window:
         body_frame = tk.Frame(self.main_frame)
         body_frame.pack(side = "bottom", fill = "both", expand = True)
 
-        task_canvas = tk.Canvas(body_frame, bg = LIGHT_GRAY)
+        task_canvas = tk.Canvas(body_frame)
+        self.theme.style(task_canvas, "panel")
         task_canvas.pack(side = "left", fill = "both", expand = True)
         scrollable_frame = tk.Frame(
-            task_canvas,
-            bg = BLACK
+            task_canvas
         )
+        self.theme.style(scrollable_frame, "backdrop")
         scrollable_frame.pack(fill = "both", expand = True)
 
         add_task_button = tk.Button(
             task_button_bar,
             text = "Add Task",
-            bg = DARK_GRAY,
-            fg = WHITE,
-            activebackground = GRAY,
-            activeforeground = WHITE,
             cursor = "hand2",
             command = partial(self.new_task, grp)
         )
+        self.theme.style(add_task_button, "button")
         add_task_button.grid(row = 0, column = 0, sticky = tk.NSEW)
         delete_group_button = tk.Button(
             task_button_bar,
             text = "Delete Group",
-            bg = DARK_GRAY,
-            fg = WHITE,
-            activebackground = GRAY,
-            activeforeground = WHITE,
             cursor = "hand2",
             command = partial(self.delete_group, grp)
         )
+        self.theme.style(delete_group_button, "button")
         delete_group_button.grid(row = 0, column = 1, sticky = tk.NSEW)
 
+        # Sorting and filtering controls for the page
+        view = self.get_group_view(grp)
+        column, reverse = view.get_sort()
+        completion = view.get_filter()[0]
+        view_button_bar = tk.Frame(button_container)
+        view_button_bar.rowconfigure(0, weight = 1)
+        view_button_bar.pack(side = "top", fill = "both", padx = (2, 2), pady = (0, 2))
+        buttons = []
+        for text, key in SORT_BUTTONS:
+            if key == column:
+                text = f"{text} {'v' if reverse else '^'}"
+            buttons.append((text, key == column, partial(self.sort_group, grp, key)))
+        for text, key in FILTER_BUTTONS:
+            buttons.append((text, key == completion, partial(self.filter_group, grp, key)))
+        for index, (text, selected, command) in enumerate(buttons):
+            view_button_bar.columnconfigure(index, weight = 1)
+            view_button = tk.Button(
+                view_button_bar,
+                text = text,
+                cursor = "hand2",
+                command = command
+            )
+            self.theme.style(view_button, "button_selected" if selected else "button")
+            view_button.grid(row = 0, column = index, sticky = tk.NSEW)
+
         scroll_bar_frame = tk.Frame(body_frame)
         scroll_bar_frame.pack(side = "right", fill = "y")
         scroll_bar = tk.Scrollbar(
@@ -471,7 +855,7 @@ class Window:
             )
         )
 
-        for task in grp.get_tasks():
+        for task in view.get_tasks():
             self.load_task(task, grp, scrollable_frame)
 
 
@@ -481,8 +865,7 @@ class Window:
         a new task object.
         """
 
-        self.active_tasks += 1
-        index = self.active_tasks
+        index = self.task_ids.next_id()
         task = Task(id_num = index, name = f"Task #{index}")
         grp.add_task(task)
         self.active_frames["group"] = False
@@ -500,17 +883,19 @@ class Window:
         task_bar.columnconfigure(1, weight = 2)
         task_bar.columnconfigure(2, weight = 1)
         task_bar.columnconfigure(3, weight = 1)
+        task_bar.columnconfigure(4, weight = 1)
+        task_bar.columnconfigure(5, weight = 1)
+        task_bar.columnconfigure(6, weight = 1)
         task_bar.rowconfigure(0, weight = 1)
         task_bar.pack(fill = "both", expand = True)
 
         task_name = tk.Label(
             task_bar,
-            text = task.get_name(),
-            bg = WHITE,
-            fg = BLACK,
+            text = self.task_title(task),
             bd = 1,
             relief = "solid"
         )
+        self.theme.style(task_name, "row_blocked" if self.dependencies.is_blocked(task) else "row_label")
         task_name.grid(
             row = 0, 
             column = 0, 
@@ -522,11 +907,10 @@ class Window:
         task_date = tk.Label(
             task_bar,
             text = task.get_date(),
-            bg = WHITE,
-            fg = BLACK,
             bd = 1,
             relief = "solid"
         )
+        self.theme.style(task_date, "row_label")
         task_date.grid(
             row = 0, 
             column = 1, 
@@ -537,14 +921,13 @@ class Window:
 
         task_completion = tk.Button(
             task_bar,
+            text = "Done" if task.get_completion() else "Open",
             cursor = "hand2",
-            bg = WHITE,
-            fg = BLACK,
             bd = 1,
             relief = "solid",
-            activebackground = GRAY,
-            activeforeground = WHITE
+            command = partial(self.toggle_task, task)
         )
+        self.theme.style(task_completion, "row_button")
         task_completion.grid(
             row = 0, 
             column = 2, 
@@ -555,21 +938,308 @@ class Window:
             task_bar,
             text = "Delete Task",
             cursor = "hand2",
-            bg = WHITE,
-            fg = BLACK,
             bd = 1,
             relief = "solid",
-            activebackground = GRAY,
-            activeforeground = WHITE,
             command = partial(self.remove_task, task, grp)
         )
+        self.theme.style(task_delete, "row_button")
         task_delete.grid(
             row = 0, 
-            column = 3, 
+            column = 6, 
             sticky = tk.NSEW, 
             padx = (0, 1)
         )
 
+        recurrence = task.get_recurrence()
+        task_repeat = tk.Button(
+            task_bar,
+            text = str(recurrence) if recurrence is not None else "Repeat",
+            cursor = "hand2",
+            bd = 1,
+            relief = "solid",
+            command = partial(self.cycle_recurrence, task, grp)
+        )
+        self.theme.style(task_repeat, "row_button")
+        task_repeat.grid(
+            row = 0,
+            column = 3,
+            sticky = tk.NSEW
+        )
+
+        task_attach = tk.Button(
+            task_bar,
+            text = f"Attach ({len(task.get_attachments())})",
+            cursor = "hand2",
+            bd = 1,
+            relief = "solid",
+            command = partial(self.attach_document, task, grp)
+        )
+        self.theme.style(task_attach, "row_button")
+        task_attach.grid(
+            row = 0,
+            column = 4,
+            sticky = tk.NSEW
+        )
+
+        task_timer = tk.Button(
+            task_bar,
+            text = self.timer_title(task),
+            cursor = "hand2",
+            bd = 1,
+            relief = "solid",
+            command = partial(self.toggle_timer, task)
+        )
+        self.theme.style(task_timer, "row_button")
+        task_timer.grid(
+            row = 0,
+            column = 5,
+            sticky = tk.NSEW
+        )
+
+        # The row keeps itself up to date, only changes that
+        # move it or add occurrence rows rebuild the page
+        cells = {
+            "name": (task_name, partial(self.task_title, task)),
+            "date": (task_date, task.get_date),
+            "completion": (task_completion, lambda: "Done" if task.get_completion() else "Open"),
+            "attachments": (task_attach, lambda: f"Attach ({len(task.get_attachments())})"),
+            "timer": (task_timer, partial(self.timer_title, task)),
+            "time": (task_timer, partial(self.timer_title, task))
+        }
+        self.observe(task, partial(self.update_task_row, grp, cells))
+        self.task_rows[id(task)] = cells
+
+        # Occurrences of a recurring task are only generated
+        # for the dates that are visible on the page
+        if recurrence is not None:
+            today = date.today().toordinal()
+            occurrences = task.get_occurrences(
+                ordinal_date(today),
+                ordinal_date(today + OCCURRENCE_WINDOW - 1)
+            )
+            for occurrence, completed in occurrences:
+                self.load_occurrence(task, grp, occurrence, completed, scrollable_frame)
+
+
+    def load_occurrence(self, task, grp, occurrence, completed, scrollable_frame):
+        """
+        This method handles the logic for creating a row
+        for a single occurrence of a recurring task within
+        a group page.
+        """
+
+        occurrence_bar = tk.Frame(scrollable_frame, padx = 1, pady = 1)
+        occurrence_bar.columnconfigure(0, weight = 1)
+        occurrence_bar.columnconfigure(1, weight = 7)
+        occurrence_bar.columnconfigure(2, weight = 2)
+        occurrence_bar.columnconfigure(3, weight = 2)
+        occurrence_bar.rowconfigure(0, weight = 1)
+        occurrence_bar.pack(fill = "both", expand = True)
+
+        occurrence_name = tk.Label(
+            occurrence_bar,
+            text = task.get_name(),
+            bd = 1,
+            relief = "solid"
+        )
+        self.theme.style(occurrence_name, "panel_label")
+        occurrence_name.grid(
+            row = 0,
+            column = 1,
+            sticky = tk.NSEW,
+            padx = 1,
+            pady = 1
+        )
+
+        occurrence_date = tk.Label(
+            occurrence_bar,
+            text = occurrence,
+            bd = 1,
+            relief = "solid"
+        )
+        self.theme.style(occurrence_date, "panel_label")
+        occurrence_date.grid(
+            row = 0,
+            column = 2,
+            sticky = tk.NSEW,
+            padx = 1,
+            pady = 1
+        )
+
+        occurrence_completion = tk.Button(
+            occurrence_bar,
+            text = "Done" if completed else "Open",
+            cursor = "hand2",
+            bd = 1,
+            relief = "solid",
+            command = partial(self.toggle_occurrence, task, grp, occurrence, completed)
+        )
+        self.theme.style(occurrence_completion, "panel_button")
+        occurrence_completion.grid(
+            row = 0,
+            column = 3,
+            sticky = tk.NSEW,
+            padx = (0, 1)
+        )
+
+
+    def toggle_task(self, task):
+        """
+        This method handles the logic for completing or
+        reopening a task from its row, the page is only
+        rebuilt when the row has to move.
+        """
+
+        task.set_completion(not task.get_completion())
+        if self.page_stale:
+            self.refresh_page()
+
+
+    def toggle_timer(self, task):
+        """
+        This method handles the logic for starting or
+        stopping the timer of a task from its row.
+        """
+
+        if task.get_timer_start() is None:
+            task.start_timer()
+        else:
+            task.stop_timer()
+
+
+    def timer_title(self, task):
+        """
+        This method returns the text shown in the timer cell
+        of a task row with the hours tracked so far.
+        """
+
+        hours = task.get_time_spent() / SECONDS_PER_HOUR
+        if task.get_timer_start() is None:
+            return f"Start ({hours:.1f} h)"
+        return f"Stop ({hours:.1f} h)"
+
+
+    def task_title(self, task):
+        """
+        This method returns the text shown in the name cell
+        of a task row, marking tasks that are blocked.
+        """
+
+        if self.dependencies.is_blocked(task):
+            return f"[Blocked] {task.get_name()}"
+        return task.get_name()
+
+
+    def update_task_row(self, grp, cells, event):
+        """
+        This method updates the cells of a task row in place
+        after one of its fields changed, or marks the page
+        stale when the row has to move or be rebuilt. Rows of
+        the all tasks page only move with the merge column.
+        """
+
+        field = event.field
+        if self.active_frames["all"]:
+            moves = field in SORT_KEYS[self.all_tasks_column][0]
+        else:
+            moves = self.get_group_view(grp).depends_on(field)
+        if field in ("recurrence", "occurrences") or moves:
+            self.page_stale = True
+        elif field in cells:
+            widget, text = cells[field]
+            if widget.winfo_exists():
+                widget.configure(text = text())
+
+
+    def blocked_changed(self, event):
+        """
+        This method updates the name cell of a task row on
+        the group page when the task becomes blocked or
+        unblocked.
+        """
+
+        cells = self.task_rows.get(id(event.source))
+        if cells is None:
+            return
+
+        widget, text = cells["name"]
+        if widget.winfo_exists():
+            widget.configure(text = text())
+            self.theme.style(widget, "row_blocked" if event.new else "row_label")
+
+
+    def group_page_changed(self, event):
+        """
+        This method marks the group page stale when tasks
+        are added to or removed from the displayed group.
+        """
+
+        if not isinstance(event, FieldChanged):
+            self.page_stale = True
+
+
+    def attach_document(self, task, grp):
+        """
+        This method handles the logic for attaching a
+        document chosen by the user to a task.
+        """
+
+        path = filedialog.askopenfilename(parent = self.root, title = "Attach Document")
+        if not path:
+            return
+
+        task.add_attachment(path)
+        self.recent.touch(path)
+
+
+    def update_recent(self, path, metadata):
+        """
+        This method fills in the recent files panel entry
+        of a document once its scan has finished.
+        """
+
+        label = self.recent_labels.get(path)
+        if label is not None and label.winfo_exists():
+            label.configure(text = describe(path, metadata))
+
+
+    def open_document(self, path, event = None):
+        """
+        This method opens a document from the recent files
+        panel with the default application of the system.
+        """
+
+        if os.path.exists(path):
+            webbrowser.open(Path(path).resolve().as_uri())
+
+
+    def cycle_recurrence(self, task, grp):
+        """
+        This method handles the logic for switching a task
+        to the next recurrence rule, a task without a date
+        starts repeating from today.
+        """
+
+        recurrence = task.get_recurrence()
+        current = recurrence.get_frequency() if recurrence is not None else None
+        frequency = REPEAT_CYCLE[(REPEAT_CYCLE.index(current) + 1) % len(REPEAT_CYCLE)]
+        if frequency is not None and date_ordinal(task.get_date()) is None:
+            task.set_date(ordinal_date(date.today().toordinal()))
+        task.set_recurrence(Recurrence(frequency) if frequency is not None else None)
+        self.active_frames["group"] = False
+        self.switch_to_group(grp)
+
+
+    def toggle_occurrence(self, task, grp, occurrence, completed):
+        """
+        This method handles the logic for completing or
+        reopening a single occurrence of a recurring task.
+        """
+
+        task.set_occurrence_completion(occurrence, not completed)
+        self.active_frames["group"] = False
+        self.switch_to_group(grp)
+
 
     def remove_task(self, task, grp):
         """
@@ -578,7 +1248,6 @@ class Window:
         """
   
         grp.remove_task(task)
-        self.active_tasks -= 1
         self.active_frames["group"] = False
         self.switch_to_group(grp)
 
@@ -598,6 +1267,236 @@ class Window:
             self.active_group_buttons = 0
 
 
+    def get_group_view(self, grp):
+        """
+        This method returns the view used to sort and
+        filter the tasks of a group, creating it the
+        first time the group is opened.
+        """
+
+        if id(grp) not in self.group_views:
+            self.group_views[id(grp)] = GroupView(grp)
+        return self.group_views[id(grp)]
+
+
+    def sort_group(self, grp, column):
+        """
+        This method handles the logic for sorting the
+        group page by a given column, selecting the
+        current column again reverses the order.
+        """
+
+        view = self.get_group_view(grp)
+        current, reverse = view.get_sort()
+        view.set_sort(column, not reverse if column == current else False)
+        self.active_frames["group"] = False
+        self.switch_to_group(grp)
+
+
+    def filter_group(self, grp, completion):
+        """
+        This method handles the logic for filtering the
+        group page by the completion status of its tasks.
+        """
+
+        view = self.get_group_view(grp)
+        _, priority, text = view.get_filter()
+        view.set_filter(completion, priority, text)
+        self.active_frames["group"] = False
+        self.switch_to_group(grp)
+
+
+    def create_all_tasks_page(self):
+        """
+        This method handles the logic for creating the
+        page that lists the tasks of every group. Rows
+        are pulled lazily from a merge of the sorted
+        groups as the user scrolls.
+        """
+
+        if self.active_frames["all"] == True:
+            return
+        else:
+            self.clear_active_frames()
+            self.active_frames["all"] = True
+
+        self.main_frame = tk.Frame(self.root)
+        self.main_frame.pack(fill = "both", expand = True)
+        w_height = self.root.winfo_screenheight()
+        w_width = self.root.winfo_screenwidth()
+
+        # Another menu bar at the top of page
+        button_container = tk.Frame(self.main_frame)
+        self.theme.style(button_container, "backdrop")
+        button_container.pack(fill = "x")
+        sort_button_bar = tk.Frame(
+            button_container,
+            height = w_height * 0.05,
+            width = w_width
+        )
+        sort_button_bar.rowconfigure(0, weight = 1)
+        sort_button_bar.pack(side = "top", fill = "both", padx = (2, 2), pady = (0, 2))
+        for index, (text, column) in enumerate(MERGE_BUTTONS):
+            sort_button_bar.columnconfigure(index, weight = 1)
+            sort_button = tk.Button(
+                sort_button_bar,
+                text = text,
+                cursor = "hand2",
+                command = partial(self.sort_all_tasks, column)
+            )
+            self.theme.style(sort_button, "button_selected" if column == self.all_tasks_column else "button")
+            sort_button.grid(row = 0, column = index, sticky = tk.NSEW)
+
+        # Main body of the page
+        body_frame = tk.Frame(self.main_frame)
+        body_frame.pack(side = "bottom", fill = "both", expand = True)
+        task_canvas = tk.Canvas(body_frame)
+        self.theme.style(task_canvas, "panel")
+        task_canvas.pack(side = "left", fill = "both", expand = True)
+        scrollable_frame = tk.Frame(task_canvas)
+        self.theme.style(scrollable_frame, "backdrop")
+        scrollable_frame.pack(fill = "both", expand = True)
+
+        scroll_bar_frame = tk.Frame(body_frame)
+        scroll_bar_frame.pack(side = "right", fill = "y")
+        scroll_bar = tk.Scrollbar(
+            scroll_bar_frame,
+            orient = "vertical",
+            command = task_canvas.yview
+        )
+        scroll_bar.pack(fill = "both", expand = True)
+        canvas_window = task_canvas.create_window(
+            (0, 0),
+            window = scrollable_frame,
+            anchor = "nw"
+        )
+        task_canvas.bind(
+            "<Configure>",
+            lambda e: task_canvas.itemconfig(
+                canvas_window,
+                width = e.width
+            )
+        )
+        task_canvas.configure(
+            yscrollcommand = partial(self.scroll_all_tasks, scroll_bar, scrollable_frame)
+        )
+        scrollable_frame.bind(
+            "<Configure>",
+            lambda e: self.render_all_tasks(task_canvas)
+        )
+
+        views = [self.get_group_view(grp) for grp in self.groups]
+        self.all_tasks_stream = merge_views(views, self.all_tasks_column)
+        self.all_tasks_loading = False
+        self.load_more_tasks(scrollable_frame)
+
+
+    def switch_to_all_tasks(self):
+        """
+        This method is mainly for the use of destroying the
+        current displayed main page and switching to the
+        all tasks page view.
+        """
+
+        if self.active_frames["all"] == True:
+            return
+        else:
+            self.main_frame.destroy()
+            self.create_all_tasks_page()
+            self.active_group_buttons = 0
+
+
+    def sort_all_tasks(self, column):
+        """
+        This method handles the logic for merging the
+        all tasks page by a given column.
+        """
+
+        self.all_tasks_column = column
+        self.active_frames["all"] = False
+        self.switch_to_all_tasks()
+
+
+    def scroll_all_tasks(self, scroll_bar, scrollable_frame, first, last):
+        """
+        This method updates the scroll bar of the all tasks
+        page and pulls more rows once the user scrolls close
+        to the last loaded row.
+        """
+
+        scroll_bar.set(first, last)
+        if float(last) > 0.9 and not self.all_tasks_loading:
+            self.load_more_tasks(scrollable_frame)
+
+
+    def render_all_tasks(self, task_canvas):
+        """
+        This method fits the scroll region of the all tasks
+        page to its rows once they have been laid out, which
+        allows the next rows to be pulled.
+        """
+
+        task_canvas.configure(scrollregion = task_canvas.bbox("all"))
+        self.all_tasks_loading = False
+
+
+    def load_more_tasks(self, scrollable_frame):
+        """
+        This method handles the logic for pulling the next
+        rows of the all tasks page from the merge, no more
+        are pulled until these rows have been rendered.
+        """
+
+        if self.all_tasks_stream is None:
+            return
+
+        loaded = 0
+        for grp, task in self.all_tasks_stream:
+            self.load_task(task, grp, scrollable_frame)
+            loaded += 1
+            if loaded == ALL_TASKS_PAGE_SIZE:
+                break
+        else:
+            self.all_tasks_stream = None
+        if loaded:
+            self.all_tasks_loading = True
+
+
+    def show_reminders(self, tasks):
+        """
+        This method handles the logic for showing a popup
+        that lists the tasks whose reminders are due.
+        """
+
+        popup = tk.Toplevel(self.root)
+        self.theme.style(popup, "panel")
+        popup.title(f"{APPLICATION_TITLE} Reminders")
+        for task in tasks[:REMINDER_ROWS]:
+            reminder_label = tk.Label(
+                popup,
+                text = f"{task.get_name()} is due {task.get_date()}",
+                bd = 1,
+                relief = "solid"
+            )
+            self.theme.style(reminder_label, "row_label")
+            reminder_label.pack(fill = "x", padx = 5, pady = (5, 0))
+        if len(tasks) > REMINDER_ROWS:
+            more_label = tk.Label(
+                popup,
+                text = f"and {len(tasks) - REMINDER_ROWS} more"
+            )
+            self.theme.style(more_label, "panel_label")
+            more_label.pack(fill = "x", padx = 5, pady = (5, 0))
+        close_button = tk.Button(
+            popup,
+            text = "Close",
+            cursor = "hand2",
+            command = popup.destroy
+        )
+        self.theme.style(close_button, "button")
+        close_button.pack(fill = "x", padx = 5, pady = 5)
+
+
     def create_settings_page(self):
         """
         This method handles the logic for creating the
@@ -615,12 +1514,36 @@ class Window:
         w_height = self.root.winfo_screenheight()
         w_width = self.root.winfo_screenwidth()
 
-        # Testing label
-        label = tk.Label(
-            self.main_frame, 
-            text = "This feature has yet to be implemented"
-        )
-        label.pack()
+        # Colorscheme selection
+        theme_bar = tk.Frame(self.main_frame)
+        self.theme.style(theme_bar, "backdrop")
+        theme_bar.rowconfigure(0, weight = 1)
+        theme_bar.pack(side = "top", fill = "both", padx = (2, 2), pady = (0, 2))
+        self.theme_buttons = {}
+        for index, name in enumerate(THEMES):
+            theme_bar.columnconfigure(index, weight = 1)
+            theme_button = tk.Button(
+                theme_bar,
+                text = name,
+                cursor = "hand2",
+                command = partial(self.switch_theme, name)
+            )
+            self.theme.style(theme_button, "button")
+            theme_button.grid(row = 0, column = index, sticky = tk.NSEW)
+            self.theme_buttons[name] = theme_button
+        self.theme_buttons[self.theme.get_name()].configure(relief = "sunken")
+
+
+    def switch_theme(self, name):
+        """
+        This method handles the logic for switching the
+        colorscheme, every displayed widget is recolored
+        in place instead of rebuilding the page.
+        """
+
+        self.theme_buttons[self.theme.get_name()].configure(relief = "raised")
+        self.theme.set_theme(name)
+        self.theme_buttons[name].configure(relief = "sunken")
 
 
     def switch_to_settings(self):
@@ -638,6 +1561,466 @@ class Window:
             self.active_group_buttons = 0
 
 
+    def load_snapshot(self):
+        """
+        This method opens the save file and loads its groups,
+        the tasks of each group are only read from the file
+        the first time the group is used. A save file that
+        cannot be read is reported and saving is turned off.
+        """
+
+        if not os.path.exists(self.save_path):
+            return
+
+        try:
+            self.snapshot = Snapshot(self.save_path)
+            groups = self.snapshot.load_groups()
+            for grp in groups:
+                self.dependencies.add_group(grp)
+            self.snapshot.load_dependencies(self.dependencies)
+        except (OSError, ValueError, IndexError) as error:
+            # A save file that cannot be read is left untouched
+            # and nothing is saved over it this session
+            if self.snapshot is not None:
+                self.snapshot.close()
+                self.snapshot = None
+            self.dependencies = DependencyGraph()
+            self.save_enabled = False
+            self.show_message(
+                "Save File",
+                f"The save file could not be read and will not be saved over: {error}"
+            )
+            return
+        self.groups = groups
+        self.task_ids.reserve(self.snapshot.max_task_id())
+
+
+    def watch_groups(self):
+        """
+        This method creates the replica and then watches the
+        loaded groups one per step of the event loop, so the
+        tasks of each group are only built in its own step
+        and the page stays responsive. It runs once the first
+        page has been shown.
+        """
+
+        self.replica = Replica(
+            replica_path(self.save_path),
+            self.groups,
+            on_group_added = self.watch_group,
+            on_group_removed = self.forget_group,
+            task_ids = self.task_ids,
+            follow = False
+        )
+        self.unwatched_groups = list(self.groups)
+        self.watch_next_group(self.archive.archived_days(), 0)
+
+
+    def watch_next_group(self, archived, swept):
+        """
+        This method builds the time stats of the next loaded
+        group with the time of its archived tasks, moves its
+        old completed tasks to the archive, then schedules its
+        reminders and adds it to the palette index and the
+        replica. Once every group is watched the save file is
+        written if any task was archived.
+        """
+
+        if self.unwatched_groups:
+            grp = self.unwatched_groups.pop(0)
+            self.time_stats.add_group(grp)
+            self.time_stats.add_archived(grp, archived.get(grp.get_uid(), ()))
+            swept += self.archive.sweep([grp])
+            self.reminders.add_group(grp)
+            self.palette.add_group(grp)
+            self.replica.follow_group(grp)
+        if self.unwatched_groups:
+            self.root.after(WATCH_DELAY, self.watch_next_group, archived, swept)
+            return
+
+        # Archived tasks are only in the archive file until the
+        # save file without them is written
+        if swept:
+            self.save_snapshot()
+        self.update_stats()
+
+
+    def update_stats(self):
+        """
+        This method fills in the hours tracked this week and
+        this month on the home page, read from the rollups of
+        the time stats.
+        """
+
+        if not self.active_frames["home"]:
+            return
+
+        today = date.today()
+        month = month_range(today)
+        week = week_range(today)
+        task_count = sum(grp.get_task_count() for grp in self.groups)
+        week_hours = sum(self.time_stats.group_seconds(grp, *week) for grp in self.groups) / SECONDS_PER_HOUR
+        month_hours = 0
+        for grp, hours in self.time_stats.group_hours(*month):
+            month_hours += hours
+            label = self.stats_labels.get(id(grp))
+            if label is not None and label.winfo_exists():
+                label.configure(text = f"{grp.get_name()}: {grp.get_task_count()} tasks, {hours:.1f} h this month")
+        label = self.stats_labels.get("total")
+        if label is not None and label.winfo_exists():
+            label.configure(text = (
+                f"{len(self.groups)} groups, {task_count} tasks, "
+                f"{week_hours:.1f} h this week, {month_hours:.1f} h this month"
+            ))
+
+
+    def watch_group(self, grp):
+        """
+        This method starts the reminders, dependency tracking,
+        time stats, palette index and replica of a group
+        created after startup.
+        """
+
+        self.reminders.add_group(grp)
+        self.dependencies.add_group(grp)
+        self.time_stats.add_group(grp)
+        self.palette.add_group(grp)
+        if self.replica is not None:
+            self.replica.add_group(grp)
+
+
+    def open_palette(self, event = None):
+        """
+        This method handles the logic for showing the command
+        palette, a popup that finds actions, groups and tasks
+        by a few typed characters.
+        """
+
+        if self.palette_popup is not None and self.palette_popup.winfo_exists():
+            self.palette_popup.lift()
+            return
+
+        popup = tk.Toplevel(self.root)
+        self.theme.style(popup, "panel")
+        popup.title(f"{APPLICATION_TITLE} Commands")
+        popup.transient(self.root)
+        query = tk.StringVar(popup)
+        entry = tk.Entry(popup, textvariable = query, width = 60)
+        self.theme.style(entry, "row_label")
+        entry.pack(fill = "x", padx = 5, pady = 5)
+        listbox = tk.Listbox(popup, height = PALETTE_ROWS, activestyle = "none")
+        self.theme.style(listbox, "row_list")
+        listbox.pack(fill = "both", expand = True, padx = 5, pady = (0, 5))
+
+        matches = []
+        query.trace_add("write", lambda *args: self.search_palette(query.get(), listbox, matches))
+        entry.bind("<Down>", partial(self.move_palette, listbox, 1))
+        entry.bind("<Up>", partial(self.move_palette, listbox, -1))
+        entry.bind("<Return>", lambda event: self.pick_palette(listbox, matches))
+        listbox.bind("<Double-Button-1>", lambda event: self.pick_palette(listbox, matches))
+        popup.bind("<Escape>", lambda event: popup.destroy())
+        entry.focus_set()
+        self.palette_popup = popup
+
+
+    def search_palette(self, text, listbox, matches):
+        """
+        This method lists the best matches of the text typed
+        in the command palette, it runs on every keystroke.
+        """
+
+        matches[:] = self.palette.search(text, PALETTE_ROWS)
+        listbox.delete(0, "end")
+        for kind, label, _ in matches:
+            listbox.insert("end", f"{kind.title()}: {label}")
+        if matches:
+            listbox.selection_set(0)
+
+
+    def move_palette(self, listbox, step, event = None):
+        """
+        This method moves the selection of the command
+        palette up or down by a step.
+        """
+
+        if listbox.size() == 0:
+            return "break"
+        selection = listbox.curselection()
+        index = (selection[0] + step if selection else 0) % listbox.size()
+        listbox.selection_clear(0, "end")
+        listbox.selection_set(index)
+        listbox.see(index)
+        return "break"
+
+
+    def pick_palette(self, listbox, matches):
+        """
+        This method closes the command palette and runs the
+        selected match, actions are called and groups and
+        tasks open the page of their group.
+        """
+
+        selection = listbox.curselection()
+        if not selection or selection[0] >= len(matches):
+            return
+        kind, _, payload = matches[selection[0]]
+        self.palette_popup.destroy()
+        self.palette_popup = None
+
+        if kind == ACTION:
+            payload[1]()
+            return
+        grp = payload if kind == GROUP else payload[0]
+        if all(listed is not grp for listed in self.groups):
+            return
+        self.active_frames["group"] = False
+        self.switch_to_group(grp)
+
+
+    def group_action(self, method):
+        """
+        This method runs a palette action on the group shown
+        by the group page, nothing happens on other pages.
+        """
+
+        if self.active_frames["group"] and self.current_group is not None:
+            method(self.current_group)
+
+
+    def sync_replica(self):
+        """
+        This method handles the logic for merging the replica
+        log of another machine chosen by the user, the
+        displayed page is rebuilt to show what changed.
+        """
+
+        if self.replica is None or self.unwatched_groups:
+            return
+
+        path = filedialog.askopenfilename(
+            parent = self.root,
+            title = "Sync With Replica",
+            filetypes = (("Replica logs", "*.ktlog"), ("All files", "*"))
+        )
+        if not path:
+            return
+
+        try:
+            changes = self.replica.merge(path)
+        except (OSError, ValueError):
+            return
+        if changes:
+            self.page_stale = True
+            self.refresh_page()
+
+
+    def open_archive(self):
+        """
+        This method handles the logic for showing a popup that
+        searches the archived tasks, pressing enter in the
+        entry searches and picking a result restores it.
+        """
+
+        popup = tk.Toplevel(self.root)
+        self.theme.style(popup, "panel")
+        popup.title(f"{APPLICATION_TITLE} Archive")
+        popup.transient(self.root)
+        entry = tk.Entry(popup, width = 60)
+        self.theme.style(entry, "row_label")
+        entry.pack(fill = "x", padx = 5, pady = 5)
+        listbox = tk.Listbox(popup, height = PALETTE_ROWS, activestyle = "none")
+        self.theme.style(listbox, "row_list")
+        listbox.pack(fill = "both", expand = True, padx = 5, pady = (0, 5))
+
+        matches = []
+        entry.bind("<Return>", lambda event: self.search_archive(entry.get(), listbox, matches))
+        listbox.bind("<Return>", lambda event: self.restore_archived(popup, listbox, matches))
+        listbox.bind("<Double-Button-1>", lambda event: self.restore_archived(popup, listbox, matches))
+        popup.bind("<Escape>", lambda event: popup.destroy())
+        entry.focus_set()
+        self.search_archive("", listbox, matches)
+
+
+    def search_archive(self, text, listbox, matches):
+        """
+        This method lists the archived tasks whose name or
+        description holds the text typed in the archive popup.
+        """
+
+        matches[:] = [record for _, record in self.archive.search(text, PALETTE_ROWS)]
+        listbox.delete(0, "end")
+        for record in matches:
+            listbox.insert("end", f"{record['date']}  {record['name']}")
+
+
+    def restore_archived(self, popup, listbox, matches):
+        """
+        This method moves the archived task selected in the
+        archive popup back to its group and opens the group.
+        """
+
+        selection = listbox.curselection()
+        if not selection:
+            return
+        try:
+            record = matches[selection[0]]
+            task = self.archive.restore(self.groups, record["uid"], record["id"])
+        except LookupError:
+            return
+        self.save_snapshot()
+        popup.destroy()
+        grp = next(grp for grp in self.groups if grp.get_uid() == record["group"])
+        self.time_stats.remove_archived(grp, task)
+        self.active_frames["group"] = False
+        self.switch_to_group(grp)
+
+
+    def start_rpc(self, address):
+        """
+        This method starts the local automation server on
+        a (host, port) pair or the path of a Unix socket.
+        """
+
+        api = TaskApi(
+            self.groups,
+            on_group_added = self.watch_group,
+            on_group_removed = self.forget_group,
+            dependencies = self.dependencies,
+            task_ids = self.task_ids
+        )
+        self.rpc_server = RpcServer(self.root, api, address, on_change = self.refresh_page)
+        self.rpc_server.start()
+
+
+    def refresh_page(self):
+        """
+        This method rebuilds the displayed page so it shows
+        changes that were not made through the page itself,
+        the group page is only rebuilt when its rows could
+        not show the changes in place.
+        """
+
+        if self.active_frames["group"] and self.current_group is not None:
+            if not self.page_stale:
+                return
+            self.active_frames["group"] = False
+            self.switch_to_group(self.current_group)
+            return
+
+        for key, switch in (
+            ("group", self.switch_to_task),
+            ("task", self.switch_to_task),
+            ("all", self.switch_to_all_tasks),
+            ("home", self.switch_to_home)
+        ):
+            if self.active_frames[key]:
+                self.active_frames[key] = False
+                switch()
+                return
+
+
+    def verify_snapshot(self):
+        """
+        This method handles the logic for checking every group
+        of the save file in worker processes, the GUI keeps
+        running until the result is shown.
+        """
+
+        try:
+            future = self.maintenance.verify(self.save_path)
+        except (OSError, ValueError):
+            return
+        self.root.after(MAINTENANCE_POLL, self.check_verification, future)
+
+
+    def check_verification(self, future):
+        """
+        This method handles the logic for showing a popup with
+        the groups of the save file found damaged once the
+        verification has finished.
+        """
+
+        if not future.done():
+            self.root.after(MAINTENANCE_POLL, self.check_verification, future)
+            return
+
+        try:
+            damaged = future.result()
+        except (OSError, ValueError):
+            return
+        if damaged:
+            self.show_message("Save File", f"Damaged groups: {', '.join(damaged)}")
+        else:
+            self.show_message("Save File", "Every group of the save file is sound")
+
+
+    def show_message(self, title, text):
+        """
+        This method handles the logic for showing a popup
+        with a line of text and a close button.
+        """
+
+        popup = tk.Toplevel(self.root)
+        self.theme.style(popup, "panel")
+        popup.title(f"{APPLICATION_TITLE} {title}")
+        message_label = tk.Label(
+            popup,
+            text = text,
+            bd = 1,
+            relief = "solid"
+        )
+        self.theme.style(message_label, "row_label")
+        message_label.pack(fill = "x", padx = 5, pady = (5, 0))
+        close_button = tk.Button(
+            popup,
+            text = "Close",
+            cursor = "hand2",
+            command = popup.destroy
+        )
+        self.theme.style(close_button, "button")
+        close_button.pack(fill = "x", padx = 5, pady = 5)
+
+
+    def save_snapshot(self):
+        """
+        This method writes every group to the save file, then
+        marks the tasks restored from the archive since the
+        last save as restored. Nothing is written when the
+        save file could not be read.
+        """
+
+        if not self.save_enabled:
+            return
+
+        for grp in self.groups:
+            grp.get_tasks()
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+        write_snapshot(self.save_path, self.groups, self.dependencies)
+        self.archive.commit()
+
+
+    def close(self):
+        """
+        This method saves every group to the save file, unless
+        it could not be read, and closes the GUI application.
+        """
+
+        self.release_page()
+        self.maintenance.shutdown(wait = False)
+        if self.save_enabled:
+            self.save_snapshot()
+            if self.replica is not None:
+                self.replica.save()
+        if self.rpc_server is not None:
+            self.rpc_server.stop()
+        self.recent.shutdown()
+        self.recent.get_cache().save()
+        self.reminders.stop()
+        self.root.destroy()
+
+
     def start(self):
         """
         This method starts the main loop of 
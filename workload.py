@@ -0,0 +1,281 @@
+from datetime import date
+import random
+import time
+
+from group import Group
+from recurrence import Recurrence, Frequency
+from task import Task, Priority, NO_DATE, ordinal_date
+
+# Constants for the module
+PERCENTILES = (50, 90, 99)  # Latency percentiles reported per operation
+PAST_DAYS = 60              # Oldest due date given to a generated task
+FUTURE_DAYS = 365           # Latest due date given to a generated task
+SOON_DAYS = 7               # Most generated due dates fall around this many days ahead
+
+# Priorities of generated tasks mapped to their relative weights
+PRIORITY_WEIGHTS = (
+    (Priority.LOW, 50),
+    (Priority.MED, 30),
+    (Priority.HIGH, 15),
+    (Priority.LATE, 5)
+)
+
+# Operations of a generated session mapped to their relative weights
+SESSION_WEIGHTS = (
+    ("home", 5),
+    ("tasks", 5),
+    ("all_tasks", 3),
+    ("open_group", 20),
+    ("add_task", 20),
+    ("delete_task", 10),
+    ("toggle_task", 20),
+    ("sort", 10),
+    ("filter", 7)
+)
+
+# Operations that work on the group page of the current group
+GROUP_OPERATIONS = ("add_task", "delete_task", "toggle_task", "sort", "filter")
+
+# Operations that need an argument after their group
+ARGUMENT_OPERATIONS = ("delete_task", "toggle_task", "sort", "filter")
+
+# Words the names of generated groups and tasks are made of
+WORDS = (
+    "read", "write", "review", "plan", "fix", "email", "call", "draft",
+    "chapter", "report", "lab", "essay", "budget", "meeting", "notes",
+    "project", "slides", "invoice", "exam", "homework", "groceries"
+)
+
+# Values the sort and filter operations of a session choose from
+SORT_COLUMNS = ("added", "name", "date", "priority", "completion")
+FILTER_STATES = ("all", "open", "completed")
+
+
+def group_sizes(groups, tasks, skew = 1.0):
+    """
+    Splits a number of tasks between groups following a
+    Zipf distribution, a skew of 0 gives every group the
+    same size and larger values make the first groups
+    larger. Returns the list of sizes.
+    """
+
+    if groups <= 0:
+        return []
+
+    weights = [1 / (rank ** skew) for rank in range(1, groups + 1)]
+    total = sum(weights)
+    sizes = [int(tasks * weight / total) for weight in weights]
+    for index in range(tasks - sum(sizes)):
+        sizes[index % groups] += 1
+    return sizes
+
+
+def generate_groups(groups = 20, tasks = 10000, skew = 1.0, undated = 0.2, completed = 0.3, recurring = 0.02, seed = 0):
+    """
+    Returns a list of groups filled with generated tasks.
+    Group sizes follow group_sizes(), due dates cluster a
+    few days ahead with a long tail, and the given fractions
+    of tasks are undated, completed or recurring. The same
+    seed always builds the same groups.
+    """
+
+    rng = random.Random(seed)
+    today = date.today().toordinal()
+    priorities = [priority for priority, _ in PRIORITY_WEIGHTS]
+    priority_weights = [weight for _, weight in PRIORITY_WEIGHTS]
+    frequencies = list(Frequency)
+
+    result = []
+    next_id = 1
+    for index, size in enumerate(group_sizes(groups, tasks, skew)):
+        grp = Group(f"{rng.choice(WORDS).title()} {index + 1}")
+        grp.set_color(f"#{rng.randrange(0x1000000):06x}")
+        group_tasks = []
+        for _ in range(size):
+            if rng.random() < undated:
+                due = NO_DATE
+            else:
+                due = ordinal_date(today + round(rng.triangular(-PAST_DAYS, FUTURE_DAYS, SOON_DAYS)))
+            task = Task(
+                next_id,
+                f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {next_id}",
+                due,
+                rng.choices(priorities, priority_weights)[0],
+                rng.random() < completed
+            )
+            if due != NO_DATE and rng.random() < recurring:
+                task.set_recurrence(Recurrence(rng.choice(frequencies)))
+            group_tasks.append(task)
+            next_id += 1
+        grp.set_tasks(group_tasks)
+        result.append(grp)
+    return result
+
+
+def generate_session(sizes, steps = 200, seed = 0):
+    """
+    Returns a scripted user session of a number of steps as
+    a list of (operation, group, argument) tuples. Groups are
+    opened in proportion to their sizes given as a list, and
+    operations on a group are always preceded by opening it.
+    """
+
+    rng = random.Random(seed)
+    operations = [operation for operation, _ in SESSION_WEIGHTS]
+    weights = [weight for _, weight in SESSION_WEIGHTS]
+    groups = range(len(sizes))
+    group_weights = [size + 1 for size in sizes]
+
+    script = []
+    page = "home"
+    current = None
+    while len(script) < steps:
+        operation = rng.choices(operations, weights)[0]
+        if operation in GROUP_OPERATIONS or operation == "open_group":
+            if not sizes:
+                continue
+            if operation == "open_group" or page != "group":
+                current = rng.choices(groups, group_weights)[0]
+                script.append(("open_group", current, None))
+                page = "group"
+                if operation == "open_group" or len(script) >= steps:
+                    continue
+            if operation == "sort":
+                argument = rng.choice(SORT_COLUMNS)
+            elif operation == "filter":
+                argument = rng.choice(FILTER_STATES)
+            elif operation in ("delete_task", "toggle_task"):
+                argument = round(rng.random(), 4)
+            else:
+                argument = None
+            script.append((operation, current, argument))
+        elif operation != page:
+            script.append((operation, None, None))
+            page = operation
+    return script
+
+
+def write_session(script, file):
+    """
+    Writes a session to a file, one operation per line.
+    """
+
+    for operation, group, argument in script:
+        words = [operation]
+        if group is not None:
+            words.append(str(group))
+        if argument is not None:
+            words.append(str(argument))
+        file.write(" ".join(words) + "\n")
+
+
+def read_session(lines):
+    """
+    Reads a session written by write_session() or by hand,
+    blank lines and lines starting with # are skipped.
+    """
+
+    operations = [operation for operation, _ in SESSION_WEIGHTS]
+    script = []
+    for number, line in enumerate(lines, 1):
+        words = line.split("#", 1)[0].split()
+        if not words:
+            continue
+        operation = words[0]
+        if operation not in operations:
+            raise ValueError(f"line {number}: unknown operation {operation}")
+        group = int(words[1]) if len(words) > 1 else None
+        argument = words[2] if len(words) > 2 else None
+        if (operation in GROUP_OPERATIONS or operation == "open_group") and group is None:
+            raise ValueError(f"line {number}: {operation} needs a group")
+        if operation in ARGUMENT_OPERATIONS and argument is None:
+            raise ValueError(f"line {number}: {operation} needs an argument")
+        if operation in ("delete_task", "toggle_task"):
+            argument = float(argument)
+        script.append((operation, group, argument))
+    return script
+
+
+def replay(window, script):
+    """
+    Runs a session against a Window and returns a dictionary
+    mapping every operation to its list of latencies in
+    seconds. Each latency includes the idle work and redraws
+    Tk runs before the result is visible.
+    """
+
+    timings = {}
+    for operation, group, argument in script:
+        grp = window.groups[group % len(window.groups)] if group is not None and window.groups else None
+        action = _action(window, operation, grp, argument)
+        if action is None:
+            continue
+        start = time.perf_counter()
+        action()
+        window.root.update()
+        timings.setdefault(operation, []).append(time.perf_counter() - start)
+    return timings
+
+
+def percentile(samples, percent):
+    """
+    Returns the nearest-rank percentile of a sorted list.
+    """
+
+    rank = max(1, -(-len(samples) * percent // 100))
+    return samples[min(rank, len(samples)) - 1]
+
+
+def summarize(timings):
+    """
+    Returns a row of the operation name, number of samples,
+    percentiles of PERCENTILES and maximum in milliseconds
+    for every operation in a dictionary of latencies.
+    """
+
+    rows = []
+    for operation, samples in timings.items():
+        samples = sorted(samples)
+        rows.append(
+            (operation, len(samples))
+            + tuple(percentile(samples, percent) * 1000 for percent in PERCENTILES)
+            + (samples[-1] * 1000,)
+        )
+    return rows
+
+
+def _action(window, operation, grp, argument):
+    """
+    Returns a function that runs one operation of a session
+    against a Window, None when there is nothing to act on.
+    """
+
+    if operation == "home":
+        return window.switch_to_home
+    if operation == "tasks":
+        return window.switch_to_task
+    if operation == "all_tasks":
+        return window.switch_to_all_tasks
+    if grp is None:
+        return None
+
+    if operation == "open_group":
+        def open_group():
+            window.active_frames["group"] = False
+            window.switch_to_group(grp)
+        return open_group
+    if operation == "add_task":
+        return lambda: window.new_task(grp)
+    if operation == "sort":
+        return lambda: window.sort_group(grp, argument)
+    if operation == "filter":
+        completion = {"all": None, "open": False, "completed": True}[argument]
+        return lambda: window.filter_group(grp, completion)
+
+    tasks = window.get_group_view(grp).get_tasks()
+    if not tasks:
+        return None
+    task = tasks[min(int(argument * len(tasks)), len(tasks) - 1)]
+    if operation == "delete_task":
+        return lambda: window.remove_task(task, grp)
+    return lambda: window.toggle_task(task)